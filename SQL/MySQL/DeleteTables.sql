@@ -1,4 +1,5 @@
 -- BORRAR TABLAS
+-- Alternativa sin bloqueos largos y para cualquier motor: python manage.py purge_data (ver README)
 
 -- SELECCIONAR BASE DE DATOS
 USE `proyecto`;
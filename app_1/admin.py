@@ -1,3 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+Administración de app_1 y de los usuarios.
+
+La acción export_csv ("Exportar seleccionados a CSV") está disponible en la
+lista de todos los modelos del admin para quien tenga el permiso de verlos.
+Descarga las filas seleccionadas (o todas, con "seleccionar todo") como CSV
+con StreamingHttpResponse: la consulta pide solo las columnas exportadas con
+values_list() y las recorre en orden de clave primaria, en consultas de
+EXPORT_CHUNK_SIZE filas (WHERE pk > último), así que en cualquier motor la
+memoria no crece con el número de filas y la cabecera del CSV sale antes de
+leer la primera fila.
+
+Las columnas son `csv_fields` del ModelAdmin si lo define; si no, los campos
+de list_display que son columnas del modelo, o todas las columnas si no hay
+ninguno. Al terminar se registran las filas enviadas y las filas por segundo.
+
+LargeTableAdmin es la base de los ModelAdmin de tablas grandes: el total de la
+lista sale de las estadísticas del motor o de un conteo acotado
+(proyecto/db/pagination.py), la lista pide con only() y select_related solo
+las columnas que muestra, y cuando el orden empieza por una columna indexada
+las páginas se recorren con cursores (?cursor=...) en lugar de OFFSET, así que
+cada página cuesta lo mismo sea cual sea el tamaño de la tabla.
+"""
+
+import csv
+import logging
+import time
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.auth import admin as auth_admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.contrib.auth import get_user_model
+from django.core.exceptions import FieldDoesNotExist
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models.constants import LOOKUP_SEP
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.text import capfirst
+
+from proyecto.db import pagination
+
+logger = logging.getLogger(__name__)
+
+# Caracteres con los que una celda se interpreta como fórmula en Excel o LibreOffice
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+# Parámetro de la URL con el cursor de la página en LargeTableAdmin
+CURSOR_VAR = "cursor"
+
+
+class _LineBuffer:
+    """Archivo en memoria para csv.writer; take() devuelve y descarta lo escrito"""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, value):
+        self.parts.append(value)
+
+    def take(self):
+        data = "".join(self.parts).encode("utf-8")
+        self.parts.clear()
+        return data
+
+
+def csv_fields(modeladmin, request):
+    """Nombres de los campos que exporta `modeladmin`"""
+    fields = getattr(modeladmin, "csv_fields", None)
+    if fields:
+        return list(fields)
+    opts = modeladmin.model._meta
+    columns = [field.name for field in opts.concrete_fields]
+    displayed = [name for name in modeladmin.get_list_display(request) if name in columns]
+    if not displayed:
+        return columns
+    return displayed if opts.pk.name in displayed else [opts.pk.name, *displayed]
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        value = timezone.localtime(value).replace(tzinfo=None)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Se exporta como texto y no como fórmula al abrir el archivo en una hoja de cálculo
+        return "'" + value
+    return value
+
+
+def csv_stream(queryset, fields, chunk_size):
+    """
+    Genera el CSV (UTF-8 con BOM, para que Excel reconozca los acentos) en
+    bloques de `chunk_size` filas, el mismo tamaño con que se leen de la base
+    de datos.
+    """
+    opts = queryset.model._meta
+    buffer = _LineBuffer()
+    writer = csv.writer(buffer)
+    writer.writerow([capfirst(opts.get_field(name).verbose_name) for name in fields])
+    yield "\ufeff".encode("utf-8") + buffer.take()
+
+    rows = 0
+    started = time.perf_counter()
+    try:
+        for row in pagination.values_by_pk(queryset, fields, chunk_size):
+            writer.writerow([_cell(value) for value in row])
+            rows += 1
+            if rows % chunk_size == 0:
+                yield buffer.take()
+        yield buffer.take()
+    finally:
+        seconds = time.perf_counter() - started
+        logger.info("CSV de %s: %d filas en %.2f s (%.0f filas/s)",
+                    opts.label, rows, seconds, rows / seconds if seconds else 0)
+
+
+async def _async_stream(parts):
+    """
+    Recorre el generador síncrono bloque a bloque en el hilo de la solicitud.
+    Con un iterador síncrono, StreamingHttpResponse en ASGI lo consumiría
+    entero en una lista antes de enviar el primer byte.
+    """
+    try:
+        while True:
+            part = await sync_to_async(next)(parts, None)
+            if part is None:
+                return
+            yield part
+    finally:
+        await sync_to_async(parts.close)()
+
+
+@admin.action(description="Exportar seleccionados a CSV", permissions=["view"])
+def export_csv(modeladmin, request, queryset):
+    parts = csv_stream(queryset, csv_fields(modeladmin, request), settings.EXPORT_CHUNK_SIZE)
+    response = StreamingHttpResponse(
+        _async_stream(parts) if isinstance(request, ASGIRequest) else parts,
+        content_type="text/csv; charset=utf-8",
+    )
+    filename = f"{queryset.model._meta.model_name}-{timezone.localtime():%Y%m%d-%H%M%S}.csv"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+admin.site.add_action(export_csv)
+
+
+def displayed_columns(model, list_display):
+    """
+    (campos para only(), relaciones para select_related) de las columnas de
+    list_display, o None si alguna no es un campo del modelo o de sus claves
+    foráneas (un método o __str__ pueden usar cualquier campo).
+    """
+    opts = model._meta
+    only, related = [opts.pk.name], []
+    for name in list_display:
+        if name == "action_checkbox":
+            continue
+        if not isinstance(name, str):
+            return None
+        current, path = opts, []
+        for part in name.split(LOOKUP_SEP):
+            try:
+                field = current.get_field(part)
+            except FieldDoesNotExist:
+                return None
+            if not field.concrete or field.many_to_many:
+                return None
+            path.append(part)
+            # <fk>_id es la columna de la tabla y no necesita el JOIN
+            if field.is_relation and part == field.name:
+                if LOOKUP_SEP.join(path) not in related:
+                    related.append(LOOKUP_SEP.join(path))
+                current = field.related_model._meta
+        only.append(name)
+    return only, related
+
+
+class LargeTableChangeList(ChangeList):
+    """ChangeList con las columnas mostradas en only()/select_related y paginación por cursores"""
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR)
+        self.keyset = False
+        self.first_url = self.previous_url = self.next_url = None
+        super().__init__(request, *args, **kwargs)
+
+    @cached_property
+    def columns(self):
+        return displayed_columns(self.model, self.list_display)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Los enlaces de orden, filtros y búsqueda vuelven a la primera página
+        return super().get_query_string({CURSOR_VAR: None, **(new_params or {})}, remove)
+
+    def apply_select_related(self, qs):
+        if self.list_select_related is False and self.columns is not None:
+            # Solo las relaciones mostradas, en lugar de todas las claves foráneas no nulas
+            _only, related = self.columns
+            return qs.select_related(*related) if related else qs
+        return super().apply_select_related(qs)
+
+    def get_results(self, request):
+        terms = pagination.keyset_terms(self.queryset)
+        if self.columns is not None:
+            only, _related = self.columns
+            self.queryset = self.queryset.only(*only, *(field.name for field, _descending in terms or ()))
+        super().get_results(request)
+        if terms is None or not self.multi_page or (self.show_all and self.can_show_all):
+            return
+        self.keyset = True
+        at_start = self.page_num <= 1
+        if self.cursor:
+            try:
+                direction, key = pagination.decode_cursor(terms, self.cursor)
+            except pagination.InvalidCursor as error:
+                raise IncorrectLookupParameters(error)
+            at_start = False
+            if direction == "a":
+                self.result_list = self.queryset.filter(pagination.seek(terms, key))[:self.list_per_page]
+            else:
+                previous = self.queryset.filter(pagination.seek(terms, key, backwards=True))
+                # Una clave de más indica si quedan filas antes de la página
+                pks = list(previous.order_by(*pagination.reverse_ordering(terms)).values_list("pk", flat=True)[:self.list_per_page + 1])
+                if len(pks) > self.list_per_page:
+                    self.result_list = self.queryset.filter(pk__in=pks[:self.list_per_page])
+                else:
+                    # Se llegó al principio: se muestra la primera página completa
+                    self.result_list = self.queryset[:self.list_per_page]
+                    at_start = True
+        rows = list(self.result_list)
+        if not rows:
+            return
+        last_key = pagination.row_key(terms, rows[-1])
+        if self.queryset.filter(pagination.seek(terms, last_key)).exists():
+            self.next_url = self.get_query_string({CURSOR_VAR: pagination.encode_cursor("a", last_key)}, [PAGE_VAR])
+        if not at_start:
+            first_key = pagination.row_key(terms, rows[0])
+            self.previous_url = self.get_query_string({CURSOR_VAR: pagination.encode_cursor("b", first_key)}, [PAGE_VAR])
+            self.first_url = self.get_query_string(remove=[PAGE_VAR])
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Base de los ModelAdmin de tablas grandes: total estimado o acotado, sin
+    el conteo de la tabla completa, columnas mostradas con only() y
+    paginación por cursores cuando el orden empieza por una columna indexada.
+    """
+
+    show_full_result_count = False
+    paginator = pagination.EstimatedCountPaginator
+    change_list_template = "admin/keyset_change_list.html"
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        return self.paginator(
+            queryset, per_page, orphans, allow_empty_first_page,
+            estimate_min=settings.ADMIN_ESTIMATED_COUNT_MIN, count_limit=settings.ADMIN_COUNT_LIMIT,
+        )
+
+    def get_changelist(self, request, **kwargs):
+        return LargeTableChangeList
+
+
+User = get_user_model()
+admin.site.unregister(User)
+
 
-# Register your models here.
+@admin.register(User)
+class UserAdmin(LargeTableAdmin, auth_admin.UserAdmin):
+    # Nunca se exporta la contraseña (ni su hash)
+    csv_fields = ("id", "username", "email", "first_name", "last_name",
+                  "is_staff", "is_active", "date_joined", "last_login")
@@ -4,3 +4,24 @@ from django.apps import AppConfig
 class app_1Config(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app_1'
+
+    def ready(self):
+        from django.conf import settings
+        from proyecto.metrics import registry
+        from app_1.cache import response_cache
+
+        def response_cache_collector():
+            stats = response_cache.stats()
+            yield "response_cache_hits_total", "counter", "Aciertos de la caché de respuestas", {}, stats["hits"]
+            yield "response_cache_misses_total", "counter", "Fallos de la caché de respuestas", {}, stats["misses"]
+            yield "response_cache_evictions_total", "counter", "Entradas expulsadas del LRU", {}, stats["evictions"]
+            yield "response_cache_entries", "gauge", "Entradas en la caché de respuestas", {}, stats["entries"]
+
+        # Publica los contadores de la caché de respuestas en /metrics
+        registry.register_collector(response_cache_collector)
+
+        if settings.SESSION_ENGINE.startswith("proyecto.sessions."):
+            from proyecto.sessions import write_behind
+
+            # Escrituras diferidas y sesiones expiradas borradas por el hilo de fondo
+            registry.register_collector(write_behind.collect_metrics)
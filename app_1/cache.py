@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Caché en memoria de respuestas renderizadas para las vistas de app_1.
+
+Las páginas de autenticación no dependen de la solicitud, así que el HTML
+producido se guarda en un LRU acotado por proceso. La clave incluye una
+huella de las fuentes de las plantillas (incluida la cadena de herencia) y del
+manifiesto de archivos estáticos, por lo que un despliegue o una edición de
+plantilla invalida la caché sin intervención manual.
+
+conditional_template_response usa la misma huella como ETag fuerte (y la
+fecha de modificación más reciente de esos archivos como Last-Modified), sin
+renderizar nada. Fuera de DEBUG se calcula una vez por proceso: las
+plantillas y el manifiesto solo cambian con un despliegue. Una solicitud con
+If-None-Match o If-Modified-Since vigente recibe un 304 antes de ejecutar la
+vista, y Cache-Control sale de PAGE_CACHE_CONTROL según el nombre de la URL.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from django.template import loader
+from django.template.loader_tags import ExtendsNode, IncludeNode
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+class ResponseCache:
+    """LRU acotado de respuestas renderizadas con contadores de aciertos y fallos"""
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_MAX_ENTRIES)
+
+# Huellas de archivos memorizadas por (ruta, mtime, tamaño) para no releer fuentes en cada solicitud
+_file_digests = {}
+# Rutas de origen de cada plantilla y de las que extiende o incluye
+_template_origins = {}
+
+
+def _file_fingerprint(path):
+    """Devuelve el SHA-256 del archivo, recalculándolo solo si cambió en disco"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return ""
+    marker = (stat.st_mtime_ns, stat.st_size)
+    cached = _file_digests.get(path)
+    if cached is not None and cached[0] == marker:
+        return cached[1]
+    with open(path, "rb") as handle:
+        digest = hashlib.sha256(handle.read()).hexdigest()
+    _file_digests[path] = (marker, digest)
+    return digest
+
+
+def _collect_origins(template_name, seen=None):
+    """Recorre la cadena de {% extends %} e {% include %} constantes de una plantilla"""
+    seen = set() if seen is None else seen
+    if template_name in seen:
+        return []
+    seen.add(template_name)
+    template = loader.get_template(template_name).template
+    origins = [template.origin.name]
+    for node in template.nodelist.get_nodes_by_type((ExtendsNode, IncludeNode)):
+        expression = node.parent_name if isinstance(node, ExtendsNode) else node.template
+        name = getattr(expression, "var", None)
+        if isinstance(name, str):
+            origins.extend(_collect_origins(name, seen))
+    return origins
+
+
+def template_origins(template_name):
+    origins = _template_origins.get(template_name)
+    if origins is None:
+        origins = _template_origins[template_name] = tuple(_collect_origins(template_name))
+    return origins
+
+
+def static_manifest_path():
+    return os.path.join(settings.STATIC_ROOT, "staticfiles.json")
+
+
+def template_version(template_name):
+    """Huella combinada de las fuentes de la plantilla y del manifiesto de estáticos"""
+    digest = hashlib.sha256()
+    for path in template_origins(template_name):
+        digest.update(_file_fingerprint(path).encode())
+    digest.update(_file_fingerprint(static_manifest_path()).encode())
+    return digest.hexdigest()
+
+
+# Ajustes que cambian el HTML sin cambiar las plantillas ni el manifiesto
+VALIDATOR_SETTINGS = ("PAGE_ASSETS_ENABLED", "STATIC_URL")
+# (ETag, Last-Modified) por plantilla, calculados una vez por proceso fuera de DEBUG
+_validators = {}
+
+
+def template_validators(template_name):
+    """(ETag fuerte, marca de tiempo de Last-Modified) de la página que renderiza `template_name`"""
+    validators = _validators.get(template_name)
+    if validators is None or settings.DEBUG:
+        digest = hashlib.sha256(template_version(template_name).encode())
+        for name in VALIDATOR_SETTINGS:
+            digest.update(repr(getattr(settings, name, None)).encode())
+        paths = (*template_origins(template_name), static_manifest_path())
+        last_modified = max((os.stat(path).st_mtime for path in paths if os.path.exists(path)), default=0)
+        validators = _validators[template_name] = (f'"{digest.hexdigest()[:32]}"', int(last_modified))
+    return validators
+
+
+def _conditional_response(request, template_name):
+    """(respuesta 304/412 o None, función que añade los validadores y Cache-Control)"""
+    etag, last_modified = template_validators(template_name)
+    match = request.resolver_match
+    policy = settings.PAGE_CACHE_CONTROL.get(match.url_name if match else None)
+
+    def finish(response):
+        if response.status_code in (200, 304):
+            response.headers.setdefault("ETag", etag)
+            if last_modified:
+                response.headers.setdefault("Last-Modified", http_date(last_modified))
+            if policy:
+                response.headers.setdefault("Cache-Control", policy)
+        return response
+
+    return get_conditional_response(request, etag=etag, last_modified=last_modified or None), finish
+
+
+def conditional_template_response(template_name):
+    """
+    Decorador para vistas que solo renderizan `template_name` sin contexto:
+    responde 304 Not Modified sin ejecutar la vista cuando el cliente ya tiene
+    la versión actual y añade ETag, Last-Modified y Cache-Control a la
+    respuesta. Va por fuera de cache_template_response. Admite vistas
+    síncronas y asíncronas.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if not settings.PAGE_ETAGS_ENABLED or request.method not in ("GET", "HEAD"):
+                    return await view_func(request, *args, **kwargs)
+                response, finish = _conditional_response(request, template_name)
+                if response is None:
+                    response = await view_func(request, *args, **kwargs)
+                return finish(response)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not settings.PAGE_ETAGS_ENABLED or request.method not in ("GET", "HEAD"):
+                return view_func(request, *args, **kwargs)
+            response, finish = _conditional_response(request, template_name)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+            return finish(response)
+        return wrapper
+    return decorator
+
+
+def _store(key, response):
+    if response.status_code == 200 and not response.streaming:
+        response_cache.set(key, (response.content, response["Content-Type"]))
+    return response
+
+
+def _from_entry(entry):
+    content, content_type = entry
+    return HttpResponse(content, content_type=content_type)
+
+
+def _cache_key(request, template_name):
+    """Clave de la solicitud o None si no se debe cachear"""
+    if not settings.RESPONSE_CACHE_ENABLED or request.method not in ("GET", "HEAD"):
+        return None
+    return (template_name, template_version(template_name))
+
+
+def cache_template_response(template_name):
+    """
+    Decorador que sirve desde la caché el HTML de una vista que solo renderiza
+    `template_name` sin contexto. Únicamente se cachean solicitudes GET/HEAD.
+    Admite vistas síncronas y asíncronas.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                key = _cache_key(request, template_name)
+                if key is None:
+                    return await view_func(request, *args, **kwargs)
+                entry = response_cache.get(key)
+                if entry is None:
+                    return _store(key, await view_func(request, *args, **kwargs))
+                return _from_entry(entry)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            key = _cache_key(request, template_name)
+            if key is None:
+                return view_func(request, *args, **kwargs)
+            entry = response_cache.get(key)
+            if entry is None:
+                return _store(key, view_func(request, *args, **kwargs))
+            return _from_entry(entry)
+        return wrapper
+    return decorator
@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""
+Exportación de reportes a XLSX y PDF fuera de los hilos de las solicitudes.
+
+La vista solo registra el trabajo y responde 202; un pool de EXPORT_WORKERS
+procesos (proyecto/jobs.py) recorre la consulta en orden de clave primaria,
+en consultas de EXPORT_CHUNK_SIZE filas (WHERE pk > último), así que en
+cualquier motor solo hay un bloque en memoria, y escribe cada fila en cuanto
+llega:
+
+- XLSX con el modo constant_memory de XlsxWriter, que vuelca cada fila a un
+  archivo temporal y no la conserva en memoria.
+- PDF con ReportLab: cada página es un Table (flowable) con las filas que
+  caben en ella, dibujado y descartado antes de leer las siguientes. Aun así
+  ReportLab retiene el contenido de cada página dibujada hasta guardar el
+  documento (unos 0,7 MB por cada 1000 filas), así que el PDF está limitado a
+  EXPORT_PDF_MAX_ROWS filas y los volcados grandes deben pedirse en XLSX.
+
+El archivo terminado se guarda en el almacenamiento 'exports' (disco local en
+desarrollo, S3 privado en producción). Mientras tanto el proceso publica las
+filas escritas en el archivo de estado, que el cliente consulta para mostrar
+el avance y, al terminar, descargar el archivo.
+"""
+
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.files import File
+from django.core.files.storage import storages
+from django.db import close_old_connections
+from django.utils import timezone
+
+from proyecto import jobs
+from proyecto.db import pagination
+from proyecto.metrics import DURATION_BUCKETS, registry
+from proyecto.procinfo import memory_usage
+
+logger = logging.getLogger(__name__)
+
+# Formatos: extensión y tipo MIME
+FORMATS = {
+    "xlsx": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "pdf": (".pdf", "application/pdf"),
+}
+# Filas por hoja de Excel, incluida la cabecera; las exportaciones mayores continúan en otra hoja
+XLSX_MAX_ROWS = 1048576
+# Segundos entre publicaciones del avance en el archivo de estado
+PROGRESS_INTERVAL = 1.0
+
+registry.declare("export_duration_seconds", "histogram", "Duración de cada exportación por formato", DURATION_BUCKETS)
+registry.declare("export_rows_total", "counter", "Filas exportadas por reporte")
+registry.declare("export_jobs_total", "counter", "Exportaciones por resultado")
+
+
+class Export:
+    """Reporte exportable: consulta ordenada y columnas (campo, título, ancho en caracteres)"""
+
+    def __init__(self, title, queryset, columns):
+        self.title = title
+        self._queryset = queryset
+        self.columns = columns
+
+    def queryset(self):
+        return self._queryset()
+
+    def headers(self):
+        return [title for _field, title, _width in self.columns]
+
+    def rows(self):
+        """Tuplas con los valores de las columnas, leídas por bloques sin crear instancias del modelo"""
+        fields = [field for field, _title, _width in self.columns]
+        return pagination.values_by_pk(self.queryset(), fields, settings.EXPORT_CHUNK_SIZE)
+
+
+EXPORTS = {
+    "usuarios": Export("Usuarios", lambda: get_user_model()._default_manager.order_by("pk"), [
+        ("pk", "Id", 8),
+        ("username", "Usuario", 28),
+        ("email", "Correo", 32),
+        ("first_name", "Nombre", 20),
+        ("last_name", "Apellido", 20),
+        ("is_staff", "Personal", 9),
+        ("is_active", "Activo", 8),
+        ("date_joined", "Registro", 18),
+        ("last_login", "Último acceso", 18),
+    ]),
+    "grupos": Export("Grupos", lambda: Group.objects.order_by("pk"), [
+        ("pk", "Id", 8),
+        ("name", "Nombre", 40),
+    ]),
+}
+
+
+def status_path(job_id):
+    return os.path.join(settings.EXPORT_SPOOL_DIR, f"{job_id}.json")
+
+
+def write_status(job_id, status):
+    jobs.write_status(status_path(job_id), status)
+
+
+def read_status(job_id):
+    """Estado guardado del trabajo o None si no existe"""
+    return jobs.read_status(status_path(job_id))
+
+
+class Progress:
+    """Cuenta las filas escritas y publica el avance en el estado del trabajo cada PROGRESS_INTERVAL segundos"""
+
+    def __init__(self, job_id, status, total):
+        self.job_id = job_id
+        self.status = status
+        self.total = total
+        self.rows = 0
+        self._next_publish = 0.0
+
+    def publish(self):
+        self.status.update(state="running", rows=self.rows, total=self.total)
+        write_status(self.job_id, self.status)
+        self._next_publish = time.monotonic() + PROGRESS_INTERVAL
+
+    def track(self, rows):
+        for row in rows:
+            self.rows += 1
+            if self.rows % 1000 == 0 and time.monotonic() >= self._next_publish:
+                self.publish()
+            yield row
+        self.publish()
+
+
+def _local(value):
+    # Las fechas se guardan en UTC; el reporte las muestra en TIME_ZONE y sin zona (Excel no las admite)
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        return timezone.localtime(value).replace(tzinfo=None)
+    return value
+
+
+def write_xlsx(path, export, rows):
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(path, {
+        "constant_memory": True,
+        "tmpdir": settings.EXPORT_SPOOL_DIR,
+        "default_date_format": "yyyy-mm-dd hh:mm",
+        # Un texto que empieza por '=' se escribe como texto, no como fórmula
+        "strings_to_formulas": False,
+        "strings_to_urls": False,
+    })
+    header = workbook.add_format({"bold": True, "bg_color": "#DDEBF7", "border": 1})
+    per_sheet = XLSX_MAX_ROWS - 1
+    sheet = None
+    try:
+        for index, row in enumerate(rows):
+            if index % per_sheet == 0:
+                sheet = _add_sheet(workbook, export, header, index // per_sheet)
+            sheet.write_row(index % per_sheet + 1, 0, [_local(value) for value in row])
+        if sheet is None:
+            _add_sheet(workbook, export, header, 0)
+    finally:
+        workbook.close()
+
+
+def _add_sheet(workbook, export, header, number):
+    sheet = workbook.add_worksheet(f"{export.title[:24]} {number + 1}" if number else export.title[:31])
+    for column, (_field, _title, width) in enumerate(export.columns):
+        sheet.set_column(column, column, width)
+    sheet.write_row(0, 0, export.headers(), header)
+    sheet.freeze_panes(1, 0)
+    return sheet
+
+
+def _pdf_text(value, limit):
+    value = _local(value)
+    if value is None:
+        text = ""
+    elif isinstance(value, bool):
+        text = "Sí" if value else "No"
+    elif isinstance(value, datetime):
+        text = value.strftime("%Y-%m-%d %H:%M")
+    else:
+        text = str(value)
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def write_pdf(path, export, rows):
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.pdfgen.canvas import Canvas
+    from reportlab.platypus import Table, TableStyle
+
+    page_width, page_height = landscape(A4)
+    margin, font_size, title_height = 36, 7, 24
+    row_height = font_size * 1.8
+    available_width = page_width - 2 * margin
+    total_width = sum(width for _field, _title, width in export.columns)
+    column_widths = [available_width * width / total_width for _field, _title, width in export.columns]
+    # Una línea por celda: el texto que no cabe se recorta
+    limits = [max(4, int(width / (font_size * 0.55))) for width in column_widths]
+    rows_per_page = int((page_height - 2 * margin - title_height) // row_height) - 1
+    style = TableStyle([
+        ("FONT", (0, 0), (-1, -1), "Helvetica", font_size),
+        ("FONT", (0, 0), (-1, 0), "Helvetica-Bold", font_size),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#DDEBF7")),
+        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#F5F5F5")]),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+    ])
+    canvas = Canvas(path, pagesize=(page_width, page_height), pageCompression=1)
+    canvas.setTitle(export.title)
+    headers = export.headers()
+    pages = 0
+
+    def draw_page(page_rows):
+        nonlocal pages
+        pages += 1
+        canvas.setFont("Helvetica-Bold", 12)
+        canvas.drawString(margin, page_height - margin, export.title)
+        canvas.setFont("Helvetica", 8)
+        canvas.drawRightString(page_width - margin, page_height - margin, f"Página {pages}")
+        table = Table([headers, *page_rows], colWidths=column_widths, rowHeights=row_height, style=style)
+        _width, height = table.wrapOn(canvas, available_width, page_height)
+        table.drawOn(canvas, margin, page_height - margin - title_height - height)
+        canvas.showPage()
+
+    page_rows = []
+    for row in rows:
+        page_rows.append([_pdf_text(value, limit) for value, limit in zip(row, limits)])
+        if len(page_rows) == rows_per_page:
+            draw_page(page_rows)
+            page_rows = []
+    if page_rows or not pages:
+        draw_page(page_rows)
+    canvas.save()
+
+
+WRITERS = {"xlsx": write_xlsx, "pdf": write_pdf}
+
+
+def run_export(job_id, name, export_format):
+    """
+    Genera la exportación y la guarda en el almacenamiento 'exports'. Se
+    ejecuta en un proceso del pool; devuelve el archivo, las filas, los
+    tiempos por etapa y el pico de memoria del proceso.
+    """
+    close_old_connections()
+    export = EXPORTS[name]
+    extension, _content_type = FORMATS[export_format]
+    status = read_status(job_id)
+    timings = {"queue": max(0.0, time.time() - status["created"])}
+    path = os.path.join(settings.EXPORT_SPOOL_DIR, f"{job_id}{extension}")
+    # El proceso del pool atiende otros trabajos: se mide lo que este añade, no el máximo del proceso
+    rss_before = _current_rss()
+    try:
+        started = time.perf_counter()
+        total = export.queryset().count()
+        timings["count"] = time.perf_counter() - started
+        if export_format == "pdf" and total > settings.EXPORT_PDF_MAX_ROWS:
+            raise ValueError(f"El PDF admite hasta {settings.EXPORT_PDF_MAX_ROWS} filas y el reporte tiene {total}; use XLSX.")
+        progress = Progress(job_id, status, total)
+        progress.publish()
+
+        started = time.perf_counter()
+        WRITERS[export_format](path, export, progress.track(export.rows()))
+        timings["write"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        filename = f"{name}-{timezone.localtime():%Y%m%d-%H%M%S}{extension}"
+        size = os.path.getsize(path)
+        with open(path, "rb") as content:
+            stored = storages["exports"].save(f"{job_id}/{filename}", File(content, name=filename))
+        timings["upload"] = time.perf_counter() - started
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+        close_old_connections()
+    purge_expired()
+    rss_after = _current_rss()
+    return {
+        "file": stored,
+        "filename": filename,
+        "size": size,
+        "rows": progress.rows,
+        "timings": timings,
+        "rss_mb": round(rss_after / 1048576, 1) if rss_after else None,
+        "rss_growth_mb": round((rss_after - rss_before) / 1048576, 1) if rss_after and rss_before else None,
+    }
+
+
+def _current_rss():
+    """RSS actual del proceso en bytes, o None fuera de Linux"""
+    usage = memory_usage()
+    return usage["rss"] if usage else None
+
+
+def purge_expired():
+    """Borra los archivos y estados de las exportaciones terminadas hace más de EXPORT_RETENTION_HOURS"""
+    storage = storages["exports"]
+
+    def remove(status):
+        if status.get("file"):
+            storage.delete(status["file"])
+
+    jobs.purge_statuses(settings.EXPORT_SPOOL_DIR, settings.EXPORT_RETENTION_HOURS * 3600, remove)
+
+
+class ExportPipeline:
+    """Cola de exportaciones sobre un pool de EXPORT_WORKERS procesos"""
+
+    def __init__(self):
+        self.pool = jobs.ProcessPool("EXPORT_WORKERS", "EXPORT_QUEUE")
+
+    def submit(self, name, export_format, user_id):
+        """Registra y encola la exportación; devuelve el id del trabajo o lanza jobs.JobBusy"""
+        job_id = str(uuid.uuid4())
+        os.makedirs(settings.EXPORT_SPOOL_DIR, exist_ok=True)
+        write_status(job_id, jobs.new_status(job_id, export=name, format=export_format, user=user_id))
+        try:
+            future = self.pool.submit(run_export, job_id, name, export_format)
+        except jobs.JobBusy:
+            registry.inc("export_jobs_total", {"result": "rejected"})
+            os.remove(status_path(job_id))
+            raise
+        future.add_done_callback(lambda future: self._done(job_id, future))
+        return job_id
+
+    def _done(self, job_id, future):
+        status = read_status(job_id) or {"id": job_id}
+        status["finished"] = time.time()
+        try:
+            result = future.result()
+        except Exception as error:
+            logger.exception("Error en la exportación %s", job_id)
+            registry.inc("export_jobs_total", {"result": "error"})
+            status.update(state="error", error=str(error))
+        else:
+            seconds = sum(result["timings"].values())
+            registry.observe("export_duration_seconds", seconds, {"format": status.get("format", "")})
+            registry.inc("export_rows_total", {"export": status.get("export", "")}, result["rows"])
+            registry.inc("export_jobs_total", {"result": "done"})
+            logger.info("Exportación %s: %d filas, %d bytes en %.1f s (RSS del proceso %s MB, %s MB más que al empezar)",
+                        job_id, result["rows"], result["size"], seconds, result["rss_mb"], result["rss_growth_mb"])
+            status.update(
+                state="done",
+                file=result["file"],
+                filename=result["filename"],
+                size=result["size"],
+                rows=result["rows"],
+                rss_mb=result["rss_mb"],
+                rss_growth_mb=result["rss_growth_mb"],
+                timings_ms={stage: round(value * 1000, 1) for stage, value in result["timings"].items()},
+            )
+        write_status(job_id, status)
+
+
+pipeline = ExportPipeline()
+
+registry.register_collector(lambda: [
+    ("export_jobs_in_flight", "gauge", "Exportaciones en cola o en proceso en el pool", {}, pipeline.pool.in_flight),
+])
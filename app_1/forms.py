@@ -0,0 +1,75 @@
+from django import forms
+from django.conf import settings
+from django.contrib.auth import get_user_model, password_validation
+from PIL import Image, UnidentifiedImageError
+
+from proyecto.covers import INPUT_FORMATS
+
+
+class LoginForm(forms.Form):
+    """Formulario #js-login de page_login.html"""
+
+    username = forms.CharField(max_length=150)
+    password = forms.CharField(strip=False)
+    rememberme = forms.BooleanField(required=False)
+
+
+class RegisterForm(forms.Form):
+    """
+    Formulario #js-register de page_register.html. El correo es también el
+    nombre de usuario; su unicidad se comprueba en la vista, que puede ser
+    asíncrona y no debe consultar la base de datos desde el formulario.
+    """
+
+    fname = forms.CharField(max_length=150)
+    lname = forms.CharField(max_length=150)
+    emailverify = forms.EmailField(max_length=150)
+    userpassword = forms.CharField(strip=False)
+    terms = forms.BooleanField()
+    newsletter = forms.BooleanField(required=False)
+
+    def build_user(self):
+        """Usuario sin guardar y sin contraseña con los datos del formulario"""
+        email = get_user_model()._default_manager.normalize_email(self.cleaned_data["emailverify"])
+        return get_user_model()(
+            username=email,
+            email=email,
+            first_name=self.cleaned_data["fname"],
+            last_name=self.cleaned_data["lname"],
+        )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not self.errors:
+            try:
+                password_validation.validate_password(cleaned_data["userpassword"], self.build_user())
+            except forms.ValidationError as error:
+                self.add_error("userpassword", error)
+        return cleaned_data
+
+
+class CoverForm(forms.Form):
+    """
+    Carátula de un libro. Solo se lee la cabecera de la imagen (formato y
+    dimensiones); la decodificación completa ocurre en el pool de carátulas.
+    """
+
+    cover = forms.FileField()
+
+    def clean_cover(self):
+        cover = self.cleaned_data["cover"]
+        if cover.size > settings.COVER_MAX_UPLOAD_MB * 1024 * 1024:
+            raise forms.ValidationError(f"La imagen supera los {settings.COVER_MAX_UPLOAD_MB} MB.")
+        try:
+            with Image.open(cover) as image:
+                self.cleaned_data["format"] = image.format
+                width, height = image.size
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+            raise forms.ValidationError("El archivo no es una imagen válida.")
+        finally:
+            cover.seek(0)
+        if self.cleaned_data["format"] not in INPUT_FORMATS:
+            raise forms.ValidationError("Formato no admitido; use JPEG, PNG, WebP o GIF.")
+        if width * height > settings.COVER_MAX_PIXELS:
+            raise forms.ValidationError("La imagen tiene demasiados píxeles.")
+        return cover
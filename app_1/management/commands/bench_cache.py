@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Compara la caché compartida de SQLite (proyecto/cache_backends.py) con
+LocMemCache y FileBasedCache.
+
+Lanza --workers procesos, como los workers de gunicorn, y en cada uno crea su
+propia instancia de cada backend. Mide dos escenarios:
+
+- Lecturas y escrituras: cada proceso lee claves de una distribución sesgada
+  (unas pocas claves reciben la mayoría de las lecturas) y, si falla, "calcula"
+  el valor durante --compute-ms y lo guarda. Muestra operaciones/s de todos los
+  procesos, la tasa de aciertos y las entradas guardadas en total (con
+  LocMemCache cada proceso guarda su propia copia).
+- Estampida: todos los procesos piden a la vez con get_or_set una clave que
+  tarda --stampede-ms en calcularse y se cuenta cuántas veces se calculó.
+
+Ejemplos:
+    python manage.py bench_cache
+    python manage.py bench_cache --workers 3 --ops 20000 --keys 2000 --value-bytes 4096
+    python manage.py bench_cache --backend sqlite --backend locmem
+"""
+
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from proyecto.cache_backends import SQLiteCache
+
+BACKENDS = ("sqlite", "locmem", "filebased")
+
+
+def build_cache(backend, directory):
+    if backend == "sqlite":
+        return SQLiteCache(os.path.join(directory, "cache.sqlite3"), {"OPTIONS": {"MAX_BYTES": 256 * 1024 * 1024}})
+    if backend == "filebased":
+        return FileBasedCache(os.path.join(directory, "files"), {"OPTIONS": {"MAX_ENTRIES": 1_000_000}})
+    return LocMemCache("bench_cache", {"OPTIONS": {"MAX_ENTRIES": 1_000_000}})
+
+
+def entries(cache):
+    if isinstance(cache, SQLiteCache):
+        return cache.stats()["entries"]
+    if isinstance(cache, FileBasedCache):
+        return len(cache._list_cache_files())
+    return len(cache._cache)
+
+
+def run_worker(backend, directory, options, seed, barrier, results):
+    cache = build_cache(backend, directory)
+    rng = random.Random(seed)
+    payload = os.urandom(options["value_bytes"])
+    compute = options["compute_ms"] / 1000
+    hits = 0
+    barrier.wait()
+    started = time.perf_counter()
+    for _ in range(options["ops"]):
+        # Distribución sesgada: la mitad de las lecturas va al 12,5% de las claves
+        key = f"k{int(options['keys'] * rng.random() ** 3)}"
+        if cache.get(key) is not None:
+            hits += 1
+        else:
+            time.sleep(compute)
+            cache.set(key, payload, timeout=None)
+    elapsed = time.perf_counter() - started
+    local_entries = entries(cache) if backend == "locmem" else 0
+
+    barrier.wait()
+    computed = 0
+
+    def expensive():
+        nonlocal computed
+        computed += 1
+        time.sleep(options["stampede_ms"] / 1000)
+        return payload
+
+    barrier.wait()
+    stampede_started = time.perf_counter()
+    cache.get_or_set("stampede", expensive, timeout=None)
+    stampede = time.perf_counter() - stampede_started
+    results.put((hits, elapsed, local_entries, computed, stampede, entries(cache) if backend != "locmem" else 0))
+
+
+class Command(BaseCommand):
+    help = "Compara operaciones/s, aciertos y protección contra estampidas de SQLiteCache, LocMemCache y FileBasedCache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backend", action="append", dest="backends", choices=BACKENDS, help="Backend a medir (se puede repetir; por defecto todos)")
+        parser.add_argument("--workers", type=int, default=3, help="Procesos que usan la caché a la vez")
+        parser.add_argument("--ops", type=int, default=20000, help="Lecturas por proceso")
+        parser.add_argument("--keys", type=int, default=5000, help="Claves distintas")
+        parser.add_argument("--value-bytes", type=int, default=2048, help="Tamaño de cada valor")
+        parser.add_argument("--compute-ms", type=float, default=1.0, help="Costo de calcular un valor que no está en la caché")
+        parser.add_argument("--stampede-ms", type=float, default=200.0, help="Costo del valor que todos piden a la vez")
+
+    def handle(self, *args, **options):
+        if options["workers"] <= 0 or options["ops"] <= 0 or options["keys"] <= 0:
+            raise CommandError("--workers, --ops y --keys deben ser mayores que cero")
+        backends = options["backends"] or list(BACKENDS)
+        self.stdout.write(
+            f"Procesos: {options['workers']}  Lecturas por proceso: {options['ops']}  Claves: {options['keys']}  "
+            f"Valor: {options['value_bytes']} bytes  Cálculo: {options['compute_ms']} ms"
+        )
+        self.stdout.write("%-10s %10s %9s %9s %14s %12s" % ("backend", "ops/s", "aciertos", "entradas", "cálculos/est.", "estampida"))
+        for backend in backends:
+            hits, rate, stored, computed, stampede = self.run_backend(backend, options)
+            self.stdout.write("%-10s %10.0f %8.1f%% %9d %14d %10.0f ms" % (backend, rate, hits * 100, stored, computed, stampede * 1000))
+
+    def run_backend(self, backend, options):
+        directory = tempfile.mkdtemp(prefix="bench_cache-")
+        try:
+            # fork, como gunicorn: cada proceso crea su instancia del backend después de separarse
+            context = multiprocessing.get_context("fork")
+            barrier = context.Barrier(options["workers"])
+            results = context.Queue()
+            workers = [
+                context.Process(target=run_worker, args=(backend, directory, options, seed, barrier, results))
+                for seed in range(options["workers"])
+            ]
+            for worker in workers:
+                worker.start()
+            collected = [results.get() for _ in workers]
+            for worker in workers:
+                worker.join()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        total_ops = options["ops"] * len(collected)
+        hits = sum(result[0] for result in collected) / total_ops
+        rate = total_ops / max(result[1] for result in collected)
+        # LocMemCache: cada proceso guarda sus copias; en los compartidos todos ven las mismas entradas
+        stored = sum(result[2] for result in collected) if backend == "locmem" else max(result[5] for result in collected)
+        computed = sum(result[3] for result in collected)
+        stampede = max(result[4] for result in collected)
+        return hits, rate, stored, computed, stampede
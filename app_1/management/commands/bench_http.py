@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Prueba de carga HTTP sencilla para comparar los modos WSGI y ASGI.
+
+Ejemplo:
+    python manage.py bench_http http://127.0.0.1:8080 --path / --path /register/ -n 2000 -c 50
+"""
+
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def percentile(values, fraction):
+    """Percentil por el método del rango más cercano sobre una lista ordenada"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = "Mide rendimiento (solicitudes/s) y latencia (p50/p95/p99) de un servidor en ejecución"
+
+    def add_arguments(self, parser):
+        parser.add_argument("base_url", help="URL base del servidor, por ejemplo http://127.0.0.1:8080")
+        parser.add_argument("--path", action="append", dest="paths", help="Ruta a solicitar (se puede repetir)")
+        parser.add_argument("-n", "--requests", type=int, default=1000, help="Número total de solicitudes")
+        parser.add_argument("-c", "--concurrency", type=int, default=20, help="Solicitudes concurrentes")
+        parser.add_argument("--timeout", type=float, default=30.0, help="Tiempo máximo por solicitud en segundos")
+
+    def handle(self, *args, **options):
+        base_url = options["base_url"].rstrip("/")
+        paths = options["paths"] or ["/"]
+        total = options["requests"]
+        if total <= 0 or options["concurrency"] <= 0:
+            raise CommandError("--requests y --concurrency deben ser mayores que cero")
+        urls = [base_url + path for path in islice(cycle(paths), total)]
+
+        def fetch(url):
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=options["timeout"]) as response:
+                    response.read()
+                    ok = 200 <= response.status < 400
+            except (urllib.error.URLError, OSError):
+                ok = False
+            return ok, (time.perf_counter() - start) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            results = list(executor.map(fetch, urls))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for ok, latency in results if ok)
+        errors = sum(1 for ok, _latency in results if not ok)
+        self.stdout.write(f"Solicitudes: {total}  Concurrencia: {options['concurrency']}  Errores: {errors}")
+        self.stdout.write(f"Duración: {elapsed:.2f} s  Rendimiento: {len(latencies) / elapsed:.1f} req/s")
+        if latencies:
+            self.stdout.write(
+                "Latencia (ms): media {:.1f}  p50 {:.1f}  p95 {:.1f}  p99 {:.1f}  máx {:.1f}".format(
+                    statistics.fmean(latencies),
+                    percentile(latencies, 0.50),
+                    percentile(latencies, 0.95),
+                    percentile(latencies, 0.99),
+                    latencies[-1],
+                )
+            )
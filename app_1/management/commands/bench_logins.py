@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Prueba de carga de inicios de sesión contra un servidor en ejecución.
+
+Mide primero la latencia de las páginas indicadas sin carga de login y luego
+durante una ráfaga de inicios de sesión concurrentes (POST /auth/login/). Así
+se ve cuántos logins/s admite el pool de hash (PASSWORD_HASHING_WORKERS) y
+cuánto empeora el p99 del resto de páginas mientras tanto.
+
+El usuario de prueba se crea en la base de datos de settings (la misma que usa
+el servidor) si no existe.
+
+Ejemplo:
+    python manage.py bench_logins http://127.0.0.1:8080 --duration 20 --login-concurrency 32 --path /register/
+"""
+
+import http.cookiejar
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from app_1.management.commands.bench_http import percentile
+
+
+class Results:
+    """Latencias y códigos de estado recogidos por varios hilos"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.statuses = {}
+
+    def add(self, status, latency):
+        with self._lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if status is not None and 200 <= status < 400:
+                self.latencies.append(latency)
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return "sin respuestas correctas"
+        return "media {:.1f}  p50 {:.1f}  p99 {:.1f}  máx {:.1f} ms".format(
+            statistics.fmean(latencies), percentile(latencies, 0.50), percentile(latencies, 0.99), latencies[-1],
+        )
+
+
+def timed_open(opener, request, timeout):
+    start = time.perf_counter()
+    try:
+        with opener.open(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as exc:
+        status = exc.code
+    except (urllib.error.URLError, OSError):
+        status = None
+    return status, (time.perf_counter() - start) * 1000
+
+
+class Command(BaseCommand):
+    help = "Mide logins/s y la latencia de otras páginas durante una ráfaga de inicios de sesión"
+
+    def add_arguments(self, parser):
+        parser.add_argument("base_url", help="URL base del servidor, por ejemplo http://127.0.0.1:8080")
+        parser.add_argument("--path", action="append", dest="paths", help="Página a medir durante la ráfaga (se puede repetir)")
+        parser.add_argument("--duration", type=float, default=10.0, help="Segundos de cada fase")
+        parser.add_argument("--login-concurrency", type=int, default=16, help="Hilos que inician sesión sin pausa")
+        parser.add_argument("--page-concurrency", type=int, default=4, help="Hilos que solicitan las otras páginas")
+        parser.add_argument("--username", default="bench-login@example.com", help="Usuario de prueba")
+        parser.add_argument("--password", default="bench-login-Clave-2024", help="Contraseña del usuario de prueba")
+        parser.add_argument("--timeout", type=float, default=30.0, help="Tiempo máximo por solicitud en segundos")
+
+    def handle(self, *args, **options):
+        if options["duration"] <= 0 or options["login_concurrency"] <= 0 or options["page_concurrency"] <= 0:
+            raise CommandError("--duration y la concurrencia deben ser mayores que cero")
+        self.base_url = options["base_url"].rstrip("/")
+        self.options = options
+        self.ensure_user(options["username"], options["password"])
+        page_urls = [self.base_url + path for path in options["paths"] or ["/register/"]]
+
+        self.stdout.write(f"Línea base ({options['duration']:.0f} s, {options['page_concurrency']} hilos de páginas)")
+        baseline = self.run_phase(page_urls, login_threads=0)
+        self.stdout.write(f"  Páginas: {baseline['pages'].summary()}")
+
+        self.stdout.write(f"Ráfaga de logins ({options['login_concurrency']} hilos)")
+        storm = self.run_phase(page_urls, login_threads=options["login_concurrency"])
+        logins = storm["logins"]
+        succeeded = logins.statuses.get(200, 0)
+        self.stdout.write(
+            f"  Logins: {succeeded / storm['elapsed']:.1f} logins/s  correctos {succeeded}  "
+            f"rechazados (503) {logins.statuses.get(503, 0)}  "
+            f"otros {sum(logins.statuses.values()) - succeeded - logins.statuses.get(503, 0)}"
+        )
+        self.stdout.write(f"  Latencia de login: {logins.summary()}")
+        self.stdout.write(f"  Páginas: {storm['pages'].summary()}")
+        base_latencies, storm_latencies = sorted(baseline["pages"].latencies), sorted(storm["pages"].latencies)
+        if base_latencies and storm_latencies:
+            self.stdout.write("  p99 de las páginas: %.1f ms -> %.1f ms (x%.1f)" % (
+                percentile(base_latencies, 0.99), percentile(storm_latencies, 0.99),
+                percentile(storm_latencies, 0.99) / max(percentile(base_latencies, 0.99), 0.001),
+            ))
+
+    def ensure_user(self, username, password):
+        users = get_user_model()._default_manager
+        user = users.filter(username=username).first()
+        if user is None:
+            users.create_user(username=username, email=username, password=password)
+        elif not user.check_password(password):
+            raise CommandError(f"El usuario '{username}' existe con otra contraseña")
+
+    def run_phase(self, page_urls, login_threads):
+        deadline = time.monotonic() + self.options["duration"]
+        pages, logins = Results(), Results()
+        threads = [threading.Thread(target=self.page_worker, args=(page_urls, index, deadline, pages))
+                   for index in range(self.options["page_concurrency"])]
+        threads += [threading.Thread(target=self.login_worker, args=(deadline, logins)) for _ in range(login_threads)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {"pages": pages, "logins": logins, "elapsed": time.perf_counter() - started}
+
+    def page_worker(self, page_urls, index, deadline, results):
+        opener = urllib.request.build_opener()
+        while time.monotonic() < deadline:
+            url = page_urls[index % len(page_urls)]
+            index += 1
+            results.add(*timed_open(opener, url, self.options["timeout"]))
+
+    def login_worker(self, deadline, results):
+        jar = http.cookiejar.CookieJar()
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+        login_page = self.base_url + reverse("page_login")
+        login_url = self.base_url + reverse("login_submit")
+        # La página de login fija la cookie CSRF
+        timed_open(opener, login_page, self.options["timeout"])
+        body = urllib.parse.urlencode({"username": self.options["username"], "password": self.options["password"]}).encode()
+        while time.monotonic() < deadline:
+            token = next((cookie.value for cookie in jar if cookie.name == settings.CSRF_COOKIE_NAME), "")
+            request = urllib.request.Request(login_url, data=body, headers={
+                "X-CSRFToken": token,
+                "Referer": login_page,
+                "Content-Type": "application/x-www-form-urlencoded",
+            })
+            status, latency = timed_open(opener, request, self.options["timeout"])
+            results.add(status, latency)
+            if status == 503:
+                # Pool de hash lleno: breve pausa antes de reintentar
+                time.sleep(0.1)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Compara el rendimiento de los motores de sesión (ver proyecto/sessions).
+
+Pasa solicitudes por SessionMiddleware con cada motor, en el mismo proceso y
+contra la base de datos configurada, y muestra solicitudes/s y consultas SQL
+por solicitud. Las escrituras del hilo de fondo de write_behind se cuentan
+aparte porque no bloquean la solicitud.
+
+Ejemplos:
+    python manage.py bench_sessions
+    python manage.py bench_sessions --mode write_behind --mode signed_cookies -n 20000 --write-ratio 0.05
+    python manage.py bench_sessions --payload-bytes 4000
+"""
+
+import random
+import string
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from proyecto.middleware import SessionMiddleware
+from proyecto.sessions import write_behind
+
+ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "write_behind": "proyecto.sessions.write_behind",
+    "signed_cookies": "proyecto.sessions.signed_cookies",
+}
+
+
+class QueryCounter:
+    """execute_wrapper que cuenta las consultas de la conexión"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = "Mide solicitudes/s y consultas por solicitud de cada motor de sesión"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", action="append", dest="modes", choices=sorted(ENGINES), help="Motor a medir (se puede repetir; por defecto todos)")
+        parser.add_argument("-n", "--requests", type=int, default=5000, help="Solicitudes por motor")
+        parser.add_argument("--sessions", type=int, default=100, help="Sesiones distintas que se reparten las solicitudes")
+        parser.add_argument("--write-ratio", type=float, default=0.1, help="Fracción de solicitudes que modifican la sesión")
+        parser.add_argument("--payload-bytes", type=int, default=200, help="Tamaño aproximado de los datos de cada sesión")
+        parser.add_argument("--seed", type=int, default=0, help="Semilla de las solicitudes que escriben")
+
+    def handle(self, *args, **options):
+        if options["requests"] <= 0 or options["sessions"] <= 0:
+            raise CommandError("--requests y --sessions deben ser mayores que cero")
+        modes = options["modes"] or list(ENGINES)
+        self.stdout.write(
+            f"Solicitudes: {options['requests']}  Sesiones: {options['sessions']}  "
+            f"Escrituras: {options['write_ratio']:.0%}  Datos: ~{options['payload_bytes']} bytes"
+        )
+        self.stdout.write("%-16s %10s %14s %14s" % ("modo", "req/s", "consultas/req", "escrituras 2º"))
+        for mode in modes:
+            rate, queries, background = self.run_mode(mode, options)
+            self.stdout.write("%-16s %10.0f %14.2f %14d" % (mode, rate, queries, background))
+
+    def run_mode(self, mode, options):
+        store_class = import_module(ENGINES[mode]).SessionStore
+        rng = random.Random(options["seed"])
+        # Datos aleatorios para que la compresión de la cookie no oculte su tamaño
+        padding = "".join(rng.choice(string.ascii_letters) for _ in range(options["payload_bytes"]))
+
+        def view(request):
+            if "padding" not in request.session:
+                request.session["padding"] = padding
+                request.session["visits"] = 0
+            elif rng.random() < options["write_ratio"]:
+                request.session["visits"] += 1
+            return HttpResponse(request.session["visits"])
+
+        middleware = SessionMiddleware(view)
+        middleware.SessionStore = store_class
+        factory = RequestFactory()
+
+        def request(cookie):
+            request = factory.get("/")
+            if cookie:
+                request.COOKIES[settings.SESSION_COOKIE_NAME] = cookie
+            response = middleware(request)
+            morsel = response.cookies.get(settings.SESSION_COOKIE_NAME)
+            return morsel.value if morsel is not None and morsel.value else cookie
+
+        write_behind.writer.flush()
+        cookies = [request(None) for _ in range(options["sessions"])]
+        write_behind.writer.flush()
+        write_behind.writer.reset_stats()
+
+        connection = connections[router.db_for_write(store_class.get_model_class())]
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            for index in range(options["requests"]):
+                slot = index % len(cookies)
+                cookies[slot] = request(cookies[slot])
+        elapsed = time.perf_counter() - started
+        write_behind.writer.flush()
+        background = write_behind.writer.written
+
+        for cookie in set(cookies):
+            store_class(cookie).delete()
+        write_behind.writer.flush()
+        return options["requests"] / elapsed, counter.count / options["requests"], background
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Prepara el despliegue antes de lanzar gunicorn (ver proyecto/boot.py).
+
+Solo ejecuta collectstatic_incremental si cambiaron los estáticos fuente y
+migrate si hay migraciones pendientes; en un reinicio sin cambios termina en
+lo que tardan las comprobaciones.
+
+Ejemplos:
+    python manage.py boot
+    python manage.py boot --force   # ignora el estado guardado y ejecuta todos los pasos
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from proyecto import boot
+
+
+class Command(BaseCommand):
+    help = "Recolecta estáticos y aplica migraciones solo cuando cambiaron, y registra el tiempo de cada fase"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Ejecuta todos los pasos aunque las huellas no hayan cambiado")
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS, help="Base de datos a migrar (por defecto la principal)")
+        parser.add_argument("--workers", type=int, default=None, help="Procesos de collectstatic_incremental (por defecto STATICFILES_WORKERS)")
+
+    def handle(self, *args, **options):
+        def write(text):
+            if text and options["verbosity"] > 0:
+                self.stdout.write(text.rstrip("\n"))
+
+        result = boot.boot(force=options["force"], database=options["database"], workers=options["workers"], write=write)
+        if options["verbosity"] > 0:
+            self.stdout.write("Tiempos de arranque:")
+            for phase, elapsed in result["timings"].items():
+                self.stdout.write("  %-18s %9.1f ms" % (phase, elapsed))
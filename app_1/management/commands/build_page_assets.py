@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Construye el CSS crítico y el paquete JS reducido de las páginas de autenticación.
+
+Analiza cada plantilla que extiende proyecto/common/auth_base.html, escribe los
+resultados en proyecto/static/proyecto/build/ (se versionan junto con el
+código, como vendors.bundle.js) y muestra los bytes transferidos y una
+estimación del primer renderizado antes y después.
+
+Ejemplos:
+    python manage.py build_page_assets
+    python manage.py build_page_assets app_1/page_login.html --rtt 150 --bandwidth 1600
+    python manage.py build_page_assets --check   # falla si los resultados están desactualizados
+"""
+
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand, CommandError
+from django.template import TemplateSyntaxError, engines, loader
+from django.template.loader_tags import ExtendsNode
+from django.test.utils import override_settings
+
+from proyecto import assets
+from proyecto.templatetags import page_assets
+from proyecto.warmup import iter_template_names
+
+BASE_TEMPLATE = "proyecto/common/auth_base.html"
+
+# La construcción resuelve los estáticos por su nombre original, antes de collectstatic
+SOURCE_STORAGES = {
+    **settings.STORAGES,
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+def _read_source(name):
+    path = finders.find(name)
+    if path is None:
+        raise CommandError(f"No se encontró el estático '{name}'")
+    with open(path, encoding="utf-8") as handle:
+        return handle.read()
+
+
+def _static_name(url):
+    if not url.startswith(settings.STATIC_URL):
+        raise CommandError(f"'{url}' no es un estático local y no se puede procesar")
+    return url[len(settings.STATIC_URL):].split("?", 1)[0]
+
+
+class Command(BaseCommand):
+    help = "Genera CSS crítico y paquetes JS por página para las plantillas que extienden auth_base.html"
+
+    def add_arguments(self, parser):
+        parser.add_argument("templates", nargs="*", help="Plantillas a procesar (por defecto todas las que extienden la base)")
+        parser.add_argument("--base", default=BASE_TEMPLATE, help="Plantilla base que deben extender")
+        parser.add_argument("--check", action="store_true", help="No escribe nada; falla si algún resultado está desactualizado")
+        parser.add_argument("--rtt", type=float, default=150.0, help="Latencia de ida y vuelta para la estimación (ms)")
+        parser.add_argument("--bandwidth", type=float, default=1600.0, help="Ancho de banda para la estimación (kbit/s)")
+
+    def handle(self, *args, **options):
+        template_names = options["templates"] or self.discover(options["base"])
+        if not template_names:
+            raise CommandError(f"Ninguna plantilla extiende {options['base']}")
+        stale = []
+        with override_settings(STORAGES=SOURCE_STORAGES):
+            vendor_modules = assets.split_vendor_bundle(_read_source(assets.VENDORS_BUNDLE))
+            app_source = _read_source(assets.APP_BUNDLE)
+            for template_name in template_names:
+                before = self.render(template_name, enabled=False)
+                outputs = self.build(template_name, vendor_modules, app_source)
+                for name, content in outputs.items():
+                    path = os.path.join(assets.BUILD_DIR, os.path.relpath(name, assets.BUILD_PREFIX))
+                    if self.read_file(path) == content:
+                        continue
+                    if options["check"]:
+                        stale.append(name)
+                        continue
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(path, "w", encoding="utf-8") as handle:
+                        handle.write(content)
+                    self.stdout.write(f"Escrito {name} ({len(content.encode('utf-8')) / 1024:.1f} KB)")
+                if not options["check"]:
+                    page_assets.clear_cache()
+                    after = self.render(template_name, enabled=True)
+                    self.report(template_name, before, after, options["rtt"], options["bandwidth"])
+        if stale:
+            raise CommandError("Resultados desactualizados (ejecute build_page_assets): " + ", ".join(stale))
+
+    def discover(self, base):
+        names = []
+        for engine in engines.all():
+            template_dirs = getattr(engine, "template_dirs", None)
+            if template_dirs is None:
+                continue
+            for name in iter_template_names(template_dirs):
+                try:
+                    template = engine.get_template(name).template
+                except (TemplateSyntaxError, UnicodeDecodeError):
+                    continue
+                extends = [node for node in template.nodelist if isinstance(node, ExtendsNode)]
+                if extends and extends[0].parent_name.var == base:
+                    names.append(name)
+        return sorted(set(names))
+
+    def render(self, template_name, enabled, build=False):
+        with override_settings(PAGE_ASSETS_ENABLED=enabled):
+            return loader.get_template(template_name).render({"page_assets_build": build})
+
+    def read_file(self, path):
+        try:
+            with open(path, encoding="utf-8") as handle:
+                return handle.read()
+        except OSError:
+            return None
+
+    def build(self, template_name, vendor_modules, app_source):
+        """Contenido de los resultados de una plantilla: {nombre de estático: texto}"""
+        html = self.render(template_name, enabled=False, build=True)
+        inventory = assets.inventory_page(html)
+        scripts = [
+            (name, _read_source(name))
+            for name in map(_static_name, inventory.scripts)
+            if name not in (assets.VENDORS_BUNDLE, assets.APP_BUNDLE)
+        ]
+        for _name, source in scripts:
+            inventory.add_runtime_names(source)
+
+        critical_name = assets.build_name(template_name, assets.CRITICAL_SUFFIX)
+        stylesheets = [(name, _read_source(name)) for name in map(_static_name, inventory.stylesheets)]
+        header = "/* Generado por build_page_assets a partir de %s; no editar */\n" % template_name
+        outputs = {critical_name: header + assets.critical_css(stylesheets, inventory, critical_name)}
+
+        if inventory.inline_scripts:
+            self.stderr.write(f"{template_name}: tiene scripts en línea entre page_scripts; no se genera paquete JS")
+            return outputs
+        page_sources = html + "\n".join(source for _name, source in scripts)
+        modules = assets.required_modules(page_sources)
+        bundle = assets.js_bundle(modules, vendor_modules, app_source, scripts)
+        outputs[assets.build_name(template_name, assets.BUNDLE_SUFFIX)] = header + bundle
+        self.stdout.write(f"{template_name}: módulos JS {', '.join(modules) or '(ninguno)'}")
+        return outputs
+
+    def measure(self, html, rtt, bandwidth):
+        css = js = blocking = blocking_requests = 0
+        for kind, url, is_blocking in assets.page_resources(html):
+            size = assets.gzip_size(_read_source(_static_name(url)))
+            if kind == "css":
+                css += size
+            else:
+                js += size
+            if is_blocking:
+                blocking += size
+                blocking_requests += 1
+        html_size = assets.gzip_size(html)
+        return {
+            "html": html_size,
+            "css": css,
+            "js": js,
+            "total": html_size + css + js,
+            "blocking": blocking,
+            "first_render": assets.estimate_first_render(html_size, blocking, blocking_requests, rtt, bandwidth),
+        }
+
+    def report(self, template_name, before, after, rtt, bandwidth):
+        self.stdout.write(f"{template_name} (bytes con gzip; estimación con RTT {rtt:.0f} ms y {bandwidth:.0f} kbit/s):")
+        self.stdout.write("  %-8s %9s %9s %9s %9s %11s %14s" % ("", "HTML", "CSS", "JS", "total", "bloqueante", "1er render"))
+        for label, html in (("antes", before), ("después", after)):
+            row = self.measure(html, rtt, bandwidth)
+            self.stdout.write("  %-8s %8.1fK %8.1fK %8.1fK %8.1fK %10.1fK %11.0f ms" % (
+                label, row["html"] / 1024, row["css"] / 1024, row["js"] / 1024, row["total"] / 1024,
+                row["blocking"] / 1024, row["first_render"],
+            ))
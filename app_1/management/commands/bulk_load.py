@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Carga masiva de archivos CSV/JSONL en un modelo (ver proyecto/db/bulk.py).
+
+Reemplaza a los INSERT escritos a mano de SQL/MySQL/InsertTables.sql: lee el
+archivo en flujo, lo envía en lotes por la vía más rápida del motor de
+DATABASE_SELECTOR y muestra el avance y las filas por segundo.
+
+Ejemplos:
+    python manage.py bulk_load app_1.Modelo datos.csv
+    python manage.py bulk_load app_1.Modelo datos.jsonl.gz --batch-size 20000 --defer-indexes
+    python manage.py bulk_load auth.User usuarios.csv --method bulk-create
+"""
+
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from proyecto.db import bulk
+
+
+class Command(BaseCommand):
+    help = "Carga archivos CSV/JSONL de cualquier tamaño en un modelo usando COPY, LOAD DATA o INSERT por lotes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("model", help="Modelo destino como app_label.Modelo")
+        parser.add_argument("path", help="Archivo .csv, .tsv, .jsonl o .ndjson (opcionalmente .gz)")
+        parser.add_argument("--format", choices=("csv", "jsonl"), help="Formato si no se deduce de la extensión")
+        parser.add_argument("--delimiter", help="Separador de columnas del CSV (por defecto ',' o tabulador en .tsv)")
+        parser.add_argument("--encoding", default="utf-8", help="Codificación del archivo")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Filas por lote")
+        parser.add_argument("--method", choices=bulk.METHODS, default="auto", help="Vía de carga (por defecto la más rápida del motor)")
+        parser.add_argument(
+            "--defer-indexes", action="store_true",
+            help="PostgreSQL: recrea los índices secundarios al final. MySQL: desactiva foreign_key_checks y "
+                 "unique_checks durante la carga (el archivo no debe tener duplicados)",
+        )
+        parser.add_argument("--ignore-unknown", action="store_true", help="Ignora las columnas que no existen en el modelo")
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS, help="Base de datos destino")
+        parser.add_argument("--progress-interval", type=float, default=2.0, help="Segundos entre mensajes de avance")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] <= 0:
+            raise CommandError("--batch-size debe ser mayor que cero")
+        try:
+            model = apps.get_model(options["model"])
+        except (LookupError, ValueError) as exc:
+            raise CommandError(f"Modelo desconocido '{options['model']}': {exc}")
+
+        last_report = [time.perf_counter()]
+
+        def progress(result, fraction):
+            now = time.perf_counter()
+            if now - last_report[0] < options["progress_interval"]:
+                return
+            last_report[0] = now
+            percent = " (%.0f%%)" % (fraction * 100) if fraction is not None else ""
+            self.stderr.write("  %d filas%s, %.0f filas/s" % (result.rows, percent, result.rows_per_second))
+
+        try:
+            source = bulk.SourceFile(options["path"], options["format"], options["delimiter"], options["encoding"])
+            with source:
+                result = bulk.load(
+                    model, source,
+                    batch_size=options["batch_size"],
+                    method=options["method"],
+                    database=options["database"],
+                    defer_indexes=options["defer_indexes"],
+                    ignore_unknown=options["ignore_unknown"],
+                    progress=progress,
+                )
+        except bulk.BulkLoadError as exc:
+            raise CommandError(str(exc))
+        except OSError as exc:
+            raise CommandError(f"No se pudo leer '{options['path']}': {exc}")
+
+        if result.fallback:
+            self.stderr.write(self.style.WARNING(f"LOAD DATA no disponible ({result.fallback}); se usó INSERT por lotes"))
+        self.stdout.write(self.style.SUCCESS(
+            "%d filas cargadas en %s en %.2f s (%.0f filas/s, vía %s)"
+            % (result.rows, model._meta.label, result.elapsed, result.rows_per_second, result.method)
+        ))
+        if result.skipped:
+            self.stdout.write(self.style.WARNING(f"El servidor omitió {result.skipped} filas (duplicados o datos inválidos)"))
+        if result.rebuilt_indexes:
+            self.stdout.write(f"Índices recreados: {result.rebuilt_indexes}")
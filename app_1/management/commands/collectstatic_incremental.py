@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+collectstatic con desglose de tiempos por fase.
+
+Con proyecto.staticfiles.IncrementalManifestStaticFilesStorage solo se
+calculan hashes, se optimizan imágenes y se comprimen los archivos que
+cambiaron desde la ejecución anterior; este comando además permite fijar el
+número de procesos y muestra cuánto tardó cada fase y cuántos bytes de
+imágenes se ahorraron.
+
+Ejemplo:
+    python manage.py collectstatic_incremental --noinput --workers 4
+"""
+
+import time
+
+from django.contrib.staticfiles.management.commands import collectstatic
+from django.template.defaultfilters import filesizeformat
+
+
+class Command(collectstatic.Command):
+    help = "Recolecta los estáticos procesando solo los archivos modificados y muestra el tiempo de cada fase"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--workers", type=int, default=None,
+            help="Procesos para calcular hashes y comprimir (por defecto STATICFILES_WORKERS)",
+        )
+
+    def set_options(self, **options):
+        super().set_options(**options)
+        if options.get("workers") and hasattr(self.storage, "workers"):
+            self.storage.workers = options["workers"]
+
+    def collect(self):
+        start = time.perf_counter()
+        collected = super().collect()
+        total = time.perf_counter() - start
+        self.report(total)
+        return collected
+
+    def report(self, total):
+        timings = getattr(self.storage, "timings", {})
+        counts = getattr(self.storage, "counts", {})
+        post_processing = sum(timings.values())
+        rows = [
+            ("copia", total - post_processing, "%d copiados, %d sin cambios" % (len(self.copied_files), len(self.unmodified_files))),
+            ("hash previo", timings.get("prehash", 0.0), "%d calculados, %d en caché" % (counts.get("hashed", 0), counts.get("hash_cached", 0))),
+            ("hash y reescritura", timings.get("hash", 0.0), ""),
+            ("manifiesto", timings.get("manifest", 0.0), ""),
+            ("imágenes", timings.get("images", 0.0), "%d optimizadas, %d en caché" % (counts.get("images", 0), counts.get("images_cached", 0))),
+            ("compresión", timings.get("compress", 0.0), "%d comprimidos, %d en caché" % (counts.get("compressed", 0), counts.get("compress_cached", 0))),
+        ]
+        self.stdout.write("Tiempos de collectstatic (%d procesos):" % getattr(self.storage, "workers", 1))
+        for phase, seconds, detail in rows:
+            self.stdout.write("  %-20s %8.1f ms  %s" % (phase, seconds * 1000, detail))
+        self.stdout.write("  %-20s %8.1f ms" % ("total", total * 1000))
+        image_bytes = getattr(self.storage, "image_bytes", {})
+        if image_bytes.get("before"):
+            before = image_bytes["before"]
+            self.stdout.write("Bytes de imágenes: %s originales, %s recomprimidas (%+.1f%%), %s con la mejor variante (%+.1f%%)" % (
+                filesizeformat(before),
+                filesizeformat(image_bytes["after"]), (image_bytes["after"] - before) * 100 / before,
+                filesizeformat(image_bytes["best"]), (image_bytes["best"] - before) * 100 / before,
+            ))
+        missing = sorted(getattr(self.storage, "missing_references", ()))
+        if missing:
+            self.stdout.write(self.style.WARNING("Referencias a archivos inexistentes (se dejaron sin hash):"))
+            for name in missing:
+                self.stdout.write("  %s" % name)
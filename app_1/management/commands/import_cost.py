@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Mide el costo de importación (tiempo y memoria) del arranque y de cada módulo.
+
+Sin --module lanza un intérprete nuevo con `python -X importtime` que hace lo
+mismo que un worker de gunicorn al arrancar (--target wsgi: importa
+proyecto.wsgi, con django.setup(), el URLconf, las vistas y las plantillas
+precompiladas; --target setup: solo django.setup()). Muestra el tiempo, el RSS
+que añade, los módulos cargados y los paquetes que más tiempo suman, contando
+solo el tiempo propio de sus módulos (sin los que importan de otros paquetes).
+Avisa si el arranque cargó alguno de LAZY_PACKAGES, que solo deben importarse
+al usarse; con --check además termina con error, para usarlo en CI.
+
+Con --module mide cada módulo en un intérprete aparte, después de
+django.setup(): tiempo, RSS y módulos nuevos que añade.
+
+Ejemplos:
+    python manage.py import_cost
+    python manage.py import_cost --target setup --top 25
+    python manage.py import_cost --module boto3 --module reportlab.platypus --module xlsxwriter
+    IS_DEPLOYED=True python manage.py import_cost --check
+"""
+
+import json
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Paquetes que el arranque no debe importar: se cargan al usar S3 o al exportar
+LAZY_PACKAGES = ("boto3", "botocore", "s3transfer", "reportlab", "xlsxwriter")
+
+# Se ejecuta en el intérprete nuevo; imprime el resultado como JSON en la última línea
+CHILD = """
+import json, os, sys, time
+
+def rss():
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        pass
+    # Sin /proc: se importa aquí para no contarlo en lo medido
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0
+    # Máximo de la vida del proceso, en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+target, module = sys.argv[1], sys.argv[2]
+if module:
+    import django
+    django.setup()
+before_rss, before_modules, started = rss(), set(sys.modules), time.perf_counter()
+if module:
+    __import__(module)
+elif target == "wsgi":
+    import proyecto.wsgi
+else:
+    import django
+    django.setup()
+print(json.dumps({
+    "seconds": time.perf_counter() - started,
+    "rss": rss() - before_rss,
+    "modules": len(set(sys.modules) - before_modules),
+    "packages": sorted({name.split(".")[0] for name in sys.modules}),
+}))
+"""
+
+
+def parse_importtime(output):
+    """{paquete: [módulos, microsegundos propios]} de la salida de `python -X importtime`"""
+    packages = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # Cabecera
+        entry = packages.setdefault(fields[2].strip().split(".")[0], [0, 0])
+        entry[0] += 1
+        entry[1] += int(fields[0])
+    return packages
+
+
+def run_child(target, module="", importtime=False):
+    """(resultado del intérprete nuevo, salida de error)"""
+    command = [sys.executable, *(["-X", "importtime"] if importtime else []), "-c", CHILD, target, module]
+    completed = subprocess.run(command, cwd=settings.BASE_DIR, capture_output=True, text=True)
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        raise CommandError(f"No se pudo importar {module or target}:\n{completed.stderr[-2000:]}")
+    return json.loads(lines[-1]), completed.stderr
+
+
+class Command(BaseCommand):
+    help = "Mide el tiempo y la memoria de importación del arranque de un worker o de módulos concretos"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target", choices=("wsgi", "setup"), default="wsgi", help="Arranque que se mide (por defecto, el de un worker WSGI)")
+        parser.add_argument("--top", type=int, default=15, help="Paquetes más costosos que se muestran")
+        parser.add_argument("--module", action="append", dest="modules", default=[], help="Módulo que se mide tras django.setup() (se puede repetir)")
+        parser.add_argument("--check", action="store_true", help="Termina con error si el arranque carga alguno de LAZY_PACKAGES")
+
+    def handle(self, *args, **options):
+        if options["modules"]:
+            self.stdout.write("%-32s %10s %10s %8s" % ("módulo", "tiempo", "RSS", "módulos"))
+            for module in options["modules"]:
+                result, _stderr = run_child("setup", module)
+                self.stdout.write("%-32s %7.1f ms %7.1f MB %8d" % (module, result["seconds"] * 1000, result["rss"] / 1048576, result["modules"]))
+            return
+
+        result, stderr = run_child(options["target"], importtime=True)
+        self.stdout.write(
+            f"Arranque ({options['target']}): {result['seconds'] * 1000:.0f} ms, "
+            f"RSS +{result['rss'] / 1048576:.1f} MB, {result['modules']} módulos"
+        )
+        packages = sorted(parse_importtime(stderr).items(), key=lambda item: item[1][1], reverse=True)
+        self.stdout.write("%-24s %8s %12s" % ("paquete", "módulos", "importación"))
+        for name, (modules, microseconds) in packages[:options["top"]]:
+            self.stdout.write("%-24s %8d %9.1f ms" % (name, modules, microseconds / 1000))
+
+        loaded = [name for name in LAZY_PACKAGES if name in result["packages"]]
+        if not loaded:
+            self.stdout.write(f"Sin cargar al arrancar: {', '.join(LAZY_PACKAGES)}")
+            return
+        message = f"El arranque carga paquetes que solo deberían importarse al usarse: {', '.join(loaded)}"
+        if options["check"]:
+            raise CommandError(message)
+        self.stdout.write(self.style.WARNING(message))
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Purga o vaciado de modelos en PostgreSQL y MySQL (ver proyecto/db/purge.py).
+
+Reemplaza a SQL/MySQL/DeleteTables.sql. Sin --truncate borra por rangos de
+clave primaria, en transacciones cortas y con pausas, así que puede ejecutarse
+contra la base de datos en producción; --truncate vacía las tablas completas
+y reinicia los contadores de id.
+
+Ejemplos:
+    python manage.py purge_data auth.User --filter last_login__lt=2023-01-01 --filter is_staff=False
+    python manage.py purge_data app_1.Modelo --chunk-time 0.2 --sleep 0.5 --max-lag 5
+    python manage.py purge_data app_1.Modelo auth.User --truncate --cascade
+    python manage.py purge_data auth.User --filter is_active=False --dry-run
+"""
+
+import time
+
+from django.apps import apps
+from django.core.exceptions import FieldError, ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from proyecto.db import purge
+
+
+def parse_filter(text):
+    """'campo__lookup=valor' -> (clave, valor); __in admite valores separados por comas"""
+    key, separator, value = text.partition("=")
+    if not separator or not key:
+        raise CommandError(f"Filtro inválido '{text}'; use campo__lookup=valor")
+    if key.endswith("__in"):
+        return key, [item for item in value.split(",") if item]
+    if key.endswith("__isnull"):
+        return key, value.lower() in ("1", "true", "t", "si", "sí", "yes")
+    return key, value
+
+
+class Command(BaseCommand):
+    help = "Purga filas por rangos de clave primaria o vacía modelos completos con TRUNCATE"
+
+    def add_arguments(self, parser):
+        parser.add_argument("models", nargs="+", help="Modelos como app_label.Modelo")
+        parser.add_argument("--filter", action="append", default=[], dest="filters", help="Filtro campo__lookup=valor (se puede repetir)")
+        parser.add_argument("--truncate", action="store_true", help="Vacía las tablas completas y reinicia los contadores de id")
+        parser.add_argument("--cascade", action="store_true", help="Con --truncate, vacía también los modelos que referencian a los seleccionados")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Ancho inicial del rango de claves primarias")
+        parser.add_argument("--chunk-time", type=float, default=0.5, help="Duración objetivo de cada borrado en segundos")
+        parser.add_argument("--sleep", type=float, default=0.05, help="Pausa entre borrados en segundos")
+        parser.add_argument("--max-lag", type=float, default=5.0, help="Retraso máximo de las réplicas antes de seguir (0 = no esperar)")
+        parser.add_argument("--dry-run", action="store_true", help="Solo muestra cuántas filas se borrarían")
+        parser.add_argument("--noinput", "--no-input", action="store_false", dest="interactive", help="No pide confirmación")
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS, help="Base de datos")
+        parser.add_argument("--progress-interval", type=float, default=2.0, help="Segundos entre mensajes de avance")
+
+    def handle(self, *args, **options):
+        try:
+            selected = [apps.get_model(label) for label in options["models"]]
+        except (LookupError, ValueError) as exc:
+            raise CommandError(f"Modelo desconocido: {exc}")
+        database = options["database"]
+        if options["truncate"]:
+            if options["filters"]:
+                raise CommandError("--truncate vacía las tablas completas; no admite --filter")
+            self.truncate(selected, database, options)
+            return
+        if options["chunk_size"] <= 0 or options["chunk_time"] <= 0:
+            raise CommandError("--chunk-size y --chunk-time deben ser mayores que cero")
+        filters = dict(parse_filter(text) for text in options["filters"])
+        for model in selected:
+            try:
+                queryset = model._base_manager.using(database).filter(**filters)
+                if options["dry_run"] or options["interactive"]:
+                    count = queryset.count()
+            except (FieldError, ValidationError, ValueError) as exc:
+                raise CommandError(f"Filtro inválido para {model._meta.label}: {exc}")
+            if options["dry_run"]:
+                self.stdout.write(f"{model._meta.label}: se borrarían {count} filas")
+                continue
+            if options["interactive"] and not self.confirm(f"Se borrarán {count} filas de {model._meta.label}"):
+                continue
+            self.purge(model, queryset, options)
+
+    def confirm(self, message):
+        answer = input(f"{message}. ¿Continuar? Escriba 'si' para confirmar: ")
+        return answer.strip().lower() in ("si", "sí", "yes")
+
+    def truncate(self, selected, database, options):
+        if options["dry_run"]:
+            referencing = purge.referencing_models(selected)
+            self.stdout.write("Se vaciarían: %s" % ", ".join(model._meta.label for model in selected))
+            if referencing:
+                self.stdout.write("Referenciados por: %s" % ", ".join(model._meta.label for model in referencing))
+            return
+        labels = ", ".join(model._meta.label for model in selected)
+        if options["interactive"] and not self.confirm(f"Se vaciarán por completo {labels}"):
+            return
+        started = time.perf_counter()
+        try:
+            tables = purge.truncate_models(selected, database, cascade=options["cascade"])
+        except purge.PurgeError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            "Tablas vaciadas en %.2f s: %s" % (time.perf_counter() - started, ", ".join(tables))
+        ))
+
+    def purge(self, model, queryset, options):
+        last_report = [time.perf_counter()]
+
+        def progress(stats):
+            now = time.perf_counter()
+            if now - last_report[0] < options["progress_interval"]:
+                return
+            last_report[0] = now
+            self.stderr.write("  %s: %d filas borradas, %.0f filas/s, clave %s, rango %d" % (
+                model._meta.label, stats.deleted, stats.rows_per_second, stats.position, stats.chunk_size,
+            ))
+
+        stats = purge.chunked_delete(
+            queryset,
+            chunk_size=options["chunk_size"],
+            chunk_time=options["chunk_time"],
+            sleep=options["sleep"],
+            max_lag=options["max_lag"],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            "%s: %d filas borradas en %d lotes y %.2f s (%.0f filas/s, %.1f s esperando a las réplicas)" % (
+                model._meta.label, stats.deleted, stats.chunks, stats.elapsed, stats.rows_per_second, stats.waited,
+            )
+        ))
@@ -4,6 +4,7 @@
  * Este script maneja:
  * - Configuración de tema desde localStorage
  * - Validación del formulario de registro
+ * - Envío AJAX del formulario (submitForm, de proyecto/js/auth_common.js)
  */
 
 'use strict';
@@ -77,16 +78,16 @@ document.addEventListener('DOMContentLoaded', function() {
             // Obtener el formulario para aplicar validación de Bootstrap
             let form = document.getElementById("js-register");
 
+            event.preventDefault();
             if (form && form.checkValidity() === false) {
-                event.preventDefault();
                 event.stopPropagation();
+            } else if (form) {
+                submitForm(form, registerBtn);
             }
 
             if (form) {
                 form.classList.add('was-validated');
             }
-
-            // Aquí se puede realizar el submit AJAX...
         });
     }
 });
@@ -1,3 +1,1218 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import global_settings, settings
+from django.contrib import messages
+from django.contrib.auth import hashers
+from django.contrib.auth.models import AnonymousUser, Group, User
+from django.contrib.auth.signals import user_login_failed
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from PIL import Image
+
+from app_1 import admin as app_admin
+from app_1 import cache as app_cache
+from app_1 import exports, views
+from app_1.cache import ResponseCache, response_cache
+from app_1.forms import RegisterForm
+from app_1.management.commands import import_cost, purge_data
+from proyecto import assets, boot, cache_backends, covers, gunicorn_conf, images, jobs, metrics, passwords, ratelimit
+from proyecto.db import bulk, pagination, purge, routers
+from proyecto.db.pool import ConnectionPool, PoolTimeout
+from proyecto.logging_handlers import DispatchQueueHandler, JsonFormatter, LogDispatcher, SamplingFilter
+from proyecto.sessions import signed_cookies, write_behind
+from proyecto.warmup import warmup_templates
+
+# Las pruebas no ejecutan collectstatic, así que no existe el manifiesto de estáticos
+_static_storage = override_settings(STORAGES={
+    **settings.STORAGES,
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+})
+
+
+# Las pruebas no escriben la caché ni las métricas en las rutas del nodo
+_runtime_dir = tempfile.TemporaryDirectory()
+_runtime_paths = override_settings(
+    METRICS_DIR=os.path.join(_runtime_dir.name, "metrics"),
+    CACHES={"default": {**settings.CACHES["default"], "LOCATION": os.path.join(_runtime_dir.name, "cache.sqlite3")}},
+)
+
+
+def setUpModule():
+    _static_storage.enable()
+    _runtime_paths.enable()
+
+
+def tearDownModule():
+    # La última escritura de las métricas, aún en el directorio temporal
+    metrics.registry.stop()
+    _runtime_paths.disable()
+    _static_storage.disable()
+    _runtime_dir.cleanup()
+
+
+class ResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        response_cache.clear()
+
+    def test_lru_evicts_least_recently_used(self):
+        cache = ResponseCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_page_login_is_served_from_cache(self):
+        first = self.client.get(reverse("page_login"))
+        second = self.client.get(reverse("page_login"))
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(response_cache.stats()["misses"], 1)
+        self.assertEqual(response_cache.stats()["hits"], 1)
+
+    def test_version_change_invalidates_entry(self):
+        self.client.get(reverse("page_register"))
+        with mock.patch("app_1.cache.template_version", return_value="otra-version"):
+            self.client.get(reverse("page_register"))
+        self.assertEqual(response_cache.stats()["misses"], 2)
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_disabled_cache_bypasses_lru(self):
+        self.client.get(reverse("page_login"))
+        self.assertEqual(response_cache.stats()["misses"], 0)
+
+    async def test_async_views_share_the_cache(self):
+        request = AsyncRequestFactory().get("/")
+        first = await views.apage_login(request)
+        second = await views.apage_login(request)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(response_cache.stats()["hits"], 1)
+
+
+class AsyncMiddlewareTests(SimpleTestCase):
+    async def run_message_middleware(self, view):
+        from proyecto.middleware import MessageMiddleware
+
+        threads = []
+
+        def process_response(request, response):
+            threads.append(threading.current_thread())
+            return response
+
+        middleware = MessageMiddleware(view)
+        request = AsyncRequestFactory().get("/")
+        request.session = {}
+        with mock.patch.object(middleware, "process_response", side_effect=process_response):
+            await middleware(request)
+        return threads[0]
+
+    async def test_messages_are_stored_outside_the_event_loop(self):
+        async def view(request):
+            messages.info(request, "Guardado")
+            return HttpResponse()
+
+        self.assertIsNot(await self.run_message_middleware(view), threading.current_thread())
+
+    async def test_requests_without_messages_stay_on_the_event_loop(self):
+        async def view(request):
+            return HttpResponse()
+
+        self.assertIs(await self.run_message_middleware(view), threading.current_thread())
+
+
+class ConditionalPageTests(SimpleTestCase):
+    def setUp(self):
+        response_cache.clear()
+        app_cache._validators.clear()
+
+    def test_matching_etag_gets_304_without_running_the_view(self):
+        first = self.client.get(reverse("page_login"))
+        self.assertTrue(first["ETag"].startswith('"'))
+        self.assertIn("Last-Modified", first)
+        self.assertEqual(first["Cache-Control"], "no-cache")
+        second = self.client.get(reverse("page_login"), headers={"if-none-match": first["ETag"]})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.content, b"")
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertEqual(second["Cache-Control"], "no-cache")
+        # La vista (y la caché de respuestas) no se ejecutó en la segunda solicitud
+        self.assertEqual(response_cache.stats()["hits"] + response_cache.stats()["misses"], 1)
+
+    def test_new_template_version_changes_etag(self):
+        etag = self.client.get(reverse("page_register"))["ETag"]
+        app_cache._validators.clear()
+        with mock.patch("app_1.cache.template_version", return_value="otra-version"):
+            response = self.client.get(reverse("page_register"), headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    @override_settings(PAGE_CACHE_CONTROL={"page_register": "public, max-age=60"})
+    def test_cache_control_is_configured_per_url_name(self):
+        self.assertEqual(self.client.get(reverse("page_register"))["Cache-Control"], "public, max-age=60")
+        self.assertNotIn("Cache-Control", self.client.get(reverse("page_login")))
+
+    @override_settings(PAGE_ETAGS_ENABLED=False)
+    def test_disabled_etags_leave_response_untouched(self):
+        self.assertNotIn("ETag", self.client.get(reverse("page_login")))
+
+    async def test_async_view_answers_304(self):
+        etag, _last_modified = app_cache.template_validators("app_1/page_login.html")
+        request = AsyncRequestFactory().get("/", headers={"if-none-match": etag})
+        response = await views.apage_login(request)
+        self.assertEqual(response.status_code, 304)
+
+
+class TemplateWarmupTests(SimpleTestCase):
+    def test_warmup_compiles_project_and_app_templates(self):
+        names = {name for _engine, name, _elapsed in warmup_templates()}
+        self.assertIn("proyecto/common/auth_base.html", names)
+        self.assertIn("app_1/page_login.html", names)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def test_checkin_reuses_connection(self):
+        pool = ConnectionPool(max_size=2)
+        first = pool.checkout(FakeConnection)
+        pool.checkin(first)
+        self.assertIs(pool.checkout(FakeConnection), first)
+        stats = pool.stats()
+        self.assertEqual(stats["checkouts"], 2)
+        self.assertEqual(stats["connections_created"], 1)
+
+    def test_full_pool_times_out(self):
+        pool = ConnectionPool(max_size=1, timeout=0.01)
+        pool.checkout(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.checkout(FakeConnection)
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+    def test_unhealthy_connection_is_replaced(self):
+        pool = ConnectionPool(max_size=1, idle_check_after=0)
+        first = pool.checkout(FakeConnection)
+        pool.checkin(first)
+        second = pool.checkout(FakeConnection, is_usable=lambda connection: False)
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.stats()["health_check_failures"], 1)
+
+    def test_discarded_connection_frees_slot(self):
+        pool = ConnectionPool(max_size=1, timeout=0.01)
+        first = pool.checkout(FakeConnection)
+        pool.checkin(first, discard=True)
+        self.assertTrue(first.closed)
+        self.assertIsNot(pool.checkout(FakeConnection), first)
+
+
+@override_settings(DATABASE_REPLICAS=["replica_1", "replica_2"])
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+        self.token = routers.reset_pinning()
+
+    def tearDown(self):
+        routers.restore_pinning(self.token)
+
+    def test_reads_go_to_healthy_replicas(self):
+        with mock.patch.object(routers.replica_health, "is_healthy", side_effect=lambda alias: alias == "replica_2"):
+            self.assertEqual(self.router.db_for_read(None), "replica_2")
+
+    def test_reads_fall_back_to_primary_without_healthy_replicas(self):
+        with mock.patch.object(routers.replica_health, "is_healthy", return_value=False):
+            self.assertEqual(self.router.db_for_read(None), "default")
+
+    def test_write_pins_following_reads_to_primary(self):
+        with mock.patch.object(routers.replica_health, "is_healthy", return_value=True):
+            self.assertEqual(self.router.db_for_write(None), "default")
+            self.assertEqual(self.router.db_for_read(None), "default")
+
+    def test_failed_check_takes_replica_out_of_rotation(self):
+        health = routers.ReplicaHealth(check_interval=60)
+        with mock.patch.object(health, "check", return_value=False) as check:
+            self.assertFalse(health.is_healthy("replica_1"))
+            self.assertFalse(health.is_healthy("replica_1"))
+        self.assertEqual(check.call_count, 1)
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate("replica_1", "app_1"))
+        self.assertIsNone(self.router.allow_migrate("default", "app_1"))
+
+
+class LoggingPipelineTests(SimpleTestCase):
+    def make_record(self, level=logging.DEBUG, msg="consulta %s", args=("SELECT 1",)):
+        return logging.LogRecord("django.db.backends", level, __file__, 1, msg, args, None)
+
+    def test_sampling_filter_keeps_fraction_of_debug_records(self):
+        sampling = SamplingFilter(rate=0.25)
+        with mock.patch("proyecto.logging_handlers.random.random", side_effect=[0.1, 0.9]):
+            self.assertTrue(sampling.filter(self.make_record()))
+            self.assertFalse(sampling.filter(self.make_record()))
+        self.assertTrue(sampling.filter(self.make_record(level=logging.WARNING)))
+
+    def test_json_formatter_emits_one_object_per_record(self):
+        payload = json.loads(JsonFormatter().format(self.make_record()))
+        self.assertEqual(payload["message"], "consulta SELECT 1")
+        self.assertEqual(payload["level"], "DEBUG")
+
+    def test_dispatcher_delivers_records_on_background_thread(self):
+        target = mock.Mock(level=logging.DEBUG)
+        dispatcher = LogDispatcher()
+        dispatcher.start()
+        DispatchQueueHandler(dispatcher, [target]).handle(self.make_record())
+        dispatcher.stop()
+        record = target.handle.call_args.args[0]
+        self.assertEqual(record.msg, "consulta SELECT 1")
+        self.assertIsNone(record.args)
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        self.metrics_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.metrics_dir.cleanup)
+        override = override_settings(METRICS_DIR=self.metrics_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_response_carries_server_timing(self):
+        response = self.client.get(reverse("page_login"))
+        header = response["Server-Timing"]
+        self.assertIn("total;dur=", header)
+        self.assertIn("tpl;dur=", header)
+        self.assertIn("db;dur=", header)
+
+    def test_histogram_is_rendered_cumulatively(self):
+        registry = metrics.Registry()
+        registry.declare("latencia_seconds", "histogram", "Latencia", (0.1, 1.0))
+        registry.observe("latencia_seconds", 0.05, {"url_name": "page_login"})
+        registry.observe("latencia_seconds", 0.5, {"url_name": "page_login"})
+        body = metrics.render_prometheus(metrics.merge_snapshots([registry.snapshot()]))
+        self.assertIn('latencia_seconds_bucket{url_name="page_login",le="0.1"} 1', body)
+        self.assertIn('latencia_seconds_bucket{url_name="page_login",le="+Inf"} 2', body)
+        self.assertIn('latencia_seconds_count{url_name="page_login"} 2', body)
+
+    def test_snapshots_of_all_workers_are_merged(self):
+        def snapshot(pid, requests, in_use):
+            return {"pid": pid, "time": 0, "metrics": {
+                "solicitudes_total": {"type": "counter", "help": "", "buckets": None, "samples": [{"labels": {}, "value": requests}]},
+                "en_uso": {"type": "gauge", "help": "", "buckets": None, "samples": [{"labels": {}, "value": in_use}]},
+            }}
+
+        with mock.patch("proyecto.metrics._pid_alive", side_effect=lambda pid: pid == 1):
+            merged = metrics.merge_snapshots([snapshot(1, 3, 2), snapshot(2, 4, 5)])
+        self.assertEqual(merged["solicitudes_total"]["series"][()], 7)
+        # Los gauges de un worker terminado no se suman
+        self.assertEqual(merged["en_uso"]["series"][()], 2)
+
+    def test_dead_workers_are_compacted_into_the_aggregate(self):
+        def write(filename, pid, started, requests):
+            with open(os.path.join(self.metrics_dir.name, filename), "w") as handle:
+                json.dump({"pid": pid, "token": filename, "started": started, "time": 0, "metrics": {
+                    "solicitudes_total": {"type": "counter", "help": "", "buckets": None, "samples": [{"labels": {}, "value": requests}]},
+                    "en_uso": {"type": "gauge", "help": "", "buckets": None, "samples": [{"labels": {}, "value": 1}]},
+                }}, handle)
+
+        write("metrics-1-a.json", 1, 10, 3)
+        write("metrics-2-b.json", 2, 10, 4)
+        # El pid 2 lo reutiliza un worker más reciente: el archivo anterior es de un proceso terminado
+        write("metrics-2-c.json", 2, 20, 5)
+        with mock.patch("proyecto.metrics._pid_alive", side_effect=lambda pid: pid == 2):
+            snapshots = metrics.compact(self.metrics_dir.name)
+            self.assertEqual(sorted(os.listdir(self.metrics_dir.name)), ["metrics-2-c.json", "metrics-aggregate.json", "metrics.lock"])
+            merged = metrics.merge_snapshots(snapshots)
+            self.assertEqual(merged["solicitudes_total"]["series"][()], 12)
+            self.assertEqual(merged["en_uso"]["series"][()], 1)
+            # Compactar de nuevo no vuelve a sumar lo ya agregado
+            merged = metrics.merge_snapshots(metrics.compact(self.metrics_dir.name))
+        self.assertEqual(merged["solicitudes_total"]["series"][()], 12)
+
+    def test_metrics_endpoint_requires_token(self):
+        with override_settings(METRICS_TOKEN="secreto"):
+            self.assertEqual(self.client.get("/metrics").status_code, 403)
+            response = self.client.get("/metrics", headers={"authorization": "Bearer secreto"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"http_requests_total", response.content)
+
+    def test_metrics_without_token_are_only_served_in_debug(self):
+        with override_settings(METRICS_TOKEN="", DEBUG=False):
+            self.assertEqual(self.client.get("/metrics").status_code, 404)
+        with override_settings(METRICS_TOKEN="", DEBUG=True):
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+
+class IncrementalStaticfilesTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.source = os.path.join(directory.name, "src")
+        os.makedirs(os.path.join(self.source, "css"))
+        self.write("css/app.css", "body { background: url('../img/fondo.png'); }" * 50)
+        self.write("css/base.css", "@import url('app.css');" + "p { margin: 0; }" * 50)
+        override = override_settings(
+            STATICFILES_DIRS=[self.source],
+            STATIC_ROOT=os.path.join(directory.name, "root"),
+            STATICFILES_CACHE_PATH=os.path.join(directory.name, "cache.json"),
+            STATICFILES_FINDERS=["django.contrib.staticfiles.finders.FileSystemFinder"],
+            STATICFILES_WORKERS=1,
+            # app.css referencia una imagen que no existe
+            STATICFILES_IGNORE_MISSING=True,
+            STORAGES={**settings.STORAGES, "staticfiles": {"BACKEND": "proyecto.staticfiles.IncrementalManifestStaticFilesStorage"}},
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def write(self, name, content, age=0):
+        path = os.path.join(self.source, name)
+        with open(path, "w") as handle:
+            handle.write(content)
+        # collectstatic compara fechas con resolución de segundos
+        modified = os.stat(path).st_mtime + age
+        os.utime(path, (modified, modified))
+
+    def collect(self):
+        call_command("collectstatic_incremental", interactive=False, verbosity=0, stdout=io.StringIO())
+        return staticfiles_storage
+
+    def test_second_run_only_reprocesses_changed_files(self):
+        first = self.collect()
+        self.assertEqual(first.counts["compress_cached"], 0)
+        self.write("css/base.css", "p { margin: 1px; }" * 50, age=5)
+        second = self.collect()
+        self.assertEqual(second.counts["hashed"], 1)
+        # Solo base.css y su copia con hash cambiaron
+        self.assertEqual(second.counts["compressed"], 2)
+        self.assertTrue(os.path.exists(second.path(second.stored_name("css/base.css") + ".gz")))
+
+    def test_missing_css_reference_fails_unless_ignored(self):
+        with override_settings(STATICFILES_IGNORE_MISSING=False), self.assertRaisesMessage(ValueError, "img/fondo.png"):
+            self.collect()
+        storage = self.collect()
+        self.assertEqual(storage.missing_references, {"img/fondo.png"})
+
+    def test_images_get_cached_variants_served_by_accept(self):
+        os.makedirs(os.path.join(self.source, "img"))
+        frames = [Image.effect_mandelbrot((96, 96), (-2 + index * 0.2, -1.5, 1, 1.5), 100) for index in range(4)]
+        frames[0].convert("RGB").save(os.path.join(self.source, "img", "fondo.png"))
+        frames[0].save(os.path.join(self.source, "img", "demo.gif"), save_all=True, append_images=frames[1:], duration=100)
+        storage = self.collect()
+        png, gif = storage.stored_name("img/fondo.png"), storage.stored_name("img/demo.gif")
+        self.assertEqual(storage.counts["images"], 2)
+        self.assertLess(storage.image_bytes["best"], storage.image_bytes["before"])
+        with Image.open(storage.path(gif + ".webp")) as animation:
+            self.assertEqual(animation.n_frames, 4)
+        self.assertEqual(self.collect().counts["images_cached"], 2)
+
+        from proyecto.middleware import AsyncWhiteNoiseMiddleware
+        middleware = AsyncWhiteNoiseMiddleware(lambda request: None)
+        self.assertNotIn(settings.STATIC_URL + png + ".webp", middleware.files)
+        for accept, content_type in (("image/avif,image/webp,*/*", "image/webp"), ("image/png,*/*;q=0.8", "image/png")):
+            response = middleware(RequestFactory().get(settings.STATIC_URL + png, HTTP_ACCEPT=accept))
+            self.assertEqual((response["Content-Type"], response["Vary"]), (content_type, "Accept"))
+
+    def test_accepted_types_skip_zero_quality(self):
+        self.assertEqual(images.accepted_types("image/avif, image/webp;q=0, */*;q=0.8"), {"image/avif", "*/*"})
+
+
+class PageAssetsTests(SimpleTestCase):
+    def test_critical_css_keeps_only_rules_used_by_the_page(self):
+        inventory = assets.inventory_page('<div class="card p-4"><input type="email" id="username"></div>')
+        css = """
+            .card { padding: 1rem; background: url(../img/fondo.png); }
+            .modal, .p-4 { margin: 0; }
+            #username:focus { outline: none; }
+            input[type="email"] { color: red; }
+            .sidebar .card { display: none; }
+            @media (min-width: 768px) { .card { padding: 2rem; } .navbar { height: 0; } }
+            @media print { .card { color: black; } }
+            .card { animation: aparecer 1s; }
+            @keyframes aparecer { from { opacity: 0; } to { opacity: 1; } }
+            @keyframes sin-uso { from { opacity: 0; } }
+        """
+        critical = assets.critical_css([("proyecto/css/base.css", css)], inventory, "proyecto/build/app_1/page.critical.css")
+        self.assertIn(".card{padding:1rem;background:url(../../img/fondo.png)}", critical)
+        self.assertIn(".p-4{margin:0}", critical)
+        self.assertIn("#username:focus{outline:none}", critical)
+        self.assertIn('input[type="email"]{color:red}', critical)
+        self.assertIn("@media (min-width: 768px){.card{padding:2rem}}", critical)
+        self.assertIn("@keyframes aparecer", critical)
+        self.assertNotIn(".modal", critical)
+        self.assertNotIn(".sidebar", critical)
+        self.assertNotIn("color:black", critical)
+        self.assertNotIn("sin-uso", critical)
+
+    def test_only_modules_used_by_page_scripts_are_bundled(self):
+        self.assertEqual(assets.required_modules("document.getElementById('x')"), [])
+        self.assertEqual(assets.required_modules("$('#x').tooltip()"), ["jquery", "popper", "bootstrap"])
+
+    def test_auth_pages_inline_critical_css_and_use_page_bundle(self):
+        html = self.client.get(reverse("page_login")).content.decode()
+        self.assertIn("<style>", html)
+        self.assertIn('rel="preload" as="style"', html)
+        self.assertIn("proyecto/build/app_1/page_login.js", html)
+        self.assertNotIn("vendors.bundle.js", html)
+
+    @override_settings(PAGE_ASSETS_ENABLED=False, RESPONSE_CACHE_ENABLED=False)
+    def test_disabled_page_assets_render_original_links(self):
+        html = self.client.get(reverse("page_login")).content.decode()
+        self.assertNotIn("<style>", html)
+        self.assertIn("vendors.bundle.js", html)
+
+    @override_settings(DEBUG=True, RESPONSE_CACHE_ENABLED=False)
+    def test_debug_serves_page_script_sources(self):
+        html = self.client.get(reverse("page_login")).content.decode()
+        self.assertNotIn("proyecto/build/app_1/page_login.js", html)
+        self.assertIn("vendors.bundle.js", html)
+
+    def test_built_assets_are_up_to_date(self):
+        call_command("build_page_assets", check=True, stdout=io.StringIO())
+
+
+class BootTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.source = os.path.join(directory.name, "src")
+        os.makedirs(self.source)
+        with open(os.path.join(self.source, "app.css"), "w") as handle:
+            handle.write("body { margin: 0; }")
+        override = override_settings(
+            STATICFILES_DIRS=[self.source],
+            STATIC_ROOT=os.path.join(directory.name, "root"),
+            STATICFILES_FINDERS=["django.contrib.staticfiles.finders.FileSystemFinder"],
+            BOOT_STATE_PATH=os.path.join(directory.name, "boot.json"),
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        # Las pruebas no tienen base de datos: el plan de migraciones se simula
+        self.pending = []
+        for name, value in (
+            ("inspect_migrations", lambda database: ("huella", self.pending)),
+            ("check_model_changes", lambda: []),
+            ("migrate", mock.Mock(return_value="")),
+        ):
+            patcher = mock.patch.object(boot, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_boot(self, **options):
+        return boot.boot(write=lambda text: None, **options)
+
+    def test_restart_without_changes_skips_every_step(self):
+        first = self.run_boot()
+        self.assertTrue(first["static"])
+        self.assertFalse(first["migrate"])
+        second = self.run_boot()
+        self.assertFalse(second["static"])
+        self.assertIn("comprobaciones", second["timings"])
+
+    def test_changed_sources_and_pending_migrations_run_their_steps(self):
+        self.run_boot()
+        with open(os.path.join(self.source, "nuevo.css"), "w") as handle:
+            handle.write("p { margin: 0; }")
+        self.pending = ["app_1.0001_initial"]
+        result = self.run_boot()
+        self.assertTrue(result["static"])
+        self.assertTrue(result["migrate"])
+        boot.migrate.assert_called_once_with("default")
+        self.assertTrue(os.path.exists(os.path.join(settings.STATIC_ROOT, "nuevo.css")))
+
+
+class BulkLoadTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def source(self, name, content):
+        path = os.path.join(self.directory, name)
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(path, "wt", encoding="utf-8") as handle:
+            handle.write(content)
+        return bulk.SourceFile(path)
+
+    def test_csv_rows_are_converted_with_defaults(self):
+        source = self.source("usuarios.csv.gz", "username,email,is_staff,last_login\nana,,True,\n")
+        with source:
+            records = list(source)
+        converter = bulk.RowConverter(User, list(records[0]), text_values=True)
+        values = dict(zip([field.name for field in converter.fields], converter.convert(records[0], source.line)))
+        self.assertEqual(values["username"], "ana")
+        self.assertEqual(values["email"], "")
+        self.assertIs(values["is_staff"], True)
+        self.assertIsNone(values["last_login"])
+        self.assertIs(values["is_active"], True)
+        self.assertNotIn("id", values)
+
+    def test_unknown_columns_and_invalid_values_are_reported(self):
+        with self.assertRaisesMessage(bulk.BulkLoadError, "Columnas que no existen en auth.Group: color"):
+            bulk.RowConverter(Group, ["name", "color"], text_values=True)
+        source = self.source("grupos.jsonl", '{"id": 1, "name": "a"}\n{"id": "x", "name": "b"}\n')
+        with source:
+            converter = bulk.RowConverter(Group, ["id", "name"], text_values=False)
+            with self.assertRaisesMessage(bulk.BulkLoadError, "Línea 2, columna 'id'"):
+                for record in source:
+                    converter.convert(record, source.line)
+        self.assertTrue(converter.explicit_pk)
+
+    def test_copy_batch_is_sent_as_csv(self):
+        cursor = mock.Mock()
+        fields = [User._meta.get_field(name) for name in ("username", "first_name", "is_staff", "last_login")]
+        writer = bulk.BatchWriter(User, fields, connections["default"], "copy")
+        writer.write(cursor, [['ana "a"', "", True, None]])
+        sql, buffer = cursor.cursor.copy_expert.call_args.args
+        self.assertEqual(sql, 'COPY "auth_user" ("username", "first_name", "is_staff", "last_login") FROM STDIN WITH (FORMAT csv)')
+        self.assertEqual(buffer.getvalue(), '"ana ""a""","","t",\n')
+
+    def test_load_data_values_are_escaped(self):
+        self.assertEqual(bulk._load_data_text(None), "\\N")
+        self.assertEqual(bulk._load_data_text("a\tb\\c\n"), "a\\tb\\\\c\\n")
+
+
+class PurgeTests(SimpleTestCase):
+    def test_truncate_requires_cascade_for_referencing_models(self):
+        with self.assertRaisesMessage(purge.PurgeError, "admin.LogEntry"):
+            purge.truncate_models([User])
+
+    def test_truncate_restarts_identity_of_model_and_m2m_tables(self):
+        ops = connections["default"].ops
+        with mock.patch.object(ops, "execute_sql_flush") as execute:
+            tables = purge.truncate_models([User, Group], cascade=True)
+        self.assertIn("auth_user_groups", tables)
+        self.assertIn("django_admin_log", tables)
+        sql = " ".join(execute.call_args.args[0])
+        self.assertIn("TRUNCATE", sql)
+        self.assertIn("RESTART IDENTITY", sql)
+
+    def test_filters_are_parsed_from_command_line(self):
+        self.assertEqual(purge_data.parse_filter("id__in=1,2"), ("id__in", ["1", "2"]))
+        self.assertEqual(purge_data.parse_filter("last_login__isnull=true"), ("last_login__isnull", True))
+
+
+class SessionEngineTests(SimpleTestCase):
+    def setUp(self):
+        self.writer = write_behind.SessionWriter()
+        self.writer.start = lambda: None
+        patcher = mock.patch.object(write_behind, "writer", self.writer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        store = write_behind.SessionStore()
+        store._cache.clear()
+        self.addCleanup(store._cache.clear)
+
+    def cached_store(self, data):
+        store = write_behind.SessionStore("a" * 32)
+        expire_date = timezone.now() + timedelta(seconds=settings.SESSION_COOKIE_AGE)
+        store._cache_set(store.session_key, data, expire_date)
+        return store
+
+    def test_unchanged_session_is_not_written(self):
+        store = self.cached_store({"visitas": 1})
+        store["visitas"] = 1
+        store.save()
+        self.assertEqual(self.writer.skipped, 1)
+        self.assertIsNone(self.writer.pending(store.session_key))
+
+    def test_changes_are_queued_and_coalesced(self):
+        store = self.cached_store({"visitas": 1})
+        for visits in (2, 3):
+            store["visitas"] = visits
+            store.save()
+        session_data, _expire_date = self.writer.pending(store.session_key)
+        self.assertEqual(store.decode(session_data), {"visitas": 3})
+        self.assertEqual((self.writer.queued, self.writer.coalesced), (2, 1))
+        self.assertEqual(write_behind.SessionStore(store.session_key).load(), {"visitas": 3})
+
+    def test_delete_is_immediate_and_drops_pending_write(self):
+        store = self.cached_store({"visitas": 1})
+        store["visitas"] = 2
+        store.save()
+        with mock.patch.object(write_behind.DBStore, "delete") as delete:
+            store.delete()
+        delete.assert_called_once_with("a" * 32)
+        self.assertIsNone(self.writer.pending("a" * 32))
+        self.assertIsNone(store._cache_get("a" * 32))
+
+    def test_session_deleted_by_another_worker_does_not_revive(self):
+        store = self.cached_store({"visitas": 1})
+        self.assertEqual(store["visitas"], 1)
+        with mock.patch.object(write_behind.DBStore, "delete"):
+            write_behind.SessionStore("a" * 32).delete()
+        store["visitas"] = 2
+        store.save()
+        self.assertIsNone(store._cache_get("a" * 32))
+        self.assertIsNone(self.writer.pending("a" * 32))
+        with mock.patch.object(write_behind.DBStore, "_get_session_from_db") as from_db:
+            self.assertEqual(write_behind.SessionStore("a" * 32).load(), {})
+        from_db.assert_not_called()
+
+    def test_small_session_travels_in_cookie(self):
+        store = signed_cookies.SessionStore()
+        store["usuario"] = 7
+        store.save()
+        self.assertTrue(signed_cookies.SessionStore.in_cookie(store.session_key))
+        self.assertEqual(signed_cookies.SessionStore(store.session_key).load(), {"usuario": 7})
+        self.assertEqual(self.writer.queued, 0)
+
+    @override_settings(SESSION_COOKIE_MAX_BYTES=64)
+    def test_large_session_is_stored_with_write_behind(self):
+        store = signed_cookies.SessionStore()
+        store["datos"] = os.urandom(64).hex()
+        with mock.patch.object(write_behind.DBStore, "exists", return_value=False), \
+                mock.patch.object(write_behind.DBStore, "save") as save:
+            store.save()
+        save.assert_called_once_with(must_create=True)
+        self.assertFalse(signed_cookies.SessionStore.in_cookie(store.session_key))
+        self.assertEqual(signed_cookies.SessionStore(store.session_key).load(), {"datos": store["datos"]})
+
+
+class RejectAllBackend:
+    def authenticate(self, request, **credentials):
+        return None
+
+
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000, RATELIMIT_ENABLED=False)
+class PasswordHashingTests(SimpleTestCase):
+    def test_iterations_come_from_settings_and_old_hashes_must_update(self):
+        encoded = hashers.make_password("clave")
+        self.assertTrue(encoded.startswith("pbkdf2_sha256$1000$"))
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertEqual(hashers.verify_password("clave", encoded), (True, True))
+
+    def test_django_default_hashers_still_verify(self):
+        configured = {import_string(path).algorithm for path in settings.PASSWORD_HASHERS}
+        self.assertLessEqual({import_string(path).algorithm for path in global_settings.PASSWORD_HASHERS}, configured)
+
+    def test_login_upgrades_stored_hash(self):
+        user = User(username="ana@example.com", password=hashers.make_password("clave"))
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=2000), \
+                mock.patch.object(User._default_manager, "get_by_natural_key", return_value=user), \
+                mock.patch.object(User, "save") as save:
+            self.assertIs(passwords.authenticate(None, username="ana@example.com", password="clave"), user)
+            self.assertIsNone(passwords.authenticate(None, username="ana@example.com", password="otra"))
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$2000$"))
+        save.assert_called_once_with(update_fields=["password"])
+        self.assertEqual(user.backend, settings.AUTHENTICATION_BACKENDS[0])
+
+    @override_settings(AUTHENTICATION_BACKENDS=["app_1.tests.RejectAllBackend"])
+    def test_login_goes_through_authentication_backends(self):
+        failed = mock.Mock()
+        user_login_failed.connect(failed)
+        self.addCleanup(user_login_failed.disconnect, failed)
+        with mock.patch.object(User._default_manager, "get_by_natural_key") as get_by_natural_key:
+            self.assertIsNone(passwords.authenticate(None, username="ana@example.com", password="clave"))
+        get_by_natural_key.assert_not_called()
+        failed.assert_called_once()
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1, PASSWORD_HASHING_QUEUE=0)
+    def test_full_pool_rejects_instead_of_queueing(self):
+        pool = passwords.HashingPool()
+        release = threading.Event()
+        future = pool.submit(release.wait)
+        with self.assertRaises(passwords.HashingBusy):
+            pool.submit(hashers.make_password, "clave")
+        release.set()
+        self.assertTrue(future.result(timeout=5))
+        self.assertTrue(pool.run(hashers.make_password, "clave").startswith("pbkdf2_sha256$"))
+
+    def test_request_context_reaches_the_hashing_thread(self):
+        token = routers.reset_pinning()
+        self.addCleanup(routers.restore_pinning, token)
+        routers.pin_to_primary()
+        self.assertTrue(passwords.HashingPool().run(routers.is_pinned_to_primary))
+
+    def test_login_endpoint_reports_errors_as_json(self):
+        response = self.client.post(reverse("login_submit"), {"username": "ana@example.com"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("password", response.json()["errors"])
+        with mock.patch.object(passwords, "authenticate", side_effect=passwords.HashingBusy):
+            response = self.client.post(reverse("login_submit"), {"username": "ana@example.com", "password": "clave"})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+
+    def test_register_form_validates_password(self):
+        form = RegisterForm({"fname": "Ana", "lname": "Díaz", "emailverify": "ana@example.com", "userpassword": "12345678", "terms": "on"})
+        self.assertFalse(form.is_valid())
+        self.assertIn("userpassword", form.errors)
+        self.assertEqual(form.build_user().username, "ana@example.com")
+
+
+def _consume_in_child(path, key):
+    table = ratelimit.TokenBucketTable(path, 64)
+    for _ in range(2):
+        table.consume(key, 2, 1.0, now=100.0)
+
+
+class RateLimitTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "ratelimit")
+
+    def test_bucket_refills_over_time(self):
+        table = ratelimit.TokenBucketTable(self.path, 64)
+        self.assertEqual(table.consume("login:ip:1.2.3.4", 2, 1.0, now=100.0), (True, 0.0))
+        self.assertEqual(table.consume("login:ip:1.2.3.4", 2, 1.0, now=100.0), (True, 0.0))
+        self.assertEqual(table.consume("login:ip:1.2.3.4", 2, 1.0, now=100.0), (False, 1.0))
+        self.assertTrue(table.consume("login:ip:5.6.7.8", 2, 1.0, now=100.0)[0])
+        self.assertTrue(table.consume("login:ip:1.2.3.4", 2, 1.0, now=101.0)[0])
+
+    def test_state_is_shared_between_processes(self):
+        process = multiprocessing.get_context("fork").Process(target=_consume_in_child, args=(self.path, "login:user:ana"))
+        process.start()
+        process.join(timeout=10)
+        self.assertEqual(process.exitcode, 0)
+        table = ratelimit.TokenBucketTable(self.path, 64)
+        self.assertFalse(table.consume("login:user:ana", 2, 1.0, now=100.0)[0])
+
+    def test_table_size_is_part_of_the_file_name(self):
+        small = ratelimit.TokenBucketTable(self.path, 64)
+        small.consume("clave", 1, 0.001, now=100.0)
+        mapped = os.stat(small.path).st_size
+        # Otra configuración usa otro archivo: el que ya está mapeado nunca se recorta
+        large = ratelimit.TokenBucketTable(self.path, 128)
+        self.assertTrue(large.consume("clave", 1, 0.001, now=100.0)[0])
+        self.assertNotEqual(small.path, large.path)
+        self.assertEqual(os.stat(small.path).st_size, mapped)
+        self.assertFalse(small.consume("clave", 1, 0.001, now=100.0)[0])
+
+    def test_full_table_reuses_oldest_bucket(self):
+        table = ratelimit.TokenBucketTable(self.path, ratelimit.PROBES)
+        for index in range(ratelimit.PROBES):
+            table.consume(f"clave-{index}", 1, 0.001, now=100.0 + index)
+        self.assertTrue(table.consume("otra", 1, 0.001, now=200.0)[0])
+        self.assertTrue(table.consume("clave-0", 1, 0.001, now=200.0)[0])
+        self.assertFalse(table.consume("clave-7", 1, 0.001, now=200.0)[0])
+
+    def test_login_is_rejected_before_authentication(self):
+        rates = {"login_ip": "5/60", "login_user": "1/60"}
+        data = {"username": "Ana@example.com", "password": "clave"}
+        with override_settings(RATELIMIT_ENABLED=True, RATELIMIT_RATES=rates), \
+                mock.patch.object(ratelimit, "_table", ratelimit.TokenBucketTable(self.path, 64)), \
+                mock.patch.object(passwords, "authenticate", return_value=None) as authenticate, \
+                mock.patch.object(metrics.registry, "inc") as inc:
+            self.assertEqual(self.client.post(reverse("login_submit"), data).status_code, 401)
+            response = self.client.post(reverse("login_submit"), {**data, "username": " ana@example.com"})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "60")
+        authenticate.assert_called_once()
+        inc.assert_any_call("ratelimit_rejected_total", {"scope": "login", "key": "user"})
+
+    def test_without_fcntl_the_limiter_runs_in_process(self):
+        with mock.patch.object(ratelimit, "fcntl", None), mock.patch.object(ratelimit, "_table", None):
+            table = ratelimit.get_table()
+            self.assertIsInstance(table, ratelimit.LocalTokenBucketTable)
+            self.assertEqual(table.consume("login:ip:1.2.3.4", 2, 1.0, now=100.0), (True, 0.0))
+            self.assertEqual(table.consume("login:ip:1.2.3.4", 2, 1.0, now=100.0), (True, 0.0))
+            self.assertEqual(table.consume("login:ip:1.2.3.4", 2, 1.0, now=100.0), (False, 1.0))
+            self.assertTrue(table.consume("login:ip:1.2.3.4", 2, 1.0, now=101.0)[0])
+            with override_settings(RATELIMIT_ENABLED=True, RATELIMIT_RATES={"login_ip": "1/60"}), \
+                    mock.patch.object(passwords, "authenticate", return_value=None):
+                self.assertEqual(self.client.post(reverse("login_submit"), {"username": "ana", "password": "x"}).status_code, 401)
+                self.assertEqual(self.client.post(reverse("login_submit"), {"username": "ana", "password": "x"}).status_code, 429)
+
+    def test_client_ip_from_trusted_proxy_header(self):
+        request = RequestFactory().post("/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="6.6.6.6, 1.2.3.4")
+        self.assertEqual(ratelimit.client_ip(request), "10.0.0.1")
+        with override_settings(RATELIMIT_IP_HEADER="HTTP_X_FORWARDED_FOR"):
+            self.assertEqual(ratelimit.client_ip(request), "1.2.3.4")
+
+
+def _image_bytes(size, mode="RGB", image_format="PNG"):
+    buffer = io.BytesIO()
+    Image.new(mode, size).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+class CoverPipelineTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.media_root = os.path.join(directory.name, "media")
+        self.spool_dir = os.path.join(directory.name, "spool")
+        override = override_settings(
+            MEDIA_ROOT=self.media_root, COVER_SPOOL_DIR=self.spool_dir,
+            COVER_SIZES=[300, 100], COVER_FORMATS=["webp", "jpeg"],
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_process_cover_builds_every_size_and_format(self):
+        os.makedirs(self.spool_dir)
+        source = os.path.join(self.spool_dir, "trabajo.src")
+        with open(source, "wb") as handle:
+            handle.write(_image_bytes((600, 900), mode="RGBA"))
+        result = covers.process_cover("trabajo", source, "PNG", queued_at=0)
+        self.assertEqual(set(result["outputs"]), {"300.webp", "300.jpg", "100.webp", "100.jpg", "original"})
+        self.assertEqual(set(result["timings"]), {"queue", "decode", "resize", "encode", "upload"})
+        self.assertFalse(os.path.exists(source))
+        directory = os.path.join(self.media_root, settings.PUBLIC_MEDIA, "covers", "trabajo")
+        with Image.open(os.path.join(directory, "300.jpg")) as image:
+            self.assertEqual((image.format, image.mode, image.size), ("JPEG", "RGB", (200, 300)))
+        with Image.open(os.path.join(directory, "100.webp")) as image:
+            self.assertEqual((image.format, image.size), ("WEBP", (67, 100)))
+        self.assertEqual(result["outputs"]["original"]["url"], f"/media/{settings.PUBLIC_MEDIA}/covers/trabajo/original.png")
+
+    def upload(self, user, content):
+        request = RequestFactory().post(reverse("cover_upload"), {"cover": SimpleUploadedFile("portada.png", content)})
+        request.user = user
+        return views.cover_upload(request)
+
+    def test_upload_is_queued_for_staff_only(self):
+        job_id = str(uuid.uuid4())
+        with mock.patch.object(covers.pipeline, "submit", return_value=job_id) as submit:
+            self.assertEqual(self.upload(AnonymousUser(), _image_bytes((60, 90))).status_code, 403)
+            self.assertEqual(self.upload(User(is_staff=True), b"no es una imagen").status_code, 400)
+            response = self.upload(User(is_staff=True), _image_bytes((60, 90)))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response["Location"], reverse("cover_status", args=[job_id]))
+        submit.assert_called_once()
+        self.assertEqual(submit.call_args.args[1], "PNG")
+
+    def test_status_is_read_from_spool_dir(self):
+        job_id = str(uuid.uuid4())
+        os.makedirs(self.spool_dir)
+        covers.write_status(job_id, {"id": job_id, "state": "pending"})
+        request = RequestFactory().get(reverse("cover_status", args=[job_id]))
+        request.user = User(is_staff=True)
+        response = views.cover_status(request, uuid.UUID(job_id))
+        self.assertEqual(json.loads(response.content)["state"], "pending")
+        self.assertEqual(views.cover_status(request, uuid.uuid4()).status_code, 404)
+
+    def test_jobs_of_a_finished_worker_fail_and_are_purged(self):
+        os.makedirs(self.spool_dir)
+        process = multiprocessing.get_context("spawn").Process(target=time.sleep, args=(0,))
+        process.start()
+        process.join()
+        orphan, running = str(uuid.uuid4()), str(uuid.uuid4())
+        covers.write_status(orphan, {**jobs.new_status(orphan), "owner": process.pid})
+        covers.write_status(running, jobs.new_status(running))
+        self.assertEqual(covers.read_status(orphan)["state"], "error")
+        self.assertEqual(covers.read_status(running)["state"], "pending")
+        with override_settings(COVER_RETENTION_HOURS=0):
+            covers.purge_expired()
+        self.assertIsNone(covers.read_status(orphan))
+        self.assertIsNotNone(covers.read_status(running))
+
+
+class ExportTests(SimpleTestCase):
+    export = exports.Export("Prueba", None, [("pk", "Id", 8), ("name", "Nombre", 30)])
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        override = override_settings(EXPORT_SPOOL_DIR=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_rows_are_read_in_primary_key_chunks(self):
+        export = exports.Export("Grupos", lambda: Group.objects.order_by("name"), [("name", "Nombre", 30)])
+        pages = [[(1, "a"), (2, "b")], [(3, "c"), (4, "d")], []]
+        queries = []
+
+        def fetch(page):
+            if page._result_cache is not None:
+                return
+            queries.append(str(page.query))
+            page._result_cache = pages[len(queries) - 1]
+
+        with override_settings(EXPORT_CHUNK_SIZE=2), mock.patch("django.db.models.query.QuerySet._fetch_all", fetch):
+            self.assertEqual(list(export.rows()), [("a",), ("b",), ("c",), ("d",)])
+        self.assertEqual(len(queries), 3)
+        self.assertIn('FROM "auth_group" ORDER BY 1 ASC LIMIT 2', queries[0])
+        self.assertIn('WHERE "auth_group"."id" > 4 ORDER BY', queries[2])
+
+    def test_xlsx_keeps_formulas_as_text(self):
+        path = os.path.join(self.directory, "prueba.xlsx")
+        exports.write_xlsx(path, self.export, iter([(1, "=1+1"), (2, "Ana")]))
+        with zipfile.ZipFile(path) as workbook:
+            sheet = workbook.read("xl/worksheets/sheet1.xml").decode()
+        # En constant_memory las cadenas se escriben en la propia hoja
+        self.assertNotIn("<f>", sheet)
+        self.assertIn("<t>=1+1</t>", sheet)
+
+    def test_pdf_draws_one_table_per_page(self):
+        path = os.path.join(self.directory, "prueba.pdf")
+        exports.write_pdf(path, self.export, ((index, "x" * 200) for index in range(100)))
+        with open(path, "rb") as handle:
+            content = handle.read()
+        self.assertTrue(content.startswith(b"%PDF"))
+        self.assertIn(b"/Count 3", content)
+
+    def start(self, user, name="usuarios", export_format="xlsx"):
+        request = RequestFactory().post(reverse("export_start", args=[name, export_format]))
+        request.user = user
+        return views.export_start(request, name, export_format)
+
+    def test_start_is_queued_for_staff_only(self):
+        job_id = str(uuid.uuid4())
+        staff = User(pk=1, is_staff=True)
+        with mock.patch.object(exports.pipeline, "submit", return_value=job_id) as submit:
+            self.assertEqual(self.start(AnonymousUser()).status_code, 403)
+            with self.assertRaises(Http404):
+                self.start(staff, name="desconocido")
+            response = self.start(staff, export_format="pdf")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response["Location"], reverse("export_status", args=[job_id]))
+        submit.assert_called_once_with("usuarios", "pdf", 1)
+        with mock.patch.object(exports.pipeline, "submit", side_effect=jobs.JobBusy):
+            response = self.start(staff)
+        self.assertEqual((response.status_code, response["Retry-After"]), (503, "30"))
+
+    def test_status_is_visible_to_its_owner_only(self):
+        job_id = str(uuid.uuid4())
+        exports.write_status(job_id, {"id": job_id, "state": "running", "user": 1, "rows": 10, "total": 20})
+        request = RequestFactory().get(reverse("export_status", args=[job_id]))
+        request.user = User(pk=1, is_staff=True)
+        self.assertEqual(json.loads(views.export_status(request, uuid.UUID(job_id)).content)["rows"], 10)
+        self.assertEqual(views.export_download(request, uuid.UUID(job_id)).status_code, 409)
+        request.user = User(pk=2, is_staff=True)
+        with self.assertRaises(Http404):
+            views.export_status(request, uuid.UUID(job_id))
+
+
+class AdminCsvExportTests(SimpleTestCase):
+    def queryset(self, rows, chunk_size=2):
+        queryset = mock.Mock(model=User)
+        ordered = queryset.order_by.return_value
+        ordered.filter.return_value = ordered
+        ordered.values_list.return_value.__getitem__ = mock.Mock(
+            side_effect=[rows[start:start + chunk_size] for start in range(0, len(rows) + 1, chunk_size)],
+        )
+        return queryset
+
+    def test_columns_come_from_csv_fields_or_list_display(self):
+        from django.contrib import admin
+        self.assertNotIn("password", app_admin.csv_fields(admin.site._registry[User], None))
+        self.assertEqual(app_admin.csv_fields(admin.site._registry[Group], None), ["id", "name"])
+
+    def test_stream_sends_header_first_and_rows_in_chunks(self):
+        queryset = self.queryset([(index, index, f"=usuario{index}") for index in range(5)])
+        parts = list(app_admin.csv_stream(queryset, ["id", "username"], chunk_size=2))
+        queryset.order_by.assert_called_once_with("pk")
+        queryset.order_by.return_value.values_list.assert_called_with("pk", "id", "username")
+        self.assertEqual([call.kwargs for call in queryset.order_by.return_value.filter.call_args_list],
+                         [{"pk__gt": 1}, {"pk__gt": 3}])
+        self.assertEqual(parts[0], "\ufeffID,Nombre de usuario\r\n".encode())
+        self.assertEqual(len(parts), 4)
+        self.assertEqual(parts[1], b"0,'=usuario0\r\n1,'=usuario1\r\n")
+
+    async def test_asgi_requests_get_an_async_stream(self):
+        queryset = self.queryset([(1, 1, "ana")], chunk_size=settings.EXPORT_CHUNK_SIZE)
+        request = AsyncRequestFactory().post("/admin/auth/user/")
+        with mock.patch.object(app_admin, "csv_fields", return_value=["id", "username"]):
+            response = app_admin.export_csv(None, request, queryset)
+        self.assertTrue(response.is_async)
+        content = b"".join([part async for part in response])
+        self.assertTrue(content.endswith(b"1,ana\r\n"))
+
+
+class LargeTableAdminTests(SimpleTestCase):
+    def test_keyset_needs_an_indexed_column_and_a_unique_one(self):
+        terms = pagination.keyset_terms(User.objects.order_by("username", "username"))
+        self.assertEqual([(field.name, descending) for field, descending in terms], [("username", False)])
+        terms = pagination.keyset_terms(User.objects.order_by("-date_joined", "-pk"))
+        self.assertIsNone(terms)  # date_joined no tiene índice
+        terms = pagination.keyset_terms(Group.objects.order_by("-id"))
+        self.assertEqual([(field.name, descending) for field, descending in terms], [("id", True)])
+        self.assertIsNone(pagination.keyset_terms(User.objects.order_by("first_name", "-pk")))
+        self.assertIsNone(pagination.keyset_terms(User.objects.order_by("last_login")))
+
+    def test_seek_compares_rows_in_sort_order(self):
+        terms = [(User._meta.get_field("last_name"), False), (User._meta.pk, True)]
+        after = User.objects.filter(pagination.seek(terms, ["Pérez", 7]))
+        self.assertIn('"last_name" > Pérez OR ("auth_user"."id" < 7 AND "auth_user"."last_name" = Pérez)', str(after.query))
+        before = User.objects.filter(pagination.seek(terms, ["Pérez", 7], backwards=True))
+        self.assertIn('"last_name" < Pérez OR ("auth_user"."id" > 7 AND "auth_user"."last_name" = Pérez)', str(before.query))
+
+    def test_cursor_round_trip(self):
+        terms = [(User._meta.get_field("date_joined"), True), (User._meta.pk, True)]
+        joined = timezone.now()
+        cursor = pagination.encode_cursor("b", [joined, 42])
+        self.assertEqual(pagination.decode_cursor(terms, cursor), ("b", [joined, 42]))
+        for invalid in ("x" + cursor[1:], cursor[:-3], "a" + pagination.encode_cursor("a", [1])[1:]):
+            with self.assertRaises(pagination.InvalidCursor):
+                pagination.decode_cursor(terms, invalid)
+
+    def test_paginator_estimates_unfiltered_counts_and_limits_filtered_ones(self):
+        with mock.patch.object(pagination, "estimated_count", return_value=5_000_000) as estimate:
+            paginator = pagination.EstimatedCountPaginator(User.objects.all(), 100)
+            self.assertEqual((paginator.count, paginator.estimated), (5_000_000, True))
+            estimate.assert_called_once_with(User, "default")
+        queryset = mock.MagicMock()
+        queryset.__getitem__.return_value.count.return_value = 10000
+        with mock.patch.object(pagination, "is_unfiltered", return_value=False):
+            paginator = pagination.EstimatedCountPaginator(queryset, 100, count_limit=10000)
+            self.assertEqual((paginator.count, paginator.limited), (10000, True))
+        queryset.__getitem__.assert_called_once_with(slice(None, 10000))
+
+    def test_changelist_loads_only_displayed_columns(self):
+        only, related = app_admin.displayed_columns(User, ["action_checkbox", "username", "email"])
+        self.assertEqual((only, related), (["id", "username", "email"], []))
+        self.assertIsNone(app_admin.displayed_columns(User, ["__str__"]))
+        self.assertIsNone(app_admin.displayed_columns(User, ["username", "groups"]))
+        only, related = app_admin.displayed_columns(Group, ["name"])
+        self.assertEqual(only, ["id", "name"])
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "cache.sqlite3")
+
+    def cache(self, max_bytes=1024 * 1024):
+        return cache_backends.SQLiteCache(self.path, {"OPTIONS": {"MAX_BYTES": max_bytes, "LOCK_TIMEOUT": 5}})
+
+    def test_entries_are_shared_between_instances(self):
+        writer, reader = self.cache(), self.cache()
+        writer.set("clave", {"valor": 1})
+        self.assertEqual(reader.get("clave"), {"valor": 1})
+        self.assertFalse(reader.add("clave", 2))
+        self.assertEqual(reader.incr("clave2", 1) if reader.add("clave2", 1) else None, 2)
+        self.assertEqual(writer.get_many(["clave", "clave2", "otra"]), {"clave": {"valor": 1}, "clave2": 2})
+        writer.set("vencida", 1, timeout=0)
+        self.assertIsNone(reader.get("vencida"))
+        self.assertTrue(reader.delete("clave"))
+        self.assertFalse(writer.has_key("clave"))
+
+    def test_least_recently_used_entries_are_evicted_over_budget(self):
+        cache = self.cache(max_bytes=20_000)
+        with mock.patch.object(cache_backends.time, "time", side_effect=lambda: now):
+            for index in range(10):
+                now = 1000.0 + index * 60
+                cache.set(f"k{index}", b"x" * 1000, timeout=None)
+            now += 60
+            cache.get("k0")  # k0 pasa a ser la más reciente
+            for index in range(10, 25):
+                now += 60
+                cache.set(f"k{index}", b"x" * 1000, timeout=None)
+            stats = cache.stats()
+            self.assertLessEqual(stats["bytes"], 20_000)
+            self.assertGreater(stats["evictions"], 0)
+            self.assertTrue(cache.has_key("k0"))
+            self.assertFalse(cache.has_key("k1"))
+            self.assertTrue(cache.has_key("k24"))
+
+    def test_reads_do_not_wait_for_writers(self):
+        cache = self.cache()
+        with mock.patch.object(cache_backends.time, "time", return_value=1000.0):
+            cache.set("clave", 1, timeout=None)
+        blocker = sqlite3.connect(self.path, isolation_level=None)
+        self.addCleanup(blocker.close)
+        blocker.execute("BEGIN IMMEDIATE")
+        started = time.monotonic()
+        # La hora de acceso está vencida pero la base está ocupada: se lee sin actualizarla
+        self.assertEqual(cache.get("clave"), 1)
+        self.assertLess(time.monotonic() - started, 1)
+        blocker.execute("ROLLBACK")
+
+    def test_get_or_set_computes_once_under_concurrency(self):
+        calls = []
+        started = threading.Barrier(4)
+        results = []
+
+        def expensive():
+            calls.append(1)
+            time.sleep(0.1)
+            return "caro"
+
+        def worker():
+            cache = self.cache()
+            started.wait()
+            results.append(cache.get_or_set("informe", expensive))
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["caro"] * 4)
+        self.assertEqual(len(calls), 1)
+
+
+class GunicornConfTests(SimpleTestCase):
+    def test_workers_follow_cpus_and_worker_class(self):
+        self.assertEqual(gunicorn_conf.worker_settings({}, cpus=2), ("gthread", 3, 4))
+        self.assertEqual(gunicorn_conf.worker_settings({"GUNICORN_WORKER_CLASS": "sync"}, cpus=2), ("sync", 5, 1))
+        self.assertEqual(
+            gunicorn_conf.worker_settings({"SERVER_MODE": "asgi", "GUNICORN_WORKER_CLASS": "sync"}, cpus=4),
+            ("uvicorn_worker.UvicornWorker", 5, 1),
+        )
+        self.assertEqual(gunicorn_conf.worker_settings({"GUNICORN_WORKERS": "7", "GUNICORN_WORKER_CLASS": "eventlet"}, cpus=2), ("gthread", 7, 4))
+
+    def test_cgroup_quota_limits_cpus(self):
+        with tempfile.TemporaryDirectory() as root:
+            self.assertIsNone(gunicorn_conf._cgroup_cpu_quota(root))
+            os.makedirs(os.path.join(root, "cpu"))
+            for name, value in (("cpu.cfs_quota_us", "-1"), ("cpu.cfs_period_us", "100000")):
+                with open(os.path.join(root, "cpu", name), "w") as handle:
+                    handle.write(value)
+            self.assertIsNone(gunicorn_conf._cgroup_cpu_quota(root))
+            with open(os.path.join(root, "cpu.max"), "w") as handle:
+                handle.write("150000 100000\n")
+            self.assertEqual(gunicorn_conf._cgroup_cpu_quota(root), 1.5)
+            with mock.patch.object(gunicorn_conf.os, "sched_getaffinity", return_value=set(range(16)), create=True):
+                self.assertEqual(gunicorn_conf.cpu_count(root), 2)
+
+    def test_memory_usage_separates_private_from_shared(self):
+        usage = gunicorn_conf.memory_usage()
+        if usage is None:
+            self.skipTest("/proc no disponible")
+        self.assertGreater(usage["rss"], 0)
+        if "private" in usage:
+            self.assertLessEqual(usage["private"], usage["rss"])
+        self.assertIn("RSS", gunicorn_conf._format_memory(usage))
+
+
+class ImportCostTests(SimpleTestCase):
+    def test_parse_importtime_sums_self_time_per_package(self):
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |     botocore.compat\n"
+            "import time:       300 |        420 |   botocore\n"
+            "import time:        80 |        500 | boto3\n"
+            "[INFO] otra línea\n"
+        )
+        self.assertEqual(import_cost.parse_importtime(output), {"botocore": [2, 420], "boto3": [1, 80]})
+
+    def test_startup_does_not_load_lazy_packages(self):
+        out = io.StringIO()
+        call_command("import_cost", "--target", "setup", "--top", "3", "--check", stdout=out)
+        self.assertIn("Arranque (setup)", out.getvalue())
+        self.assertIn("Sin cargar al arrancar", out.getvalue())
+
+    def test_s3_storage_builds_multipart_transfer_config(self):
+        from proyecto.storage_backends import S3Storage
+
+        with self.settings(MEDIA_MULTIPART_THRESHOLD_MB=16, MEDIA_MULTIPART_CHUNK_MB=8, MEDIA_MULTIPART_CONCURRENCY=2):
+            storage = S3Storage(bucket_name="libros")
+        self.assertEqual(storage.transfer_config.multipart_threshold, 16 * 1024 * 1024)
+        self.assertEqual(storage.transfer_config.max_request_concurrency, 2)
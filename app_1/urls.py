@@ -1,8 +1,22 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# En modo ASGI se enrutan las versiones asíncronas de las vistas
+ASYNC_VIEWS = settings.SERVER_MODE == 'asgi'
+
 urlpatterns = [
     # Ruta original con plantilla básica
-    path('', views.page_login, name='page_login'),
-    path('register/', views.page_register, name='page_register'),
-]
\ No newline at end of file
+    path('', views.apage_login if ASYNC_VIEWS else views.page_login, name='page_login'),
+    path('register/', views.apage_register if ASYNC_VIEWS else views.page_register, name='page_register'),
+    # Envío de los formularios (POST)
+    path('auth/login/', views.alogin_submit if ASYNC_VIEWS else views.login_submit, name='login_submit'),
+    path('auth/register/', views.aregister_submit if ASYNC_VIEWS else views.register_submit, name='register_submit'),
+    # Carátulas: subida (POST) y estado del procesamiento
+    path('covers/', views.cover_upload, name='cover_upload'),
+    path('covers/<uuid:job_id>/', views.cover_status, name='cover_status'),
+    # Exportaciones: estado y descarga antes que el inicio, cuyo patrón también acepta un uuid
+    path('exports/<uuid:job_id>/', views.export_status, name='export_status'),
+    path('exports/<uuid:job_id>/download/', views.export_download, name='export_download'),
+    path('exports/<slug:name>/<slug:export_format>/', views.export_start, name='export_start'),
+]
@@ -1,15 +1,264 @@
-from django.http import HttpResponse
-from django.shortcuts import render
-from django.template import loader
+from datetime import timedelta
+
 from django.conf import settings
+from django.contrib.auth import alogin, get_user_model, login
+from django.db import IntegrityError, transaction
+from django.core.files.storage import FileSystemStorage, storages
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect, JsonResponse
+from django.shortcuts import render, resolve_url
+from django.urls import reverse
+from django.template import loader
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_GET, require_POST
+
+from app_1 import exports
+from app_1.cache import cache_template_response, conditional_template_response
+from app_1.forms import CoverForm, LoginForm, RegisterForm
+from proyecto import covers, jobs, passwords
+from proyecto.ratelimit import ratelimit
 
+# Duración de la sesión con "Recordarme durante los próximos 30 días"
+REMEMBER_ME_AGE = int(timedelta(days=30).total_seconds())
+
+INVALID_LOGIN = "Usuario o contraseña incorrectos."
+DUPLICATE_EMAIL = "Ya existe una cuenta con este correo electrónico."
+HASHING_BUSY = "Hay demasiados inicios de sesión en curso; inténtalo de nuevo en unos segundos."
+COVERS_BUSY = "Hay demasiadas carátulas en proceso; inténtalo de nuevo en unos segundos."
+STAFF_REQUIRED = "Esta operación está reservada al personal."
+EXPORTS_BUSY = "Hay demasiadas exportaciones en curso; inténtalo de nuevo en unos minutos."
+
+# Las páginas de login y registro fijan la cookie CSRF: los formularios se envían por AJAX
+# con la cabecera X-CSRFToken, porque el HTML cacheado no puede llevar un token por usuario
+
+@ensure_csrf_cookie
+@conditional_template_response('app_1/page_login.html')
+@cache_template_response('app_1/page_login.html')
 def page_login(request):
     """Vista original de app_1 con plantilla básica"""
     template = loader.get_template('app_1/page_login.html')
     return HttpResponse(template.render())
 
+@ensure_csrf_cookie
+@conditional_template_response('app_1/page_register.html')
+@cache_template_response('app_1/page_register.html')
 def page_register(request):
     """Vista original de page_register con plantilla básica"""
     template = loader.get_template('app_1/page_register.html')
     return HttpResponse(template.render())
 
+# Envío de los formularios de login y registro
+# El limitador de intentos rechaza antes de cualquier trabajo de autenticación y el hash de la
+# contraseña se calcula en el pool de proyecto/passwords.py, no en el hilo de la solicitud
+
+def _errors(errors, status=400):
+    return JsonResponse({"ok": False, "errors": {field: list(messages) for field, messages in errors.items()}}, status=status)
+
+def _busy():
+    response = _errors({"__all__": [HASHING_BUSY]}, status=503)
+    response["Retry-After"] = "1"
+    return response
+
+def _success(request, status=200):
+    target = request.POST.get("next", "")
+    if not url_has_allowed_host_and_scheme(target, allowed_hosts={request.get_host()}, require_https=request.is_secure()):
+        target = resolve_url(settings.LOGIN_REDIRECT_URL)
+    return JsonResponse({"ok": True, "redirect": target}, status=status)
+
+@require_POST
+@ratelimit('login', field='username')
+def login_submit(request):
+    """Inicia sesión con el formulario #js-login"""
+    form = LoginForm(request.POST)
+    if not form.is_valid():
+        return _errors(form.errors)
+    try:
+        user = passwords.authenticate(request, username=form.cleaned_data["username"], password=form.cleaned_data["password"])
+    except passwords.HashingBusy:
+        return _busy()
+    if user is None:
+        return _errors({"__all__": [INVALID_LOGIN]}, status=401)
+    login(request, user)
+    request.session.set_expiry(REMEMBER_ME_AGE if form.cleaned_data["rememberme"] else 0)
+    return _success(request)
+
+@require_POST
+@ratelimit('register', field='emailverify')
+def register_submit(request):
+    """Crea la cuenta del formulario #js-register e inicia sesión"""
+    form = RegisterForm(request.POST)
+    if not form.is_valid():
+        return _errors(form.errors)
+    user = form.build_user()
+    users = get_user_model()._default_manager
+    if users.filter(username__iexact=user.username).exists():
+        return _errors({"emailverify": [DUPLICATE_EMAIL]})
+    try:
+        user.password = passwords.make_password(form.cleaned_data["userpassword"])
+    except passwords.HashingBusy:
+        return _busy()
+    try:
+        with transaction.atomic():
+            user.save()
+    except IntegrityError:
+        return _errors({"emailverify": [DUPLICATE_EMAIL]})
+    login(request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
+    return _success(request, status=201)
+
+# Carátulas de los libros
+# La subida responde 202 en cuanto el archivo está en la cola; las miniaturas se generan en el
+# pool de procesos de proyecto/covers.py y el cliente consulta el estado con cover_status.
+# Solo hay versión síncrona: mover el archivo subido es E/S de disco, que en ASGI Django
+# ejecuta en un hilo
+
+def _staff_only(request):
+    if not request.user.is_authenticated or not request.user.is_staff:
+        return _errors({"__all__": [STAFF_REQUIRED]}, status=403)
+    return None
+
+@require_POST
+def cover_upload(request):
+    """Recibe una carátula y encola la generación de sus miniaturas"""
+    denied = _staff_only(request)
+    if denied:
+        return denied
+    form = CoverForm(request.POST, request.FILES)
+    if not form.is_valid():
+        return _errors(form.errors)
+    try:
+        job_id = covers.pipeline.submit(form.cleaned_data["cover"], form.cleaned_data["format"])
+    except jobs.JobBusy:
+        response = _errors({"__all__": [COVERS_BUSY]}, status=503)
+        response["Retry-After"] = "5"
+        return response
+    status_url = reverse("cover_status", args=[job_id])
+    response = JsonResponse({"ok": True, "id": job_id, "status": status_url}, status=202)
+    response["Location"] = status_url
+    return response
+
+@require_GET
+def cover_status(request, job_id):
+    """Estado de un trabajo de carátula: pending, done (con las URLs) o error"""
+    denied = _staff_only(request)
+    if denied:
+        return denied
+    status = covers.read_status(str(job_id))
+    if status is None:
+        return JsonResponse({"ok": False}, status=404)
+    return JsonResponse({"ok": True, **status})
+
+# Exportaciones de reportes
+# La solicitud solo encola el trabajo; el archivo se genera en el pool de app_1/exports.py y el
+# cliente consulta export_status (filas escritas y total) hasta que puede descargarlo
+
+def _export_status(request, job_id):
+    """Estado del trabajo si existe y pertenece al usuario (o es superusuario)"""
+    status = exports.read_status(str(job_id))
+    if status is None or (status.get("user") != request.user.pk and not request.user.is_superuser):
+        raise Http404()
+    return status
+
+@require_POST
+def export_start(request, name, export_format):
+    """Encola la exportación `name` en el formato `export_format` ('xlsx' o 'pdf')"""
+    denied = _staff_only(request)
+    if denied:
+        return denied
+    if name not in exports.EXPORTS or export_format not in exports.FORMATS:
+        raise Http404()
+    try:
+        job_id = exports.pipeline.submit(name, export_format, request.user.pk)
+    except jobs.JobBusy:
+        response = _errors({"__all__": [EXPORTS_BUSY]}, status=503)
+        response["Retry-After"] = "30"
+        return response
+    status_url = reverse("export_status", args=[job_id])
+    response = JsonResponse({
+        "ok": True, "id": job_id, "status": status_url, "download": reverse("export_download", args=[job_id]),
+    }, status=202)
+    response["Location"] = status_url
+    return response
+
+@require_GET
+def export_status(request, job_id):
+    """Estado de una exportación: pending, running (filas y total), done o error"""
+    denied = _staff_only(request)
+    if denied:
+        return denied
+    return JsonResponse({"ok": True, **_export_status(request, job_id)})
+
+@require_GET
+def export_download(request, job_id):
+    """Descarga el archivo terminado: desde el disco en desarrollo o con una URL firmada de S3"""
+    denied = _staff_only(request)
+    if denied:
+        return denied
+    status = _export_status(request, job_id)
+    if status["state"] != "done":
+        return JsonResponse({"ok": False, "state": status["state"]}, status=409)
+    storage = storages["exports"]
+    if isinstance(storage, FileSystemStorage):
+        _extension, content_type = exports.FORMATS[status["format"]]
+        return FileResponse(storage.open(status["file"], "rb"), as_attachment=True,
+                            filename=status["filename"], content_type=content_type)
+    return HttpResponseRedirect(storage.url(status["file"], parameters={
+        "ResponseContentDisposition": f'attachment; filename="{status["filename"]}"',
+    }))
+
+# Versiones asíncronas de las vistas, usadas cuando SERVER_MODE es 'asgi'
+# Evitan que Django ejecute cada vista en el hilo de sync_to_async
+
+@ensure_csrf_cookie
+@conditional_template_response('app_1/page_login.html')
+@cache_template_response('app_1/page_login.html')
+async def apage_login(request):
+    """Versión asíncrona de page_login para el despliegue ASGI"""
+    template = loader.get_template('app_1/page_login.html')
+    return HttpResponse(template.render())
+
+@ensure_csrf_cookie
+@conditional_template_response('app_1/page_register.html')
+@cache_template_response('app_1/page_register.html')
+async def apage_register(request):
+    """Versión asíncrona de page_register para el despliegue ASGI"""
+    template = loader.get_template('app_1/page_register.html')
+    return HttpResponse(template.render())
+
+@require_POST
+@ratelimit('login', field='username')
+async def alogin_submit(request):
+    """Versión asíncrona de login_submit; el bucle de eventos sigue libre mientras se calcula el hash"""
+    form = LoginForm(request.POST)
+    if not form.is_valid():
+        return _errors(form.errors)
+    try:
+        user = await passwords.aauthenticate(request, username=form.cleaned_data["username"], password=form.cleaned_data["password"])
+    except passwords.HashingBusy:
+        return _busy()
+    if user is None:
+        return _errors({"__all__": [INVALID_LOGIN]}, status=401)
+    await alogin(request, user)
+    await request.session.aset_expiry(REMEMBER_ME_AGE if form.cleaned_data["rememberme"] else 0)
+    return _success(request)
+
+@require_POST
+@ratelimit('register', field='emailverify')
+async def aregister_submit(request):
+    """Versión asíncrona de register_submit"""
+    form = RegisterForm(request.POST)
+    if not form.is_valid():
+        return _errors(form.errors)
+    user = form.build_user()
+    users = get_user_model()._default_manager
+    if await users.filter(username__iexact=user.username).aexists():
+        return _errors({"emailverify": [DUPLICATE_EMAIL]})
+    try:
+        user.password = await passwords.amake_password(form.cleaned_data["userpassword"])
+    except passwords.HashingBusy:
+        return _busy()
+    try:
+        await user.asave()
+    except IntegrityError:
+        return _errors({"emailverify": [DUPLICATE_EMAIL]})
+    await alogin(request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
+    return _success(request, status=201)
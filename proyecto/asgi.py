@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'proyecto.settings')
 
 application = get_asgi_application()
+
+# Precompila las plantillas en el cargador en caché antes de que el worker acepte tráfico
+from proyecto.warmup import run_warmup  # noqa: E402
+
+run_warmup()
@@ -0,0 +1,449 @@
+# -*- coding: utf-8 -*-
+"""
+Construcción de CSS crítico y paquetes JS reducidos por página.
+
+Las páginas de autenticación (las plantillas que extienden auth_base.html)
+cargan vendors.bundle.css, app.bundle.css y vendors.bundle.js completos aunque
+usan una fracción mínima. El comando build_page_assets usa este módulo para:
+
+* Extraer de las hojas de estilo de la página solo las reglas cuyos
+  selectores pueden coincidir con el HTML renderizado (o con las clases que sus
+  scripts añaden en tiempo de ejecución). Ese CSS se incrusta en <head> y las
+  hojas completas se cargan sin bloquear el renderizado.
+* Armar un paquete JS con los scripts propios de la página y solo los módulos
+  de vendors.bundle.js / app.bundle.js que esos scripts usan.
+
+Los resultados se guardan en proyecto/static/proyecto/build/ y los usan las
+etiquetas de proyecto/templatetags/page_assets.py.
+"""
+
+import gzip
+import os
+import posixpath
+import re
+from html.parser import HTMLParser
+
+from django.conf import settings
+
+# Prefijo (nombre de estático) y directorio donde se escriben los resultados
+BUILD_PREFIX = "proyecto/build"
+BUILD_DIR = os.path.join(settings.BASE_DIR, "proyecto", "static", "proyecto", "build")
+
+# Marcadores que emiten page_styles/page_scripts cuando se renderiza para la construcción
+STYLES_MARKER = "page-styles"
+SCRIPTS_MARKER = "page-scripts"
+
+CRITICAL_SUFFIX = ".critical.css"
+BUNDLE_SUFFIX = ".js"
+
+VENDORS_BUNDLE = "proyecto/js/vendors.bundle.js"
+APP_BUNDLE = "proyecto/js/app.bundle.js"
+
+# Módulos de vendors.bundle.js en el orden en que aparecen: (nombre, inicio, uso, dependencias).
+# `inicio` es una expresión que ubica el comienzo del módulo dentro del paquete y
+# `uso` una expresión que, si aparece en los scripts o el HTML de la página, lo hace necesario.
+VENDOR_MODULES = (
+    ("pace", r"\A", r"\bPace\b", ()),
+    ("jquery", r"/\*!\s*\n \* jQuery JavaScript Library", r"(?<![\w$])(?:\$|jQuery)\s*[.(]", ()),
+    ("jquery-ui", r"/\*! jQuery UI - ", r"\.(?:draggable|droppable|sortable|effect|widget)\s*\(", ("jquery",)),
+    ("popper", r"/\*\*!\s*\n \* @fileOverview Kickass library", r"\bPopper\b", ()),
+    ("bootstrap", r"/\*!\s*\n\s+\* Bootstrap v", r"\.(?:modal|tooltip|popover|collapse|dropdown|tab|toast|carousel|scrollspy)\s*\(|\bdata-(?:toggle|dismiss)=", ("jquery", "popper")),
+    ("bootbox", r"/\*! @preserve\s*\n \* bootbox\.js", r"\bbootbox\.", ("jquery", "bootstrap")),
+    ("throttle-debounce", r"/\*!\s*\n \* jQuery throttle / debounce", r"\$\.(?:throttle|debounce)\b", ("jquery",)),
+    ("slimscroll", r"/\*! Copyright \(c\) 2011 Piotr Rochala", r"\.slimScroll\s*\(", ("jquery",)),
+    ("waves", r"/\*!\s*\n \* Waves v", r"\bWaves\b|\bwaves-effect\b", ()),
+    ("smartpanels", r"\(function \(\$, window, document, undefined\) \{\s*//\"use strict\";\s*var pluginName = 'smartPanel'", r"\.smartPanel\s*\(", ("jquery", "jquery-ui")),
+)
+# app.bundle.js inicializa el diseño del panel y usa todos los módulos anteriores
+APP_MODULE = ("app", r"\b(?:initApp|myapp_config)\b", tuple(name for name, *_rest in VENDOR_MODULES))
+
+_HTML_COMMENT_RE = re.compile(r"<!--.*?-->", re.DOTALL)
+_SOURCE_MAP_RE = re.compile(r"^\s*//# sourceMappingURL=.*$", re.MULTILINE)
+_URL_RE = re.compile(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)")
+_JS_STRING_RE = re.compile(r"['\"]([A-Za-z][\w-]*(?:\s+[A-Za-z][\w-]*)*)['\"]")
+
+
+def gzip_size(data):
+    """Bytes transferidos con gzip, como los sirve WhiteNoise"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return len(gzip.compress(data, compresslevel=6))
+
+
+# Análisis del HTML
+
+
+class PageInventory(HTMLParser):
+    """
+    Etiquetas, clases, ids y atributos presentes en el HTML de una página, junto
+    con las hojas de estilo y scripts que aparecen entre los marcadores de
+    page_styles y page_scripts.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tags = {"html", "body", "head"}
+        self.classes = set()
+        self.ids = set()
+        self.attributes = set()
+        self.stylesheets = []
+        self.scripts = []
+        self.inline_scripts = False
+        self._region = None
+
+    def handle_comment(self, data):
+        data = data.strip()
+        if data in (STYLES_MARKER, SCRIPTS_MARKER):
+            self._region = data
+        elif data in (f"/{STYLES_MARKER}", f"/{SCRIPTS_MARKER}"):
+            self._region = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        self.tags.add(tag)
+        self.attributes.update(attrs)
+        self.classes.update((attrs.get("class") or "").split())
+        if attrs.get("id"):
+            self.ids.add(attrs["id"])
+        if self._region == STYLES_MARKER and tag == "link" and attrs.get("rel") == "stylesheet":
+            # El enlace vacío (#mytheme) lo completa theme-loader.js con el tema elegido
+            if attrs.get("href", "#") != "#":
+                self.stylesheets.append(attrs["href"])
+        elif self._region == SCRIPTS_MARKER and tag == "script":
+            if attrs.get("src"):
+                self.scripts.append(attrs["src"])
+            else:
+                self.inline_scripts = True
+
+    handle_startendtag = handle_starttag
+
+    def add_runtime_names(self, script_source):
+        """Las cadenas de los scripts pueden ser clases o ids que se añaden al DOM en ejecución"""
+        for match in _JS_STRING_RE.finditer(script_source):
+            names = match.group(1).split()
+            self.classes.update(names)
+            self.ids.update(names)
+
+
+class ResourceCollector(HTMLParser):
+    """Hojas de estilo y scripts que descarga una página: (tipo, URL, bloquea el renderizado)"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.resources = []
+        self._noscript = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "noscript":
+            self._noscript += 1
+        elif self._noscript:
+            return
+        elif tag == "link" and attrs.get("rel") == "stylesheet" and attrs.get("href", "#") != "#":
+            self.resources.append(("css", attrs["href"], True))
+        elif tag == "link" and attrs.get("rel") == "preload" and attrs.get("as") == "style":
+            self.resources.append(("css", attrs["href"], False))
+        elif tag == "script" and attrs.get("src"):
+            self.resources.append(("js", attrs["src"], "async" not in attrs and "defer" not in attrs))
+
+    def handle_endtag(self, tag):
+        if tag == "noscript" and self._noscript:
+            self._noscript -= 1
+
+
+def page_resources(html):
+    collector = ResourceCollector()
+    collector.feed(html)
+    collector.close()
+    return collector.resources
+
+
+def inventory_page(html):
+    inventory = PageInventory()
+    inventory.feed(html)
+    inventory.close()
+    return inventory
+
+
+# CSS crítico
+
+
+def _strip_comments(css):
+    out = []
+    i = 0
+    quote = None
+    while i < len(css):
+        char = css[i]
+        if quote:
+            out.append(char)
+            if char == "\\":
+                out.append(css[i + 1:i + 2])
+                i += 2
+                continue
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+            out.append(char)
+        elif css.startswith("/*", i):
+            end = css.find("*/", i + 2)
+            i = len(css) if end == -1 else end + 2
+            continue
+        else:
+            out.append(char)
+        i += 1
+    return "".join(out)
+
+
+def _scan_until(css, start, stops):
+    """Índice del primer carácter de `stops` fuera de cadenas y paréntesis"""
+    depth = 0
+    quote = None
+    i = start
+    while i < len(css):
+        char = css[i]
+        if quote:
+            if char == "\\":
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif depth == 0 and char in stops:
+            return i
+        i += 1
+    return len(css)
+
+
+def _matching_brace(css, start):
+    """Índice de la llave que cierra la que está en `start`"""
+    depth = 0
+    i = start
+    while i < len(css):
+        i = _scan_until(css, i, "{}")
+        if i >= len(css):
+            break
+        depth += 1 if css[i] == "{" else -1
+        if depth == 0:
+            return i
+        i += 1
+    return len(css)
+
+
+def parse_css(css):
+    """
+    Divide una hoja de estilo (sin comentarios) en una lista de
+    ("rule", selectores, declaraciones) y ("at", preludio, cuerpo | None).
+    """
+    items = []
+    i = 0
+    while i < len(css):
+        while i < len(css) and css[i] in " \t\r\n;":
+            i += 1
+        if i >= len(css):
+            break
+        stop = _scan_until(css, i, "{;" if css[i] == "@" else "{")
+        prelude = css[i:stop].strip()
+        if stop >= len(css) or css[stop] == ";":
+            if prelude.startswith("@"):
+                items.append(("at", prelude, None))
+            i = stop + 1
+            continue
+        end = _matching_brace(css, stop)
+        body = css[stop + 1:end]
+        items.append(("at" if prelude.startswith("@") else "rule", prelude, body))
+        i = end + 1
+    return items
+
+
+def split_selectors(selector_text):
+    selectors = []
+    start = 0
+    while start <= len(selector_text):
+        stop = _scan_until(selector_text, start, ",")
+        part = selector_text[start:stop].strip()
+        if part:
+            selectors.append(part)
+        start = stop + 1
+    return selectors
+
+
+_PSEUDO_RE = re.compile(r"::?[\w-]+(?:\((?:[^()]|\([^()]*\))*\))?")
+_ATTRIBUTE_RE = re.compile(r"\[\s*([\w-]+)[^\]]*\]")
+_CLASS_RE = re.compile(r"\.((?:\\.|[\w-])+)")
+_ID_RE = re.compile(r"#((?:\\.|[\w-])+)")
+_TAG_RE = re.compile(r"^([a-zA-Z][\w-]*|\*)")
+_UNESCAPE_RE = re.compile(r"\\(.)")
+
+
+def selector_may_match(selector, inventory):
+    """
+    Aproximación conservadora: el selector puede coincidir si cada una de sus
+    partes (etiqueta, clases, ids, atributos) existe en algún lugar de la página.
+    Las pseudoclases se ignoran, así que nunca se descarta una regla que se use.
+    """
+    attributes = _ATTRIBUTE_RE.findall(selector)
+    if any(name.lower() not in inventory.attributes for name in attributes):
+        return False
+    selector = _ATTRIBUTE_RE.sub("", _PSEUDO_RE.sub("", selector))
+    for compound in re.split(r"\s*[>+~]\s*|\s+", selector.strip()):
+        if not compound:
+            continue
+        tag = _TAG_RE.match(compound)
+        if tag and tag.group(1) != "*" and tag.group(1).lower() not in inventory.tags:
+            return False
+        for name in _CLASS_RE.findall(compound):
+            if _UNESCAPE_RE.sub(r"\1", name) not in inventory.classes:
+                return False
+        for name in _ID_RE.findall(compound):
+            if _UNESCAPE_RE.sub(r"\1", name) not in inventory.ids:
+                return False
+    return True
+
+
+def _compact_declarations(body):
+    body = re.sub(r"\s+", " ", body).strip()
+    body = re.sub(r"\s*;\s*", ";", body)
+    body = re.sub(r"\s*:\s*", ":", body)
+    return body.rstrip(";")
+
+
+def _rebase_urls(declarations, stylesheet_name, target_name):
+    """Reescribe las url() relativas de `stylesheet_name` para que funcionen desde `target_name`"""
+    source_dir = posixpath.dirname(stylesheet_name)
+    target_dir = posixpath.dirname(target_name)
+
+    def rebase(match):
+        url = match.group(2).strip()
+        if url.startswith(("data:", "http:", "https:", "//", "/", "#")):
+            return match.group(0)
+        path, separator, suffix = re.match(r"([^?#]*)([?#]?)(.*)", url).groups()
+        resolved = posixpath.normpath(posixpath.join(source_dir, path))
+        return "url(%s%s%s)" % (posixpath.relpath(resolved, target_dir), separator, suffix)
+
+    return _URL_RE.sub(rebase, declarations)
+
+
+def _is_print_only(prelude):
+    media = prelude.lower()
+    return "print" in media and "screen" not in media and "all" not in media
+
+
+def _critical_items(items, inventory, stylesheet_name, target_name, used):
+    out = []
+    for kind, prelude, body in items:
+        if kind == "rule":
+            selectors = [selector for selector in split_selectors(prelude) if selector_may_match(selector, inventory)]
+            if selectors:
+                declarations = _rebase_urls(_compact_declarations(body), stylesheet_name, target_name)
+                used["declarations"].append(declarations)
+                out.append("%s{%s}" % (",".join(selectors), declarations))
+            continue
+        name = prelude.split(None, 1)[0].lower()
+        if name in ("@media", "@supports") and body is not None:
+            if name == "@media" and _is_print_only(prelude):
+                continue
+            inner = _critical_items(parse_css(body), inventory, stylesheet_name, target_name, used)
+            if inner:
+                out.append("%s{%s}" % (re.sub(r"\s+", " ", prelude), "".join(inner)))
+        elif name == "@font-face" and body is not None:
+            used["font_faces"].append(_rebase_urls(_compact_declarations(body), stylesheet_name, target_name))
+        elif name.endswith("keyframes") and body is not None:
+            used["keyframes"].append((prelude.split(None, 1)[1].strip(), "%s{%s}" % (re.sub(r"\s+", " ", prelude), re.sub(r"\s+", " ", body).strip())))
+    return out
+
+
+def critical_css(stylesheets, inventory, target_name):
+    """
+    CSS crítico para una página. `stylesheets` es una lista de
+    (nombre de estático, contenido) en el orden en que la página los carga.
+    """
+    parts = []
+    used = {"declarations": [], "font_faces": [], "keyframes": []}
+    for name, css in stylesheets:
+        parts.extend(_critical_items(parse_css(_strip_comments(css)), inventory, name, target_name, used))
+    declarations = " ".join(used["declarations"])
+    # Solo se incluyen las fuentes y animaciones que usan las reglas conservadas
+    for font_face in used["font_faces"]:
+        family = re.search(r"font-family:\s*(['\"]?)([^;'\"]+)\1", font_face)
+        if family and family.group(2) in declarations:
+            parts.insert(0, "@font-face{%s}" % font_face)
+    for animation, keyframes in used["keyframes"]:
+        if re.search(r"animation(?:-name)?:[^;]*\b%s\b" % re.escape(animation), declarations):
+            parts.append(keyframes)
+    return "\n".join(parts) + "\n"
+
+
+# Paquete JS por página
+
+
+def split_vendor_bundle(source):
+    """Divide vendors.bundle.js en sus módulos según VENDOR_MODULES"""
+    starts = []
+    for name, start, _usage, _requires in VENDOR_MODULES:
+        match = re.compile(start).search(source)
+        if match is None:
+            raise ValueError(f"No se encontró el inicio del módulo '{name}' en {VENDORS_BUNDLE}")
+        starts.append((match.start(), name))
+    starts.sort()
+    modules = {}
+    for index, (offset, name) in enumerate(starts):
+        end = starts[index + 1][0] if index + 1 < len(starts) else len(source)
+        modules[name] = source[offset:end]
+    return modules
+
+
+def required_modules(page_sources):
+    """Nombres de los módulos (incluidas dependencias) que usan los scripts y el HTML de la página"""
+    requires = {name: deps for name, _start, _usage, deps in VENDOR_MODULES}
+    requires[APP_MODULE[0]] = APP_MODULE[2]
+    usages = [(name, usage) for name, _start, usage, _deps in VENDOR_MODULES] + [(APP_MODULE[0], APP_MODULE[1])]
+    needed = set()
+    page_sources = _HTML_COMMENT_RE.sub("", page_sources)
+    pending = [name for name, usage in usages if re.search(usage, page_sources)]
+    while pending:
+        name = pending.pop()
+        if name not in needed:
+            needed.add(name)
+            pending.extend(requires[name])
+    order = [name for name, *_rest in VENDOR_MODULES] + [APP_MODULE[0]]
+    return [name for name in order if name in needed]
+
+
+def js_bundle(modules, vendor_modules, app_source, scripts):
+    """
+    Concatena los módulos necesarios y los scripts de la página.
+    `scripts` es una lista de (nombre de estático, contenido).
+    """
+    parts = []
+    for name in modules:
+        source = app_source if name == APP_MODULE[0] else vendor_modules[name]
+        parts.append("/* %s */\n%s" % (name, source))
+    for name, source in scripts:
+        parts.append("/* %s */\n%s" % (name, source))
+    # Los mapas de fuente de los módulos originales no corresponden al paquete
+    return _SOURCE_MAP_RE.sub("", "\n;\n".join(parts)) + "\n"
+
+
+# Resultados
+
+
+def build_name(template_name, suffix):
+    """Nombre de estático del resultado para una plantilla, p. ej. proyecto/build/app_1/page_login.js"""
+    return posixpath.join(BUILD_PREFIX, posixpath.splitext(template_name)[0] + suffix)
+
+
+def estimate_first_render(html_bytes, blocking_bytes, blocking_requests, rtt, bandwidth):
+    """
+    Estimación del primer renderizado en milisegundos: un viaje de ida y vuelta
+    para el HTML, otro por cada tanda de recursos que bloquean el renderizado
+    (se descargan en paralelo) y el tiempo de transferencia de todos esos bytes.
+    `bandwidth` está en kilobits por segundo.
+    """
+    round_trips = 1 + (1 if blocking_requests else 0)
+    transfer = (html_bytes + blocking_bytes) * 8 / bandwidth
+    return round_trips * rtt + transfer
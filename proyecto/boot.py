@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+Preparación del arranque: estáticos y migraciones solo cuando cambiaron.
+
+El comando `boot` calcula en paralelo la huella de los estáticos fuente, el
+plan de migraciones de la base de datos principal y si hay modelos sin
+migración. Luego ejecuta collectstatic_incremental y migrate únicamente si su
+huella cambió o hay migraciones pendientes. Las huellas del último arranque
+correcto se guardan en BOOT_STATE_PATH, y el tiempo de cada fase se registra
+en el logger proyecto.boot para seguir la evolución del arranque en frío.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+logger = logging.getLogger(__name__)
+
+# Versión del formato del archivo de estado; cambiarla obliga a repetir todos los pasos
+STATE_VERSION = 1
+
+
+def _digest(items):
+    sha = hashlib.sha256()
+    for item in items:
+        sha.update(repr(item).encode("utf-8"))
+        sha.update(b"\0")
+    return sha.hexdigest()
+
+
+def process_uptime():
+    """Segundos desde que arrancó el proceso (importaciones y django.setup incluidos); None si no se puede saber"""
+    try:
+        with open("/proc/self/stat", encoding="ascii") as handle:
+            # El nombre del ejecutable va entre paréntesis y puede contener espacios
+            fields = handle.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime", encoding="ascii") as handle:
+            uptime = float(handle.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def load_state(path):
+    try:
+        with open(path, encoding="utf-8") as handle:
+            state = json.load(handle)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+        return {}
+    return state
+
+
+def save_state(path, state):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as handle:
+        json.dump({**state, "version": STATE_VERSION}, handle, indent=1)
+    os.replace(temporary, path)
+
+
+# Comprobaciones (se ejecutan en paralelo)
+
+def static_fingerprint():
+    """
+    Huella de los estáticos fuente (ruta, tamaño y fecha de cada archivo que
+    encuentran los finders) y de la configuración que afecta al resultado.
+    """
+    items = [
+        settings.STATIC_URL,
+        str(settings.STATIC_ROOT),
+        settings.STORAGES["staticfiles"]["BACKEND"],
+    ]
+    files = []
+    for finder in finders.get_finders():
+        for path, storage in finder.list(["CVS", ".*", "*~"]):
+            prefix = getattr(storage, "prefix", None) or ""
+            try:
+                stat = os.stat(storage.path(path))
+            except (NotImplementedError, OSError):
+                continue
+            files.append((os.path.join(prefix, path), stat.st_size, stat.st_mtime_ns))
+    files.sort()
+    return _digest(items + files)
+
+
+def static_output_ready():
+    """Comprueba que STATIC_ROOT contiene una recolección (el manifiesto, si el almacenamiento lo usa)"""
+    manifest_name = getattr(staticfiles_storage, "manifest_name", None)
+    if manifest_name:
+        try:
+            return staticfiles_storage.exists(manifest_name)
+        except OSError:
+            return False
+    return os.path.isdir(settings.STATIC_ROOT) and bool(os.listdir(settings.STATIC_ROOT))
+
+
+def inspect_migrations(database=DEFAULT_DB_ALIAS):
+    """
+    Devuelve (huella, migraciones pendientes). La huella combina el grafo de
+    migraciones en disco con las migraciones aplicadas en la base de datos.
+    """
+    connection = connections[database]
+    try:
+        executor = MigrationExecutor(connection)
+        graph = executor.loader.graph
+        nodes = sorted((key, tuple(sorted(parent.key for parent in node.parents))) for key, node in graph.node_map.items())
+        applied = sorted(executor.loader.applied_migrations)
+        plan = executor.migration_plan(graph.leaf_nodes())
+        return _digest([database] + nodes + ["aplicadas"] + applied), ["%s.%s" % (m.app_label, m.name) for m, _ in plan]
+    finally:
+        # La conexión pertenece al hilo de la comprobación
+        connection.close()
+
+
+def check_model_changes():
+    """Nombres de las migraciones que makemigrations crearía (deben generarse en desarrollo y comitearse)"""
+    output = io.StringIO()
+    try:
+        call_command("makemigrations", check=True, dry_run=True, verbosity=1, stdout=output)
+    except SystemExit:
+        return [line.strip() for line in output.getvalue().splitlines() if line.strip().startswith("-")] or ["(sin detalle)"]
+    finally:
+        for connection in connections.all(initialized_only=True):
+            connection.close()
+    return []
+
+
+# Pasos
+
+def collect_static(workers=None):
+    output = io.StringIO()
+    options = {"interactive": False, "verbosity": 1, "stdout": output}
+    if workers:
+        options["workers"] = workers
+    call_command("collectstatic_incremental", **options)
+    return output.getvalue()
+
+
+def migrate(database=DEFAULT_DB_ALIAS):
+    output = io.StringIO()
+    try:
+        call_command("migrate", database=database, interactive=False, verbosity=1, stdout=output)
+    finally:
+        connections[database].close()
+    return output.getvalue()
+
+
+class Timer:
+    """Acumula la duración (ms) de cada fase en el orden en que se ejecutan"""
+
+    def __init__(self):
+        self.phases = {}
+
+    def run(self, phase, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.phases[phase] = (time.perf_counter() - start) * 1000
+
+
+def boot(force=False, database=DEFAULT_DB_ALIAS, workers=None, write=print):
+    """
+    Ejecuta las comprobaciones y los pasos necesarios. Devuelve un diccionario
+    con las fases ejecutadas ('static', 'migrate') y los tiempos en ms.
+    """
+    started = time.perf_counter()
+    timer = Timer()
+    state_path = settings.BOOT_STATE_PATH
+    state = {} if force else load_state(state_path)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        checks_started = time.perf_counter()
+        static_future = executor.submit(timer.run, "huella_estaticos", static_fingerprint)
+        migrations_future = executor.submit(timer.run, "plan_migraciones", inspect_migrations, database)
+        models_future = executor.submit(timer.run, "cambios_modelos", check_model_changes)
+        static_hash = static_future.result()
+        migrations_hash, pending = migrations_future.result()
+        model_changes = models_future.result()
+        timer.phases["comprobaciones"] = (time.perf_counter() - checks_started) * 1000
+
+        run_static = force or state.get("static") != static_hash or not static_output_ready()
+        run_migrate = force or bool(pending)
+        if model_changes:
+            logger.warning("Hay cambios en los modelos sin migración; no se aplican al arrancar: %s", ", ".join(model_changes))
+
+        # collectstatic y migrate son independientes: se ejecutan a la vez
+        steps_started = time.perf_counter()
+        migrate_future = executor.submit(timer.run, "migrate", migrate, database) if run_migrate else None
+        if run_static:
+            write(timer.run("collectstatic", collect_static, workers))
+            state["static"] = static_hash
+        if migrate_future is not None:
+            write(migrate_future.result())
+            migrations_hash, pending = inspect_migrations(database)
+        timer.phases["pasos"] = (time.perf_counter() - steps_started) * 1000
+
+    state.setdefault("migrations", {})[database] = migrations_hash
+    timer.phases["total"] = (time.perf_counter() - started) * 1000
+    uptime = process_uptime()
+    if uptime is not None:
+        # Desde que arrancó el proceso hasta que boot comenzó: importaciones y django.setup
+        timer.phases = {"inicio": uptime * 1000 - timer.phases["total"], **timer.phases}
+    save_state(state_path, {**state, "timings": timer.phases})
+
+    logger.info(
+        "Arranque: estáticos %s, migraciones %s",
+        "recolectados" if run_static else "sin cambios",
+        "aplicadas" if run_migrate else "sin cambios",
+    )
+    logger.info("Tiempos de arranque: %s", " ".join("%s=%.0fms" % item for item in timer.phases.items()))
+    return {"static": run_static, "migrate": run_migrate, "pending": pending, "timings": timer.phases}
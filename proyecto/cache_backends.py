@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+"""
+Caché de Django compartida por los workers del nodo en una base SQLite (WAL).
+
+Con LocMemCache cada worker de gunicorn tiene su propia copia: los aciertos de
+uno no sirven a los demás y la memoria se multiplica por el número de
+workers. SQLiteCache guarda las entradas en un archivo local (CACHES
+LOCATION, mejor en /dev/shm) que todos los workers abren en modo WAL: las
+lecturas no bloquean ni esperan a las escrituras y no hace falta un servicio
+externo.
+
+- Presupuesto de bytes: el total se mantiene con triggers en la tabla totals.
+  Al superar MAX_BYTES se borran primero las entradas vencidas y luego las
+  usadas hace más tiempo (LRU aproximado: la hora de acceso se actualiza como
+  mucho cada ACCESS_RESOLUTION segundos para no escribir en cada lectura, y
+  sin esperar: si otro proceso está escribiendo, la lectura no la actualiza)
+  hasta bajar a CULL_TARGET del presupuesto.
+- Una sola recomputación (single-flight): get_or_set con una función toma un
+  bloqueo por clave en la tabla locks antes de calcular el valor; los demás
+  procesos e hilos esperan a que el valor aparezca en lugar de calcularlo
+  todos a la vez. Si quien tiene el bloqueo tarda más de LOCK_TIMEOUT
+  segundos (o murió), el bloqueo vence y otro lo toma.
+
+Aciertos, fallos, desalojos y esperas se publican en /metrics como
+cache_requests_total, cache_evictions_total y cache_single_flight_total;
+stats() devuelve además el tamaño y las entradas actuales.
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from proyecto.metrics import registry
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT NOT NULL UNIQUE,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    bytes INTEGER NOT NULL,
+    evictions INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals VALUES (1, 0, 0);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries
+    BEGIN UPDATE totals SET bytes = bytes + new.size; END;
+CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries
+    BEGIN UPDATE totals SET bytes = bytes - old.size + new.size; END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries
+    BEGIN UPDATE totals SET bytes = bytes - old.size; END;
+CREATE TABLE IF NOT EXISTS locks (
+    key TEXT PRIMARY KEY,
+    expires REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+UPSERT = (
+    "INSERT INTO entries (key, value, size, expires, accessed) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+    "expires = excluded.expires, accessed = excluded.accessed"
+)
+# Condición de las entradas vigentes; el parámetro es la hora actual
+ALIVE = "(expires IS NULL OR expires > ?)"
+
+# Segundos mínimos entre actualizaciones de la hora de acceso de una entrada
+ACCESS_RESOLUTION = 10.0
+# Fracción del presupuesto a la que se baja al desalojar
+CULL_TARGET = 0.9
+# Segundos entre consultas mientras otro proceso calcula el valor
+LOCK_POLL = 0.02
+# Segundos que SQLite espera a que otro proceso libere la base antes de fallar
+BUSY_TIMEOUT = 5.0
+
+_MISSING = object()
+
+registry.declare("cache_requests_total", "counter", "Lecturas de la caché compartida por resultado")
+registry.declare("cache_evictions_total", "counter", "Entradas desalojadas de la caché compartida por falta de espacio")
+registry.declare("cache_single_flight_total", "counter", "Valores de get_or_set calculados, esperados o calculados tras vencer el bloqueo")
+
+
+class SQLiteCache(BaseCache):
+    """
+    Backend de caché en SQLite compartido por los procesos del nodo.
+    OPTIONS: MAX_BYTES (presupuesto, 64 MB por defecto) y LOCK_TIMEOUT
+    (segundos máximos de un cálculo de get_or_set, 30 por defecto).
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._path = location
+        self._max_bytes = int(options.get("MAX_BYTES", 64 * 1024 * 1024))
+        self._lock_timeout = float(options.get("LOCK_TIMEOUT", 30))
+        self._local = threading.local()
+        self._counts_lock = threading.Lock()
+        self._counts = {"hits": 0, "misses": 0}
+
+    # Conexión por hilo y por proceso: una conexión de SQLite no sobrevive a un fork
+
+    def _db(self):
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self._path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode = WAL")
+            # Es una caché: perder las últimas escrituras si se apaga el nodo no importa
+            connection.execute("PRAGMA synchronous = OFF")
+            connection.execute(f"PRAGMA mmap_size = {max(self._max_bytes * 2, 64 * 1024 * 1024)}")
+            connection.executescript(f"BEGIN IMMEDIATE; {SCHEMA} COMMIT;")
+            local.connection = connection
+            local.pid = os.getpid()
+        return local.connection
+
+    def _write(self, statements):
+        """Ejecuta statements(db) dentro de una transacción de escritura y devuelve su resultado"""
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            result = statements(db)
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+        return result
+
+    def _count(self, result, amount=1):
+        registry.inc("cache_requests_total", {"result": result}, amount)
+        with self._counts_lock:
+            self._counts["hits" if result == "hit" else "misses"] += amount
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    # Lecturas
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        value = self._get_many([key]).get(key, _MISSING)
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        mapped = {self.make_and_validate_key(key, version=version): key for key in keys}
+        found = self._get_many(list(mapped))
+        return {mapped[key]: value for key, value in found.items()}
+
+    def _get_many(self, keys):
+        if not keys:
+            return {}
+        now = time.time()
+        db = self._db()
+        placeholders = ", ".join("?" * len(keys))
+        rows = db.execute(
+            f"SELECT key, value, accessed FROM entries WHERE key IN ({placeholders}) AND {ALIVE}", (*keys, now),
+        ).fetchall()
+        stale = [key for key, _value, accessed in rows if now - accessed > ACCESS_RESOLUTION]
+        if stale:
+            # Sin busy timeout: una lectura nunca espera a un escritor por la hora de acceso
+            db.execute("PRAGMA busy_timeout = 0")
+            try:
+                db.execute(f"UPDATE entries SET accessed = ? WHERE key IN ({', '.join('?' * len(stale))})", (now, *stale))
+            except sqlite3.OperationalError:
+                # Base ocupada: la hora de acceso se actualizará en la próxima lectura
+                pass
+            finally:
+                db.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}")
+        if rows:
+            self._count("hit", len(rows))
+        if len(rows) < len(keys):
+            self._count("miss", len(keys) - len(rows))
+        return {key: pickle.loads(value) for key, value, _accessed in rows}
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._db().execute(f"SELECT 1 FROM entries WHERE key = ? AND {ALIVE}", (key, time.time())).fetchone()
+        return row is not None
+
+    # Escrituras
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._set_many({key: value}, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._set_many({self.make_and_validate_key(key, version=version): value for key, value in data.items()}, timeout)
+        return []
+
+    def _set_many(self, data, timeout):
+        now = time.time()
+        expires = self._expires(timeout)
+        rows, removed = [], []
+        for key, value in data.items():
+            pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            size = len(key) + len(pickled)
+            if (expires is not None and expires <= now) or size > self._max_bytes:
+                # timeout=0 (vence al momento) o un valor que no cabe en el presupuesto
+                removed.append(key)
+            else:
+                rows.append((key, pickled, size, expires, now))
+
+        def statements(db):
+            if removed:
+                db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in removed])
+            if rows:
+                db.executemany(UPSERT, rows)
+                self._cull(db, now)
+
+        self._write(statements)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        expires = self._expires(timeout)
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        size = len(key) + len(pickled)
+        if size > self._max_bytes:
+            return False
+
+        def statements(db):
+            # Solo reemplaza una entrada existente si ya venció
+            cursor = db.execute(f"{UPSERT} WHERE NOT {ALIVE.replace('expires', 'entries.expires')}",
+                                (key, pickled, size, expires, now, now))
+            self._cull(db, now)
+            return cursor.rowcount > 0
+
+        return self._write(statements)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        cursor = self._db().execute(
+            f"UPDATE entries SET expires = ?, accessed = ? WHERE key = ? AND {ALIVE}", (self._expires(timeout), now, key, now),
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+
+        def statements(db):
+            # La lectura y la escritura en la misma transacción: ningún otro proceso cuela su incremento
+            row = db.execute(f"SELECT value FROM entries WHERE key = ? AND {ALIVE}", (key, time.time())).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            db.execute("UPDATE entries SET value = ?, size = ? WHERE key = ?", (pickled, len(key) + len(pickled), key))
+            return value
+
+        return self._write(statements)
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._db().execute("DELETE FROM entries WHERE key = ?", (key,)).rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if keys:
+            self._db().execute(f"DELETE FROM entries WHERE key IN ({', '.join('?' * len(keys))})", keys)
+
+    def clear(self):
+        def statements(db):
+            db.execute("DELETE FROM entries")
+            db.execute("DELETE FROM locks")
+
+        self._write(statements)
+
+    def _cull(self, db, now):
+        """Desaloja entradas hasta volver a CULL_TARGET del presupuesto; se llama dentro de una escritura"""
+        (total,) = db.execute("SELECT bytes FROM totals").fetchone()
+        if total <= self._max_bytes:
+            return
+        db.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+        (total,) = db.execute("SELECT bytes FROM totals").fetchone()
+        excess = total - self._max_bytes * CULL_TARGET
+        victims = []
+        # Las más antiguas por hora de acceso hasta sumar los bytes sobrantes
+        for rowid, size in db.execute("SELECT rowid, size FROM entries ORDER BY accessed"):
+            if excess <= 0:
+                break
+            victims.append((rowid,))
+            excess -= size
+        db.executemany("DELETE FROM entries WHERE rowid = ?", victims)
+        evicted = len(victims)
+        if evicted:
+            db.execute("UPDATE totals SET evictions = evictions + ?", (evicted,))
+            registry.inc("cache_evictions_total", amount=evicted)
+
+    # Una sola recomputación por clave
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        value = self.get(key, _MISSING, version=version)
+        if value is not _MISSING:
+            return value
+        if not callable(default):
+            return super().get_or_set(key, default, timeout=timeout, version=version)
+        lock_key = self.make_and_validate_key(key, version=version)
+        deadline = time.monotonic() + self._lock_timeout
+        while True:
+            if self._acquire(lock_key):
+                try:
+                    # Otro proceso pudo guardar el valor entre la primera lectura y el bloqueo
+                    value = self.get(key, _MISSING, version=version)
+                    if value is _MISSING:
+                        value = default()
+                        self.set(key, value, timeout=timeout, version=version)
+                        registry.inc("cache_single_flight_total", {"result": "computed"})
+                    return value
+                finally:
+                    self._release(lock_key)
+            time.sleep(LOCK_POLL)
+            value = self.get(key, _MISSING, version=version)
+            if value is not _MISSING:
+                registry.inc("cache_single_flight_total", {"result": "waited"})
+                return value
+            if time.monotonic() > deadline:
+                # El bloqueo ya venció en la tabla: la próxima vuelta lo toma este proceso
+                registry.inc("cache_single_flight_total", {"result": "lock_expired"})
+                deadline = time.monotonic() + self._lock_timeout
+
+    def _acquire(self, lock_key):
+        now = time.time()
+        cursor = self._db().execute(
+            "INSERT INTO locks (key, expires) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET expires = excluded.expires WHERE locks.expires <= ?",
+            (lock_key, now + self._lock_timeout, now),
+        )
+        return cursor.rowcount > 0
+
+    def _release(self, lock_key):
+        self._db().execute("DELETE FROM locks WHERE key = ?", (lock_key,))
+
+    # Estadísticas
+
+    def stats(self):
+        """Entradas y bytes de la caché compartida, y aciertos y fallos de este proceso"""
+        db = self._db()
+        (entries,) = db.execute("SELECT COUNT(*) FROM entries").fetchone()
+        total, evictions = db.execute("SELECT bytes, evictions FROM totals").fetchone()
+        with self._counts_lock:
+            counts = dict(self._counts)
+        lookups = counts["hits"] + counts["misses"]
+        return {
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self._max_bytes,
+            "evictions": evictions,
+            **counts,
+            "hit_rate": counts["hits"] / lookups if lookups else 0.0,
+        }
+
+    def close(self, **kwargs):
+        # Django llama a close() al final de cada solicitud; la conexión se conserva entre solicitudes
+        pass
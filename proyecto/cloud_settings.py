@@ -2,10 +2,8 @@
 
 # Importar os para manejar las variables de entorno
 import os
-from dotenv import load_dotenv
 
-# Carga las variables de entorno del archivo .env
-load_dotenv()
+# Las variables del archivo .env ya las cargó settings.py
 
 # Configuraciones para Amazon S3
 AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID", "")
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Procesamiento en segundo plano de las carátulas de los libros (PUBLIC_MEDIA).
+
+La vista de subida solo valida la cabecera de la imagen, mueve el archivo a
+COVER_SPOOL_DIR y encola el trabajo, así que responde en milisegundos. Un pool
+de COVER_WORKERS procesos decodifica la imagen una vez, genera las miniaturas
+de COVER_SIZES en cada formato de COVER_FORMATS (de mayor a menor, cada una a
+partir de la anterior) y las sube, junto con el original, al almacenamiento
+'default': FileSystemStorage en desarrollo y S3Boto3Storage con subidas
+multiparte (proyecto/storage_backends.py) cuando IS_DEPLOYED. Cada archivo se
+escribe primero en un SpooledTemporaryFile y se sube por partes desde ahí, sin
+copias completas en memoria.
+
+El estado de cada trabajo (pendiente, terminado o con error), las URLs
+generadas y los tiempos de cada etapa se guardan en COVER_SPOOL_DIR/<id>.json
+durante COVER_RETENTION_HOURS; los tiempos también se publican en /metrics.
+"""
+
+import logging
+import os
+import tempfile
+import time
+import uuid
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.core.files.storage import storages
+
+from proyecto import jobs
+from proyecto.metrics import DURATION_BUCKETS, registry
+
+logger = logging.getLogger(__name__)
+
+# Formatos de entrada admitidos (nombre de Pillow -> extensión del original)
+INPUT_FORMATS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp", "GIF": ".gif"}
+# Formatos de salida: extensión y opciones de Image.save
+OUTPUT_FORMATS = {
+    "webp": (".webp", {"format": "WEBP", "method": 4}),
+    "jpeg": (".jpg", {"format": "JPEG", "optimize": True, "progressive": True}),
+}
+# Bytes que se mantienen en memoria al escribir cada archivo antes de pasar a disco
+SPOOL_MAX_MEMORY = 4 * 1024 * 1024
+
+STAGES = ("spool", "queue", "decode", "resize", "encode", "upload")
+
+registry.declare("cover_stage_duration_seconds", "histogram", "Duración de cada etapa del procesamiento de carátulas", DURATION_BUCKETS)
+registry.declare("cover_jobs_total", "counter", "Carátulas procesadas por resultado")
+
+
+def job_prefix(job_id):
+    return f"{settings.PUBLIC_MEDIA}/covers/{job_id}"
+
+
+def status_path(job_id):
+    return os.path.join(settings.COVER_SPOOL_DIR, f"{job_id}.json")
+
+
+def write_status(job_id, status):
+    jobs.write_status(status_path(job_id), status)
+
+
+def read_status(job_id):
+    """Estado guardado del trabajo o None si no existe"""
+    return jobs.read_status(status_path(job_id))
+
+
+def purge_expired():
+    """Borra los estados de las carátulas terminadas hace más de COVER_RETENTION_HOURS y sus originales"""
+    def remove(status):
+        try:
+            os.remove(os.path.join(settings.COVER_SPOOL_DIR, f"{status['id']}.src"))
+        except FileNotFoundError:
+            pass
+
+    jobs.purge_statuses(settings.COVER_SPOOL_DIR, settings.COVER_RETENTION_HOURS * 3600, remove)
+
+
+def _upload(storage, name, content):
+    return storage.save(name, File(content, name=os.path.basename(name)))
+
+
+def process_cover(job_id, source_path, input_format, queued_at):
+    """
+    Genera y sube las miniaturas y el original de una carátula. Se ejecuta en
+    un proceso del pool; devuelve las URLs, los tamaños y los tiempos por etapa.
+    """
+    from PIL import Image, ImageOps
+
+    timings = dict.fromkeys(STAGES[1:], 0.0)
+    timings["queue"] = max(0.0, time.time() - queued_at)
+    storage = storages["default"]
+    prefix = job_prefix(job_id)
+    sizes = sorted(set(settings.COVER_SIZES), reverse=True)
+    outputs = {}
+
+    try:
+        started = time.perf_counter()
+        with Image.open(source_path) as source:
+            original_size = source.size
+            # En JPEG el decodificador puede reducir la escala 1/2..1/8 al leer, mucho más barato que redimensionar
+            source.draft("RGB", (sizes[0], sizes[0]))
+            image = ImageOps.exif_transpose(source)
+            image.load()
+        if image.mode not in ("RGB", "RGBA"):
+            # Paleta, escala de grises o CMYK: se redimensiona en RGB(A) para usar LANCZOS
+            has_alpha = "A" in image.getbands() or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+        timings["decode"] = time.perf_counter() - started
+
+        current = image
+        for size in sizes:
+            started = time.perf_counter()
+            current = current.copy()
+            current.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            timings["resize"] += time.perf_counter() - started
+            for output_format in settings.COVER_FORMATS:
+                extension, options = OUTPUT_FORMATS[output_format]
+                started = time.perf_counter()
+                frame = current
+                if options["format"] == "JPEG" and frame.mode == "RGBA":
+                    # JPEG no admite transparencia: se compone sobre fondo blanco
+                    frame = Image.new("RGB", current.size, (255, 255, 255))
+                    frame.paste(current, mask=current.getchannel("A"))
+                with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY) as content:
+                    frame.save(content, quality=settings.COVER_QUALITY[output_format], **options)
+                    content.seek(0)
+                    timings["encode"] += time.perf_counter() - started
+                    started = time.perf_counter()
+                    name = _upload(storage, f"{prefix}/{size}{extension}", content)
+                    timings["upload"] += time.perf_counter() - started
+                outputs[f"{size}{extension}"] = {"url": storage.url(name), "width": current.width, "height": current.height}
+
+        started = time.perf_counter()
+        with open(source_path, "rb") as content:
+            name = _upload(storage, f"{prefix}/original{INPUT_FORMATS[input_format]}", content)
+        timings["upload"] += time.perf_counter() - started
+        outputs["original"] = {"url": storage.url(name), "width": original_size[0], "height": original_size[1]}
+    finally:
+        try:
+            os.remove(source_path)
+        except FileNotFoundError:
+            pass
+    purge_expired()
+    return {"outputs": outputs, "timings": timings}
+
+
+class CoverPipeline:
+    """Cola de carátulas sobre un pool de COVER_WORKERS procesos"""
+
+    def __init__(self):
+        self.pool = jobs.ProcessPool("COVER_WORKERS", "COVER_QUEUE")
+
+    def submit(self, uploaded_file, input_format):
+        """
+        Mueve la imagen subida a COVER_SPOOL_DIR y encola su procesamiento.
+        Devuelve el id del trabajo; lanza jobs.JobBusy si la cola está llena.
+        """
+        started = time.perf_counter()
+        job_id = str(uuid.uuid4())
+        os.makedirs(settings.COVER_SPOOL_DIR, exist_ok=True)
+        source_path = os.path.join(settings.COVER_SPOOL_DIR, f"{job_id}.src")
+        if hasattr(uploaded_file, "temporary_file_path"):
+            # Las subidas grandes ya están en disco: se mueven en lugar de copiarlas
+            file_move_safe(uploaded_file.temporary_file_path(), source_path)
+        else:
+            with open(source_path, "wb") as destination:
+                for chunk in uploaded_file.chunks():
+                    destination.write(chunk)
+        spool = time.perf_counter() - started
+        write_status(job_id, jobs.new_status(job_id))
+        try:
+            future = self.pool.submit(process_cover, job_id, source_path, input_format, time.time())
+        except jobs.JobBusy:
+            registry.inc("cover_jobs_total", {"result": "rejected"})
+            os.remove(source_path)
+            os.remove(status_path(job_id))
+            raise
+        registry.observe("cover_stage_duration_seconds", spool, {"stage": "spool"})
+        future.add_done_callback(lambda future: self._done(job_id, spool, future))
+        return job_id
+
+    def _done(self, job_id, spool, future):
+        status = {"id": job_id, "finished": time.time()}
+        try:
+            result = future.result()
+        except Exception as error:
+            logger.exception("Error al procesar la carátula %s", job_id)
+            registry.inc("cover_jobs_total", {"result": "error"})
+            status.update(state="error", error=str(error))
+        else:
+            timings = {"spool": spool, **result["timings"]}
+            for stage, seconds in timings.items():
+                registry.observe("cover_stage_duration_seconds", seconds, {"stage": stage})
+            registry.inc("cover_jobs_total", {"result": "done"})
+            logger.info("Carátula %s procesada: %s", job_id, ", ".join(
+                f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in timings.items()
+            ))
+            status.update(
+                state="done",
+                outputs=result["outputs"],
+                timings_ms={stage: round(seconds * 1000, 1) for stage, seconds in timings.items()},
+            )
+        write_status(job_id, status)
+
+
+pipeline = CoverPipeline()
+
+registry.register_collector(lambda: [
+    ("cover_jobs_in_flight", "gauge", "Carátulas en cola o en proceso en el pool", {}, pipeline.pool.in_flight),
+])
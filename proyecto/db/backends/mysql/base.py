@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""Backend de MySQL con pool de conexiones por worker (evita repetir `init_command`)"""
+
+from django.db.backends.mysql import base
+
+from proyecto.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    def ping(self, connection):
+        try:
+            connection.ping()
+        except base.Database.Error:
+            return False
+        return True
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""Backend de PostgreSQL (psycopg2) con pool de conexiones por worker"""
+
+from django.db.backends.postgresql import base
+
+from proyecto.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    def ping(self, connection):
+        if connection.closed:
+            return False
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except base.Database.Error:
+            return False
+        return True
@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+"""
+Carga masiva de archivos CSV/JSONL en un modelo.
+
+Las filas se leen en flujo y se envían en lotes de `batch_size`, así que la
+memoria no depende del tamaño del archivo. Cada lote usa la vía más rápida del
+motor: COPY en PostgreSQL, LOAD DATA LOCAL INFILE (o INSERT de varias filas)
+en MySQL y bulk_create en el resto. La carga completa se ejecuta en una sola
+transacción; con `defer_indexes` los índices secundarios se reconstruyen al
+final (PostgreSQL) o se desactivan las verificaciones de claves (MySQL).
+"""
+
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import tempfile
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.color import no_style
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
+
+# Vías de carga disponibles; 'auto' elige la más rápida del motor
+METHODS = ("auto", "copy", "load-data", "insert", "bulk-create")
+
+# Extensiones reconocidas (sin .gz) y su formato
+FORMATS = {".csv": "csv", ".tsv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+
+class BulkLoadError(Exception):
+    """Archivo o configuración que impide la carga (columna desconocida, valor inválido...)"""
+
+
+class SourceFile:
+    """
+    Archivo CSV (con cabecera) o JSONL, opcionalmente comprimido con gzip,
+    que se recorre como diccionarios {columna: valor} sin cargarlo en memoria.
+    """
+
+    def __init__(self, path, fmt=None, delimiter=None, encoding="utf-8"):
+        self.path = path
+        base, extension = os.path.splitext(path)
+        self.compressed = extension == ".gz"
+        if self.compressed:
+            extension = os.path.splitext(base)[1]
+        self.format = fmt or FORMATS.get(extension.lower())
+        if self.format not in ("csv", "jsonl"):
+            raise BulkLoadError(f"No se reconoce el formato de '{path}'; indique csv o jsonl")
+        self.delimiter = delimiter or ("\t" if extension.lower() == ".tsv" else ",")
+        self.encoding = encoding
+        self.line = 0
+        self._raw = None
+
+    def __enter__(self):
+        self._raw = open(self.path, "rb")
+        self.size = os.fstat(self._raw.fileno()).st_size
+        stream = gzip.GzipFile(fileobj=self._raw) if self.compressed else self._raw
+        self._text = io.TextIOWrapper(stream, encoding=self.encoding, newline="")
+        return self
+
+    def __exit__(self, *exc_info):
+        self._text.close()
+        self._raw.close()
+
+    def fraction(self):
+        """Parte del archivo leída (según los bytes comprimidos si es .gz)"""
+        if not self.size:
+            return None
+        return min(1.0, self._raw.tell() / self.size)
+
+    def __iter__(self):
+        if self.format == "csv":
+            reader = csv.reader(self._text, delimiter=self.delimiter)
+            header = next(reader, None)
+            if header is None:
+                return
+            self.line = 1
+            for row in reader:
+                self.line = reader.line_num
+                if not row:
+                    continue
+                if len(row) != len(header):
+                    raise BulkLoadError(f"Línea {self.line}: se esperaban {len(header)} columnas y hay {len(row)}")
+                yield dict(zip(header, row))
+        else:
+            for self.line, text in enumerate(self._text, 1):
+                if not text.strip():
+                    continue
+                try:
+                    record = json.loads(text)
+                except ValueError as exc:
+                    raise BulkLoadError(f"Línea {self.line}: JSON inválido ({exc})") from None
+                if not isinstance(record, dict):
+                    raise BulkLoadError(f"Línea {self.line}: se esperaba un objeto JSON")
+                yield record
+
+
+class RowConverter:
+    """
+    Convierte cada registro en los valores de las columnas del modelo. Las
+    columnas del archivo se buscan por nombre de campo, attname (autor_id) o
+    columna; los campos ausentes toman su valor por defecto.
+    """
+
+    def __init__(self, model, columns, text_values, ignore_unknown=False):
+        self.model = model
+        self.text_values = text_values
+        lookup = {}
+        for field in model._meta.concrete_fields:
+            for key in (field.name, field.attname, field.column):
+                lookup.setdefault(key, field)
+        unknown = [column for column in columns if column not in lookup]
+        if unknown and not ignore_unknown:
+            raise BulkLoadError("Columnas que no existen en %s: %s" % (model._meta.label, ", ".join(unknown)))
+        provided = {lookup[column]: column for column in columns if column in lookup}
+        self.plan = []
+        for field in model._meta.concrete_fields:
+            if field in provided:
+                self.plan.append((field, provided[field]))
+            elif field.primary_key and field.get_internal_type() in ("AutoField", "BigAutoField", "SmallAutoField"):
+                continue
+            elif not (field.has_default() or field.null or field.empty_strings_allowed
+                      or getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)):
+                # Igual que al instanciar el modelo, los campos de texto sin valor quedan en ''
+                raise BulkLoadError(f"Falta la columna obligatoria '{field.name}' de {model._meta.label}")
+            else:
+                self.plan.append((field, None))
+        self.fields = [field for field, _column in self.plan]
+        self.explicit_pk = any(field.primary_key and column is not None for field, column in self.plan)
+
+    def _missing(self, field):
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False):
+            return timezone.now() if field.get_internal_type() == "DateTimeField" else datetime.date.today()
+        return field.get_default()
+
+    def convert(self, record, line):
+        """Valores de Python de la fila, en el orden de self.fields"""
+        values = []
+        for field, column in self.plan:
+            if column is None or column not in record:
+                values.append(self._missing(field))
+                continue
+            raw = record[column]
+            if self.text_values and raw == "" and (field.null or not field.empty_strings_allowed):
+                # En CSV la celda vacía es NULL salvo en los campos de texto obligatorios
+                raw = None if field.null else self._missing(field)
+            try:
+                if self.text_values and raw is not None and field.get_internal_type() == "JSONField":
+                    raw = json.loads(raw)
+                values.append(field.to_python(raw) if raw is not None else None)
+            except (ValidationError, ValueError) as exc:
+                message = "; ".join(exc.messages) if isinstance(exc, ValidationError) else str(exc)
+                raise BulkLoadError(f"Línea {line}, columna '{column}': {message}") from None
+        return values
+
+
+# Escritura de lotes
+
+def _copy_text(value):
+    """Texto de un valor preparado para COPY ... (FORMAT csv); None es NULL"""
+    value = getattr(value, "adapted", value)  # Json y Binary de psycopg2
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        text = "t" if value else "f"
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        text = "\\x" + bytes(value).hex()
+    elif isinstance(value, (dict, list)):
+        text = json.dumps(value)
+    elif isinstance(value, (datetime.date, datetime.time)):
+        text = value.isoformat()
+    else:
+        text = str(value)
+    return '"%s"' % text.replace('"', '""')
+
+
+_MYSQL_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r", "\0": "\\0"})
+
+
+def _load_data_text(value):
+    """Texto de un valor preparado para LOAD DATA con los delimitadores por defecto de MySQL"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return str(value).translate(_MYSQL_ESCAPES)
+
+
+class BatchWriter:
+    """Envía lotes de filas ya convertidas por la vía elegida"""
+
+    def __init__(self, model, fields, connection, method):
+        self.model = model
+        self.fields = fields
+        self.connection = connection
+        self.method = method
+        quote = connection.ops.quote_name
+        self.table = quote(model._meta.db_table)
+        self.columns = ", ".join(quote(field.column) for field in fields)
+        self.skipped = 0
+
+    def prepare(self, values):
+        return [field.get_db_prep_save(value, self.connection) for field, value in zip(self.fields, values)]
+
+    def write(self, cursor, rows):
+        getattr(self, "write_" + self.method.replace("-", "_"))(cursor, rows)
+
+    def write_copy(self, cursor, rows):
+        buffer = io.StringIO()
+        for values in rows:
+            buffer.write(",".join(_copy_text(value) for value in self.prepare(values)))
+            buffer.write("\n")
+        buffer.seek(0)
+        cursor.cursor.copy_expert(f"COPY {self.table} ({self.columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+    def write_load_data(self, cursor, rows):
+        handle, path = tempfile.mkstemp(suffix=".tsv")
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8", newline="\n") as output:
+                for values in rows:
+                    output.write("\t".join(_load_data_text(value) for value in self.prepare(values)))
+                    output.write("\n")
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE {self.table} CHARACTER SET utf8mb4 ({self.columns})",
+                [path],
+            )
+            # Con LOCAL el servidor convierte los errores de datos y los duplicados en avisos
+            self.skipped += len(rows) - max(cursor.rowcount, 0)
+        finally:
+            os.remove(path)
+
+    def write_insert(self, cursor, rows):
+        placeholders = "(%s)" % ", ".join(["%s"] * len(self.fields))
+        params = []
+        for values in rows:
+            params.extend(self.prepare(values))
+        cursor.execute(
+            f"INSERT INTO {self.table} ({self.columns}) VALUES " + ", ".join([placeholders] * len(rows)),
+            params,
+        )
+
+    def write_bulk_create(self, cursor, rows):
+        objects = [self.model(**{field.attname: value for field, value in zip(self.fields, values)}) for values in rows]
+        self.model._default_manager.using(self.connection.alias).bulk_create(objects, batch_size=len(objects))
+
+
+# Índices y restricciones
+
+def _defer_postgresql(cursor, connection, table):
+    """Elimina los índices secundarios no únicos y devuelve sus definiciones para recrearlos"""
+    cursor.execute(
+        """
+        SELECT i.relname, pg_get_indexdef(i.oid)
+        FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid = %s::regclass AND NOT x.indisprimary AND NOT x.indisunique
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)
+        """,
+        [connection.ops.quote_name(table)],
+    )
+    indexes = cursor.fetchall()
+    # Las claves foráneas de Django son DEFERRABLE: se verifican una sola vez al confirmar
+    cursor.execute("SET CONSTRAINTS ALL DEFERRED")
+    for name, _definition in indexes:
+        cursor.execute("DROP INDEX %s" % connection.ops.quote_name(name))
+    return [definition for _name, definition in indexes]
+
+
+class LoadResult:
+    def __init__(self, method):
+        self.method = method
+        self.rows = 0
+        self.skipped = 0
+        self.elapsed = 0.0
+        self.fallback = None
+        self.rebuilt_indexes = 0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def resolve_method(method, connection, converter):
+    """Vía de carga concreta para el motor de la conexión"""
+    vendor = connection.vendor
+    has_binary = any(field.get_internal_type() == "BinaryField" for field in converter.fields)
+    if method == "auto":
+        if vendor == "postgresql":
+            return "copy"
+        if vendor == "mysql":
+            local_infile = connection.settings_dict.get("OPTIONS", {}).get("local_infile")
+            return "load-data" if local_infile and not has_binary else "insert"
+        return "bulk-create"
+    if method == "copy" and vendor != "postgresql":
+        raise BulkLoadError("COPY solo está disponible en PostgreSQL")
+    if method == "load-data" and (vendor != "mysql" or has_binary):
+        raise BulkLoadError("LOAD DATA solo está disponible en MySQL y para modelos sin campos binarios")
+    return method
+
+
+def load(model, source, batch_size=5000, method="auto", database="default", defer_indexes=False,
+         ignore_unknown=False, progress=None):
+    """
+    Carga `source` (SourceFile abierto) en `model` y devuelve un LoadResult.
+    `progress(result, fracción)` se llama tras cada lote.
+    """
+    if method not in METHODS:
+        raise BulkLoadError(f"Vía de carga desconocida '{method}'")
+    connection = connections[database]
+    records = iter(source)
+    first = next(records, None)
+    if first is None:
+        return LoadResult(method)
+    converter = RowConverter(model, list(first), source.format == "csv", ignore_unknown)
+    chosen = resolve_method(method, connection, converter)
+    writer = BatchWriter(model, converter.fields, connection, chosen)
+    result = LoadResult(chosen)
+    if chosen == "insert" and connection.features.max_query_params:
+        batch_size = min(batch_size, connection.features.max_query_params // len(converter.fields))
+    started = time.perf_counter()
+
+    def flush(cursor, rows):
+        if method == "auto" and writer.method == "load-data" and not result.rows:
+            try:
+                with transaction.atomic(using=database):
+                    writer.write(cursor, rows)
+            except DatabaseError as exc:
+                # local_infile desactivado en el servidor: se sigue con INSERT de varias filas
+                result.fallback = str(exc)
+                writer.method = result.method = "insert"
+                writer.write(cursor, rows)
+        else:
+            writer.write(cursor, rows)
+        result.rows += len(rows)
+        result.skipped = writer.skipped
+        result.elapsed = time.perf_counter() - started
+        if progress is not None:
+            progress(result, source.fraction())
+
+    with transaction.atomic(using=database, savepoint=False), connection.cursor() as cursor:
+        deferred = []
+        if defer_indexes and connection.vendor == "postgresql":
+            deferred = _defer_postgresql(cursor, connection, model._meta.db_table)
+        elif defer_indexes and connection.vendor == "mysql":
+            # InnoDB omite la verificación de claves foráneas y de unicidad en índices secundarios
+            cursor.execute("SET foreign_key_checks = 0, unique_checks = 0")
+        try:
+            rows = [converter.convert(first, source.line)]
+            for record in records:
+                rows.append(converter.convert(record, source.line))
+                if len(rows) >= batch_size:
+                    flush(cursor, rows)
+                    rows = []
+            if rows:
+                flush(cursor, rows)
+            for definition in deferred:
+                cursor.execute(definition)
+            result.rebuilt_indexes = len(deferred)
+            if converter.explicit_pk:
+                # Las claves primarias vienen del archivo: la secuencia debe continuar tras la mayor
+                for sql in connection.ops.sequence_reset_sql(no_style(), [model]):
+                    cursor.execute(sql)
+            if deferred:
+                cursor.execute("ANALYZE %s" % connection.ops.quote_name(model._meta.db_table))
+        finally:
+            if defer_indexes and connection.vendor == "mysql":
+                cursor.execute("SET foreign_key_checks = 1, unique_checks = 1")
+    result.elapsed = time.perf_counter() - started
+    return result
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Paginación de tablas grandes sin COUNT(*) exacto ni OFFSET.
+
+`estimated_count` lee el número aproximado de filas de las estadísticas del
+catálogo (pg_class.reltuples en PostgreSQL, information_schema.TABLES en
+MySQL), una consulta de milisegundos sea cual sea el tamaño de la tabla.
+EstimatedCountPaginator la usa para los querysets sin filtros; con filtros
+cuenta como mucho `count_limit` filas, de modo que ninguna página recorre la
+tabla entera solo para mostrar el total.
+
+`keyset_terms`, `seek` y las funciones de cursores implementan la paginación
+por clave (seek): la página siguiente se pide con los valores de la última
+fila mostrada (WHERE (campo, pk) > (valor, id) ORDER BY campo, pk LIMIT n), que
+el índice resuelve igual en la primera página que en la millonésima, en lugar
+de leer y descartar las filas anteriores con OFFSET.
+
+`values_by_pk` recorre un queryset completo de la misma forma, por bloques de
+clave primaria. A diferencia de iterator(), que solo en PostgreSQL usa un
+cursor del lado del servidor (mysqlclient y sqlite reciben el resultado entero
+en el cliente), la memoria depende del tamaño del bloque en todos los motores.
+"""
+
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.encoding import force_str
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+class InvalidCursor(ValueError):
+    """El cursor no se puede decodificar o no corresponde al orden actual"""
+
+
+def estimated_count(model, using="default"):
+    """
+    Filas estimadas de la tabla del modelo según las estadísticas del motor,
+    o None si el motor no las ofrece o la tabla aún no se ha analizado. En
+    MySQL 8 information_schema guarda en caché las estadísticas durante
+    information_schema_stats_expiry segundos (un día por defecto).
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == "postgresql":
+        sql, params = "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)", [connection.ops.quote_name(table)]
+    elif connection.vendor == "mysql":
+        sql, params = "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", [table]
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    # reltuples es -1 en las tablas que nunca se han analizado (PostgreSQL 14+)
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def is_unfiltered(queryset):
+    """True si el queryset recorre la tabla completa (sin WHERE, DISTINCT ni cortes)"""
+    query = queryset.query
+    return not query.where and not query.distinct and not query.is_sliced and not query.combinator
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator cuyo total es la estimación del catálogo cuando el queryset no
+    tiene filtros y la tabla supera `estimate_min` filas. Con filtros, o sin
+    estimación, cuenta hasta `count_limit` filas (0 = sin límite). `estimated`
+    y `limited` indican si el total no es exacto.
+    """
+
+    def __init__(self, object_list, per_page, *args, estimate_min=100000, count_limit=10000, **kwargs):
+        super().__init__(object_list, per_page, *args, **kwargs)
+        self.estimate_min = estimate_min
+        self.count_limit = count_limit
+        self.estimated = False
+        self.limited = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if is_unfiltered(queryset):
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.estimate_min:
+                self.estimated = True
+                return estimate
+            return queryset.count()
+        if not self.count_limit:
+            return queryset.count()
+        # SELECT COUNT(*) FROM (SELECT ... LIMIT n): deja de leer al llegar al límite
+        count = queryset[:self.count_limit].count()
+        self.limited = count >= self.count_limit
+        return count
+
+
+def _is_indexed(field, opts):
+    if field.primary_key or field.unique or field.db_index or field.is_relation:
+        return True
+    return any(index.fields and index.fields[0].lstrip("-") == field.name for index in opts.indexes)
+
+
+def keyset_terms(queryset):
+    """
+    [(campo, descendente)] del orden del queryset si admite paginación por
+    clave, o None. El orden debe empezar por una columna indexada y sin nulos y
+    terminar en una columna única (la clave primaria, por ejemplo), como el que
+    arma el admin: ['username'] o ['-last_login', '-pk'] si last_login tuviera índice.
+    """
+    opts = queryset.model._meta
+    terms = []
+    for part in queryset.query.order_by:
+        if not isinstance(part, str) or part.lstrip("-") in ("?", "") or "__" in part:
+            return None
+        name = part.lstrip("-")
+        try:
+            field = opts.pk if name == "pk" else opts.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if not field.concrete or field.null:
+            return None
+        if any(field == seen for seen, _descending in terms):
+            # El admin repite el orden del modelo tras el suyo: ['username', 'username']
+            continue
+        terms.append((field, part.startswith("-")))
+        if field.primary_key or field.unique:
+            # Lo que sigue a una columna única no cambia el orden
+            break
+    else:
+        return None
+    if len(terms) > 2 or not _is_indexed(terms[0][0], opts):
+        return None
+    return terms
+
+
+def row_key(terms, obj):
+    """Valores de los campos del orden en la instancia `obj`"""
+    return [getattr(obj, field.attname) for field, _descending in terms]
+
+
+def seek(terms, key, backwards=False):
+    """
+    Q con las filas posteriores a `key` en el orden de `terms` (anteriores con
+    `backwards`): (a > x) OR (a = x AND b > y), con < en los términos descendentes.
+    """
+    condition = Q()
+    equal = {}
+    for (field, descending), value in zip(terms, key):
+        lookup = "lt" if descending != backwards else "gt"
+        condition |= Q(**equal, **{f"{field.attname}__{lookup}": value})
+        equal[field.attname] = value
+    return condition
+
+
+def values_by_pk(queryset, fields, chunk_size):
+    """
+    Tuplas con los valores de `fields` en orden de clave primaria, leídas con
+    WHERE pk > último ORDER BY pk LIMIT chunk_size
+    """
+    queryset = queryset.order_by("pk")
+    last = None
+    while True:
+        page = queryset if last is None else queryset.filter(pk__gt=last)
+        chunk = list(page.values_list("pk", *fields)[:chunk_size])
+        for row in chunk:
+            yield row[1:]
+        if len(chunk) < chunk_size:
+            return
+        last = chunk[-1][0]
+
+
+def reverse_ordering(terms):
+    return [field.attname if descending else f"-{field.attname}" for field, descending in terms]
+
+
+def _json_value(value):
+    # isoformat() conserva los microsegundos, que DjangoJSONEncoder recorta a milisegundos
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, (int, float, str, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def encode_cursor(direction, key):
+    """Cursor para la URL: dirección ('a' después, 'b' antes) y valores de la fila límite"""
+    return direction + urlsafe_base64_encode(json.dumps([_json_value(value) for value in key]).encode())
+
+
+def decode_cursor(terms, cursor):
+    """(dirección, valores convertidos a los tipos de los campos) de un cursor de encode_cursor"""
+    direction, payload = cursor[:1], cursor[1:]
+    try:
+        values = json.loads(force_str(urlsafe_base64_decode(payload)))
+    except ValueError as error:
+        raise InvalidCursor(cursor) from error
+    if direction not in ("a", "b") or not isinstance(values, list) or len(values) != len(terms):
+        raise InvalidCursor(cursor)
+    try:
+        return direction, [field.to_python(value) for (field, _descending), value in zip(terms, values)]
+    except (TypeError, ValidationError) as error:
+        raise InvalidCursor(cursor) from error
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Pool de conexiones por worker para los backends de proyecto.db.backends.
+
+Django abre una conexión por hilo y la cierra al final de la solicitud (o al
+cumplirse CONN_MAX_AGE). Con el pool, cerrar una conexión la devuelve a una
+cola de conexiones abiertas del proceso, de modo que la siguiente solicitud
+(de cualquier hilo) se ahorra el handshake TCP, la autenticación y, en MySQL,
+el `init_command`. Lo que Django hace en connect() después de obtener la
+conexión sí se repite en cada entrega: set_autocommit() e
+init_connection_state(), que en MySQL ejecuta `SET SQL_AUTO_IS_NULL = 0` (y el
+nivel de aislamiento, si se configuró) y en PostgreSQL solo cambia la zona
+horaria o el rol si no coinciden. El tamaño, la edad máxima y las
+verificaciones de salud se configuran con la clave "POOL" de cada entrada de
+DATABASES.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from django.db import DatabaseError
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(DatabaseError):
+    """No se obtuvo una conexión libre dentro del tiempo de espera configurado"""
+
+
+class ConnectionPool:
+    """Pool LIFO de conexiones DB-API acotado a `max_size` conexiones abiertas"""
+
+    def __init__(self, max_size=10, max_age=300, timeout=10.0, health_checks=True, idle_check_after=30.0):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.timeout = timeout
+        self.health_checks = health_checks
+        self.idle_check_after = idle_check_after
+        self._idle = deque()  # (conexión, creada_en, devuelta_en)
+        self._created_at = {}
+        self._size = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "connections_created": 0,
+            "connections_closed": 0,
+            "health_check_failures": 0,
+            "timeouts": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    def _expired(self, created_at, now):
+        return self.max_age is not None and now - created_at >= self.max_age
+
+    def _discard(self, connection):
+        """Cierra una conexión fuera del bloqueo del pool sin propagar errores"""
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._created_at.pop(id(connection), None)
+            self._size -= 1
+            self._stats["connections_closed"] += 1
+            self._cond.notify()
+
+    def checkout(self, connect, is_usable=None):
+        """
+        Entrega una conexión del pool o abre una nueva con `connect()` si hay
+        espacio. Si el pool está lleno espera hasta `timeout` segundos.
+        """
+        started = time.monotonic()
+        while True:
+            candidate = None
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    if self._idle:
+                        candidate = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = self.timeout - (now - started)
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            "No hay conexiones libres en el pool tras %.1f s (tamaño %d)" % (self.timeout, self.max_size)
+                        )
+                    self._cond.wait(remaining)
+
+            if candidate is None:
+                try:
+                    connection = connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._created_at[id(connection)] = time.monotonic()
+                    self._stats["connections_created"] += 1
+                break
+
+            connection, created_at, returned_at = candidate
+            now = time.monotonic()
+            if self._expired(created_at, now):
+                self._discard(connection)
+                continue
+            if (
+                self.health_checks
+                and is_usable is not None
+                and now - returned_at >= self.idle_check_after
+                and not is_usable(connection)
+            ):
+                with self._cond:
+                    self._stats["health_check_failures"] += 1
+                self._discard(connection)
+                continue
+            break
+
+        waited = time.monotonic() - started
+        with self._cond:
+            self._stats["checkouts"] += 1
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+        return connection
+
+    def checkin(self, connection, discard=False):
+        """Devuelve una conexión al pool, o la cierra si está vencida o marcada para descartar"""
+        now = time.monotonic()
+        with self._cond:
+            created_at = self._created_at.get(id(connection))
+            if created_at is None:
+                # La conexión no pertenece a este pool (por ejemplo, tras un cambio de configuración)
+                discard = True
+            elif not discard and not self._expired(created_at, now):
+                self._idle.append((connection, created_at, now))
+                self._cond.notify()
+                return
+        if created_at is None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+            return
+        self._discard(connection)
+
+    def close_all(self):
+        """Cierra las conexiones inactivas del pool"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+        for connection, _created_at, _returned_at in idle:
+            self._discard(connection)
+
+    def stats(self):
+        with self._cond:
+            return dict(
+                self._stats,
+                size=self._size,
+                idle=len(self._idle),
+                in_use=self._size - len(self._idle),
+                max_size=self.max_size,
+            )
+
+
+# Pools del proceso actual. La clave incluye el pid para que un worker creado con
+# fork no reutilice los sockets del proceso maestro; los pools heredados se
+# conservan referenciados para que el recolector no cierre conexiones ajenas.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict):
+    key = (
+        os.getpid(),
+        alias,
+        settings_dict.get("NAME"),
+        settings_dict.get("HOST"),
+        settings_dict.get("PORT"),
+        settings_dict.get("USER"),
+    )
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                options = settings_dict.get("POOL") or {}
+                pool = _pools[key] = ConnectionPool(
+                    max_size=options.get("MAX_SIZE", 10),
+                    max_age=options.get("MAX_AGE", 300),
+                    timeout=options.get("TIMEOUT", 10.0),
+                    health_checks=options.get("HEALTH_CHECKS", True),
+                    idle_check_after=options.get("IDLE_CHECK_AFTER", 30.0),
+                )
+                logger.debug("Pool creado para '%s' en el pid %d", alias, os.getpid())
+    return pool
+
+
+def pool_stats():
+    """Estadísticas de los pools del proceso actual indexadas por alias"""
+    pid = os.getpid()
+    return {key[1]: pool.stats() for key, pool in list(_pools.items()) if key[0] == pid}
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Mezcla para DatabaseWrapper que toma las conexiones del pool del proceso y
+    las devuelve al cerrarlas. Las subclases implementan `ping(connection)`.
+    """
+
+    def ping(self, connection):
+        raise NotImplementedError
+
+    def get_new_connection(self, conn_params):
+        return get_pool(self.alias, self.settings_dict).checkout(
+            connect=lambda: super(PooledDatabaseWrapperMixin, self).get_new_connection(conn_params),
+            is_usable=self.ping,
+        )
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                # Una transacción abierta o un error previo invalidan el estado de la conexión
+                discard = (
+                    self.in_atomic_block
+                    or self.errors_occurred
+                    or self.autocommit != self.settings_dict["AUTOCOMMIT"]
+                )
+                get_pool(self.alias, self.settings_dict).checkin(self.connection, discard=discard)
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Vaciado y purga de modelos sin bloquear la base de datos en producción.
+
+`truncate_models` vacía tablas completas con la misma SQL que `manage.py
+flush` (TRUNCATE ... RESTART IDENTITY en PostgreSQL, TRUNCATE con las claves
+foráneas desactivadas en MySQL). `chunked_delete` borra las filas de un
+queryset por rangos de clave primaria, cada rango en su propia transacción:
+el tamaño del rango se ajusta para que cada borrado dure cerca de
+`chunk_time` segundos, se pausa entre rangos y se espera a que las réplicas
+se pongan al día antes de seguir.
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import connections, models, transaction
+from django.db.models import Max, Min
+
+logger = logging.getLogger(__name__)
+
+# Límites del ancho de cada rango de claves primarias
+MIN_CHUNK = 10
+MAX_CHUNK = 1_000_000
+
+
+class PurgeError(Exception):
+    """La purga no se puede hacer como se pidió (tablas referenciadas, clave primaria no ordenable...)"""
+
+
+def _tables_of(model):
+    """Tabla del modelo y de sus tablas intermedias many-to-many creadas automáticamente"""
+    tables = [model._meta.db_table]
+    for field in model._meta.local_many_to_many:
+        if field.remote_field.through._meta.auto_created:
+            tables.append(field.remote_field.through._meta.db_table)
+    return tables
+
+
+def referencing_models(selected):
+    """Modelos no seleccionados con claves foráneas hacia los seleccionados (sin las tablas intermedias automáticas)"""
+    selected = set(selected)
+    found = []
+    for model in selected:
+        for relation in model._meta.related_objects:
+            related = relation.related_model
+            if related in selected or related in found or related._meta.auto_created:
+                continue
+            found.append(related)
+    return found
+
+
+def truncate_models(selected, database="default", cascade=False, reset_sequences=True):
+    """
+    Vacía por completo los modelos (y sus tablas many-to-many). Con `cascade`
+    también los modelos que los referencian; sin él, falla si existen.
+    Devuelve la lista de tablas vaciadas.
+    """
+    selected = list(selected)
+    referencing = referencing_models(selected)
+    while cascade and referencing:
+        selected.extend(referencing)
+        referencing = referencing_models(selected)
+    if referencing:
+        raise PurgeError(
+            "Otros modelos referencian a los seleccionados: %s (use --cascade para vaciarlos también)"
+            % ", ".join(model._meta.label for model in referencing)
+        )
+    connection = connections[database]
+    tables = []
+    for model in selected:
+        tables.extend(table for table in _tables_of(model) if table not in tables)
+    sql_list = connection.ops.sql_flush(no_style(), tables, reset_sequences=reset_sequences)
+    connection.ops.execute_sql_flush(sql_list)
+    return tables
+
+
+def replica_lag(alias):
+    """Retraso de replicación en segundos de una réplica (None si no se puede medir)"""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+                )
+                return float(cursor.fetchone()[0])
+            if connection.vendor == "mysql":
+                cursor.execute("SHOW REPLICA STATUS")
+                row = cursor.fetchone()
+                if row is None:
+                    return None
+                columns = [column[0] for column in cursor.description]
+                value = row[columns.index("Seconds_Behind_Source")]
+                return float(value) if value is not None else None
+    except Exception as exc:
+        logger.warning("No se pudo medir el retraso de la réplica '%s': %s", alias, exc)
+    return None
+
+
+def wait_for_replicas(max_lag, poll=1.0, timeout=300.0):
+    """Espera hasta que todas las réplicas tengan un retraso menor que `max_lag`; devuelve los segundos esperados"""
+    if not max_lag or not settings.DATABASE_REPLICAS:
+        return 0.0
+    started = time.monotonic()
+    while time.monotonic() - started < timeout:
+        lags = [replica_lag(alias) for alias in settings.DATABASE_REPLICAS]
+        if all(lag is None or lag < max_lag for lag in lags):
+            break
+        time.sleep(poll)
+    else:
+        logger.warning("Las réplicas siguen con más de %.0f s de retraso; se continúa la purga", max_lag)
+    return time.monotonic() - started
+
+
+class PurgeStats:
+    def __init__(self):
+        self.deleted = 0
+        self.chunks = 0
+        self.elapsed = 0.0
+        self.waited = 0.0
+        self.chunk_size = 0
+        self.position = None
+
+    @property
+    def rows_per_second(self):
+        return self.deleted / self.elapsed if self.elapsed else 0.0
+
+
+def _integer_pk(model):
+    pk = model._meta.pk
+    target = pk.target_field if pk.is_relation else pk
+    return isinstance(target, models.IntegerField)
+
+
+def chunked_delete(queryset, chunk_size=1000, chunk_time=0.5, sleep=0.05, max_lag=0.0, progress=None):
+    """
+    Borra las filas de `queryset` en rangos de clave primaria. Cada rango se
+    borra con QuerySet.delete() (cascadas y señales incluidas) en su propia
+    transacción. Devuelve un PurgeStats; `progress(stats)` se llama tras cada rango.
+    """
+    database = queryset.db
+    model = queryset.model
+    stats = PurgeStats()
+    stats.chunk_size = chunk_size
+    started = time.perf_counter()
+
+    def delete(chunk):
+        chunk_started = time.perf_counter()
+        with transaction.atomic(using=database):
+            deleted, _per_model = chunk.delete()
+        duration = time.perf_counter() - chunk_started
+        stats.deleted += deleted
+        stats.chunks += 1
+        # Se ajusta el ancho del rango para que cada borrado dure cerca de chunk_time
+        if duration > chunk_time:
+            stats.chunk_size = max(MIN_CHUNK, stats.chunk_size // 2)
+        elif duration < chunk_time / 2:
+            stats.chunk_size = min(MAX_CHUNK, stats.chunk_size * 2)
+        if sleep:
+            time.sleep(sleep)
+        stats.waited += wait_for_replicas(max_lag)
+        stats.elapsed = time.perf_counter() - started
+        if progress is not None:
+            progress(stats)
+
+    if _integer_pk(model):
+        # Los límites salen del índice de la clave primaria, sin recorrer la tabla
+        bounds = model._base_manager.using(database).aggregate(low=Min("pk"), high=Max("pk"))
+        if bounds["low"] is None:
+            return stats
+        low = bounds["low"]
+        while low <= bounds["high"]:
+            high = low + stats.chunk_size
+            stats.position = low
+            delete(queryset.filter(pk__gte=low, pk__lt=high))
+            low = high
+    else:
+        # Claves no numéricas: cada lote son las siguientes `chunk_size` claves en orden
+        last = None
+        while True:
+            page = queryset.order_by("pk")
+            if last is not None:
+                page = page.filter(pk__gt=last)
+            keys = list(page.values_list("pk", flat=True)[:stats.chunk_size])
+            if not keys:
+                break
+            last = stats.position = keys[-1]
+            delete(queryset.filter(pk__in=keys))
+    stats.elapsed = time.perf_counter() - started
+    return stats
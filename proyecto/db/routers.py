@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Enrutamiento de lecturas a réplicas y escrituras a la base de datos principal.
+
+Las réplicas se declaran en local_settings (POSTGRESQL_REPLICA_URLS o
+MYSQL_REPLICA_URLS) y llegan a DATABASES como 'replica_1', 'replica_2', etc.
+Tras la primera escritura de una solicitud las lecturas quedan fijadas a la
+principal para que el usuario vea sus propios cambios aunque la réplica tenga
+retraso. ReplicaPinningMiddleware reinicia esa fijación en cada solicitud.
+
+La salud de cada réplica se comprueba conectando desde db_for_read, dentro de
+la solicitud; las réplicas tienen un connect_timeout corto
+(DB_REPLICA_CONNECT_TIMEOUT) para que una réplica caída no la retenga.
+"""
+
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+# Verdadero cuando la solicitud actual ya escribió en la base de datos principal
+_pinned_to_primary = ContextVar("pinned_to_primary", default=False)
+
+
+def pin_to_primary():
+    _pinned_to_primary.set(True)
+
+
+def is_pinned_to_primary():
+    return _pinned_to_primary.get()
+
+
+def reset_pinning():
+    """Devuelve un token para restaurar el estado previo con `_pinned_to_primary.reset`"""
+    return _pinned_to_primary.set(False)
+
+
+def restore_pinning(token):
+    _pinned_to_primary.reset(token)
+
+
+class ReplicaHealth:
+    """
+    Estado de salud de las réplicas con verificación perezosa: una réplica se
+    vuelve a comprobar como máximo cada `check_interval` segundos, y mientras
+    esté marcada como caída no recibe lecturas.
+    """
+
+    def __init__(self, check_interval=30.0):
+        self.check_interval = check_interval
+        self._status = {}  # alias -> (sana, comprobada_en)
+        self._lock = threading.Lock()
+
+    def check(self, alias):
+        connection = connections[alias]
+        try:
+            connection.ensure_connection()
+            return connection.is_usable()
+        except Exception as exc:
+            logger.warning("Réplica '%s' fuera de rotación: %s", alias, exc)
+            try:
+                connection.close()
+            except Exception:
+                pass
+            return False
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        status = self._status.get(alias)
+        if status is not None and now - status[1] < self.check_interval:
+            return status[0]
+        healthy = self.check(alias)
+        with self._lock:
+            previous = self._status.get(alias)
+            self._status[alias] = (healthy, now)
+        if healthy and previous is not None and not previous[0]:
+            logger.info("Réplica '%s' de nuevo en rotación", alias)
+        return healthy
+
+    def snapshot(self):
+        with self._lock:
+            return {alias: healthy for alias, (healthy, _checked_at) in self._status.items()}
+
+
+replica_health = ReplicaHealth(settings.DATABASE_REPLICA_CHECK_INTERVAL)
+
+
+class PrimaryReplicaRouter:
+    """Router de lecturas a réplicas sanas y escrituras a la base de datos principal"""
+
+    def _replicas(self):
+        return settings.DATABASE_REPLICAS
+
+    def db_for_read(self, model, **hints):
+        replicas = self._replicas()
+        if not replicas or is_pinned_to_primary():
+            return DEFAULT_DB_ALIAS
+        # Las lecturas dentro de una transacción explícita deben ver sus propias escrituras
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        healthy = [alias for alias in replicas if replica_health.is_healthy(alias)]
+        if not healthy:
+            return DEFAULT_DB_ALIAS
+        return random.choice(healthy)
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *self._replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas reciben el esquema por replicación desde la principal
+        if db in self._replicas():
+            return False
+        return None
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Configuración de gunicorn (gunicorn -c python:proyecto.gunicorn_conf).
+
+No importa Django: gunicorn la carga en el proceso maestro antes que la
+aplicación. La aplicación (proyecto.wsgi o proyecto.asgi) sale de SERVER_MODE,
+y el número de workers, del número de CPUs disponibles: la afinidad del
+proceso y la cuota de cgroups del contenedor, no los núcleos del host.
+
+| Clase (GUNICORN_WORKER_CLASS) | Workers por defecto |
+|-------------------------------|---------------------|
+| gthread (GUNICORN_THREADS)    | CPUs + 1            |
+| sync                          | 2 × CPUs + 1        |
+| uvicorn (SERVER_MODE=asgi)    | CPUs + 1            |
+
+gthread es la clase por defecto: mientras el pool de proyecto/passwords.py
+calcula un hash, los demás hilos del worker siguen atendiendo solicitudes.
+
+Con GUNICORN_PRELOAD el maestro carga Django, las plantillas precompiladas
+(proyecto/warmup.py) y los módulos que importan las vistas antes de crear los
+workers, que los comparten con copy-on-write. Antes de cada fork se llama a
+gc.freeze() para que el recolector de los workers no recorra (y copie) los
+objetos heredados del maestro. Los recursos con sockets o hilos (pools de
+conexiones, cachés, hilos de fondo) ya se recrean en cada pid.
+
+max_requests con jitter recicla los workers escalonadamente y cada worker
+registra su memoria (RSS, privada y PSS de /proc) al iniciar, cada
+GUNICORN_MEMORY_LOG_EVERY solicitudes y al salir. La memoria privada es lo
+que cuesta cada worker adicional.
+"""
+
+import gc
+import math
+import os
+import sys
+
+from proyecto.procinfo import format_memory as _format_memory, memory_usage
+
+# Clases de worker admitidas y su nombre para gunicorn
+WORKER_CLASSES = {
+    "sync": "sync",
+    "gthread": "gthread",
+    "uvicorn": "uvicorn_worker.UvicornWorker",
+}
+
+
+def _cgroup_cpu_quota(root="/sys/fs/cgroup"):
+    """CPUs de la cuota de cgroups (v2 o v1), o None si no hay cuota"""
+    try:
+        # cgroups v2: "max 100000" o "<cuota> <periodo>"
+        with open(os.path.join(root, "cpu.max")) as handle:
+            quota, period = handle.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(os.path.join(root, "cpu", "cpu.cfs_quota_us")) as handle:
+            quota = int(handle.read())
+        with open(os.path.join(root, "cpu", "cpu.cfs_period_us")) as handle:
+            period = int(handle.read())
+        return quota / period if quota > 0 and period > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def cpu_count(cgroup_root="/sys/fs/cgroup"):
+    """CPUs que puede usar el proceso: afinidad y cuota de cgroups, la menor"""
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS y Windows
+        count = os.cpu_count() or 1
+    quota = _cgroup_cpu_quota(cgroup_root)
+    if quota:
+        count = min(count, max(1, math.ceil(quota)))
+    return count
+
+
+def worker_settings(environ=None, cpus=None):
+    """
+    (clase de worker para gunicorn, workers, hilos por worker) a partir de las
+    variables de entorno y de los CPUs disponibles.
+    """
+    environ = os.environ if environ is None else environ
+    cpus = cpus or cpu_count()
+    if environ.get("SERVER_MODE", "wsgi").lower() == "asgi":
+        # La aplicación ASGI solo funciona con workers uvicorn
+        kind = "uvicorn"
+    else:
+        kind = environ.get("GUNICORN_WORKER_CLASS", "gthread").lower()
+        if kind not in ("sync", "gthread"):
+            kind = "gthread"
+    threads = int(environ.get("GUNICORN_THREADS", "4")) if kind == "gthread" else 1
+    default_workers = 2 * cpus + 1 if kind == "sync" else cpus + 1
+    workers = int(environ.get("GUNICORN_WORKERS", "0")) or default_workers
+    return WORKER_CLASSES[kind], workers, threads
+
+
+SERVER_MODE = os.getenv("SERVER_MODE", "wsgi").lower()
+wsgi_app = "proyecto.asgi:application" if SERVER_MODE == "asgi" else "proyecto.wsgi:application"
+bind = os.getenv("HOSTING_IP_PORT", "0.0.0.0:8080")
+worker_class, workers, threads = worker_settings()
+preload_app = os.getenv("GUNICORN_PRELOAD", "True") == "True"
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))  # 0 = sin reciclado
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", str(max_requests // 10)))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+errorlog = "-"
+MEMORY_LOG_EVERY = int(os.getenv("GUNICORN_MEMORY_LOG_EVERY", "500"))  # Solicitudes entre registros de memoria (0 = solo al iniciar y al salir)
+
+
+def when_ready(server):
+    if preload_app:
+        # Las conexiones abiertas durante la carga no deben heredarlas los workers
+        if "django.db" in sys.modules:
+            from django.db import connections
+            connections.close_all()
+        gc.collect()
+    server.log.info(
+        "Maestro %d: %d workers %s x %d hilos (%d CPUs), preload_app=%s, %s",
+        os.getpid(), workers, worker_class, threads, cpu_count(), preload_app, _format_memory(memory_usage()),
+    )
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        # Los objetos del maestro pasan a la generación permanente: el
+        # recolector del worker no los toca y sus páginas siguen compartidas
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    worker.log.info("Worker %d iniciado: %s", worker.pid, _format_memory(memory_usage()))
+
+
+def post_request(worker, req, environ, resp):
+    # gunicorn no llama a este gancho con workers uvicorn
+    if MEMORY_LOG_EVERY and worker.nr % MEMORY_LOG_EVERY == 0:
+        worker.log.info("Worker %d tras %d solicitudes: %s", worker.pid, worker.nr, _format_memory(memory_usage()))
+
+
+def worker_exit(server, worker):
+    server.log.info("Worker %d termina tras %d solicitudes: %s", worker.pid, worker.nr, _format_memory(memory_usage()))
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Optimización de las imágenes estáticas en collectstatic y elección de la
+variante que se sirve a cada navegador.
+
+En collectstatic, IncrementalManifestStaticFilesStorage pasa cada imagen con
+hash por optimize_image: el PNG o JPEG se recomprime sin pérdida visible
+(PNG con optimize, JPEG con las mismas tablas de cuantización y progresivo) y
+solo se reemplaza si queda más pequeño, y junto a él se escriben variantes
+AVIF y WebP (nombre.png.avif, nombre.png.webp) cuando ocupan menos que el
+original. Los GIF animados se convierten en WebP animado. AVIF requiere un
+Pillow con soporte AVIF (11.2 o superior, o pillow-avif-plugin); sin él solo
+se generan las variantes WebP.
+
+Al servir, AsyncWhiteNoiseMiddleware elige la primera variante que el
+navegador declara en Accept (AVIF antes que WebP) y responde siempre con
+Vary: Accept, para que las cachés intermedias guarden una copia por formato.
+"""
+
+import io
+import os
+from functools import lru_cache
+
+# Extensiones de las imágenes que se optimizan
+SOURCE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif")
+# Variantes en orden de preferencia: sufijo -> tipo MIME
+VARIANT_TYPES = {".avif": "image/avif", ".webp": "image/webp"}
+# Formato de Pillow de cada variante
+VARIANT_FORMATS = {".avif": "AVIF", ".webp": "WEBP"}
+
+
+def is_source_image(name):
+    return name.lower().endswith(SOURCE_EXTENSIONS)
+
+
+def is_variant(path, stat_cache=None):
+    """True si `path` es una variante generada (imagen.png.webp) de una imagen que existe"""
+    base, suffix = os.path.splitext(path)
+    if suffix not in VARIANT_TYPES or not is_source_image(base):
+        return False
+    return base in stat_cache if stat_cache is not None else os.path.isfile(base)
+
+
+def find_variants(path, stat_cache=None):
+    """[(tipo MIME, ruta)] de las variantes de `path`, en orden de preferencia"""
+    if not is_source_image(path):
+        return []
+    variants = []
+    for suffix, media_type in VARIANT_TYPES.items():
+        variant = path + suffix
+        if (variant in stat_cache) if stat_cache is not None else os.path.isfile(variant):
+            variants.append((media_type, variant))
+    return variants
+
+
+@lru_cache(maxsize=64)
+def accepted_types(accept):
+    """
+    Tipos MIME que la cabecera Accept nombra explícitamente con q > 0. Los
+    comodines (image/*, */*) no cuentan: los navegadores sin soporte de WebP
+    también los envían.
+    """
+    accepted = set()
+    for item in accept.split(","):
+        media_type, _, params = item.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(media_type.strip().lower())
+    return frozenset(accepted)
+
+
+def available_formats(formats):
+    """Sufijos de `formats` ('avif', 'webp') que el Pillow instalado puede escribir"""
+    from PIL import Image
+
+    extensions = Image.registered_extensions()
+    return [f".{name}" for name in formats if f".{name}" in VARIANT_TYPES and extensions.get(f".{name}") in Image.SAVE]
+
+
+def _encode(image, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, **options)
+    return buffer.getvalue()
+
+
+def _recompress(image):
+    """Misma imagen con mejor compresión, o None si el formato no se recomprime"""
+    keep = {key: image.info[key] for key in ("icc_profile", "dpi", "transparency") if key in image.info}
+    if image.format == "PNG":
+        return _encode(image, format="PNG", optimize=True, **keep)
+    if image.format == "JPEG":
+        keep.pop("transparency", None)
+        if "exif" in image.info:
+            keep["exif"] = image.info["exif"]
+        return _encode(image, format="JPEG", quality="keep", subsampling="keep", optimize=True, progressive=True, **keep)
+    return None
+
+
+def _write(path, data):
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as handle:
+        handle.write(data)
+    os.replace(temporary, path)
+
+
+def optimize_image(path, suffixes, quality):
+    """
+    Recomprime la imagen de `path` y escribe sus variantes. Devuelve
+    (sufijos escritos, bytes antes, bytes después, bytes de la variante más
+    pequeña). Se ejecuta en los procesos del pool de collectstatic.
+    """
+    from PIL import Image
+
+    before = os.path.getsize(path)
+    after = before
+    written = []
+    with Image.open(path) as image:
+        if getattr(image, "is_animated", False):
+            # Solo WebP admite animación en Pillow; el GIF original se deja igual
+            variants = {".webp": {"save_all": True, "quality": quality, "method": 4}} if ".webp" in suffixes else {}
+        else:
+            image.load()
+            optimized = _recompress(image)
+            if optimized is not None and len(optimized) < before:
+                _write(path, optimized)
+                after = len(optimized)
+            if image.mode not in ("RGB", "RGBA"):
+                has_alpha = "A" in image.getbands() or "transparency" in image.info
+                image = image.convert("RGBA" if has_alpha else "RGB")
+            # Iconos y gráficos de pocos colores sin pérdida; fotografías con pérdida
+            lossless = image.getcolors(256) is not None
+            variants = {suffix: {"quality": quality} for suffix in suffixes}
+            if ".webp" in variants and lossless:
+                variants[".webp"] = {"lossless": True, "quality": 100}
+        best = after
+        for suffix, options in variants.items():
+            data = _encode(image, format=VARIANT_FORMATS[suffix], **options)
+            if len(data) < after:
+                _write(path + suffix, data)
+                written.append(suffix)
+                best = min(best, len(data))
+            elif os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    return written, before, after, best
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Trabajos en segundo plano en un pool de procesos por worker.
+
+ProcessPool encola funciones en un ProcessPoolExecutor creado al primer uso
+en cada proceso, con una cola acotada: cuando está llena, submit lanza
+JobBusy al momento en lugar de acumular trabajo. Los procesos se crean con
+'spawn' (no heredan los hilos del worker) y cargan Django desde cero. Cada
+worker de gunicorn tiene su propio pool, así que el total de procesos es
+workers × el tamaño del pool.
+
+El estado de cada trabajo se guarda en un archivo JSON que el worker y los
+procesos del pool pueden escribir y que cualquier worker del nodo puede leer.
+Guarda el nodo y el pid del worker que encoló el trabajo, que es quien escribe
+el resultado: si ese worker ya no existe (reciclado o terminado), read_status
+informa el trabajo pendiente como error en lugar de dejarlo pendiente para
+siempre. purge_statuses borra los estados terminados pasado un tiempo.
+Lo usan proyecto/covers.py y app_1/exports.py.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+from django.conf import settings
+
+
+class JobBusy(Exception):
+    """La cola del pool está llena"""
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+class ProcessPool:
+    """
+    Pool de procesos con una cola de `queue_setting` trabajos y
+    `workers_setting` procesos (0 = la mitad de los CPUs, en cada worker).
+    """
+
+    def __init__(self, workers_setting, queue_setting):
+        self.workers_setting = workers_setting
+        self.queue_setting = queue_setting
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self.in_flight = 0
+
+    @staticmethod
+    def default_workers():
+        return max(1, (os.cpu_count() or 2) // 2)
+
+    def _get_executor(self):
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    # Tras un fork el pool del proceso padre no sirve en el hijo
+                    self._executor = None
+                    self._slots = threading.BoundedSemaphore(getattr(settings, self.queue_setting))
+                    self._pid = os.getpid()
+                    self.in_flight = 0
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=getattr(settings, self.workers_setting) or self.default_workers(),
+                        mp_context=get_context("spawn"),
+                        initializer=_init_worker,
+                    )
+        return self._executor
+
+    def submit(self, func, *args):
+        """Encola func(*args) y devuelve el Future; lanza JobBusy si no hay lugar"""
+        executor = self._get_executor()
+        if not self._slots.acquire(blocking=False):
+            raise JobBusy()
+        try:
+            future = executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.in_flight += 1
+        future.add_done_callback(lambda future: self._done(executor, future))
+        return future
+
+    def _done(self, executor, future):
+        with self._lock:
+            self.in_flight -= 1
+            if self._executor is executor and isinstance(future.exception(), BrokenProcessPool):
+                # Un proceso del pool murió (por ejemplo, sin memoria): el siguiente trabajo crea otro pool
+                self._executor = None
+        self._slots.release()
+
+
+def new_status(job_id, **fields):
+    """Estado inicial de un trabajo encolado por este proceso"""
+    return {
+        "id": job_id, "state": "pending", "created": time.time(),
+        "host": socket.gethostname(), "owner": os.getpid(), **fields,
+    }
+
+
+def _owner_alive(status):
+    owner = status.get("owner")
+    if owner is None or owner == os.getpid() or status.get("host") != socket.gethostname():
+        return True
+    if os.name != "posix":
+        # En Windows os.kill(pid, 0) terminaría el proceso
+        return True
+    try:
+        os.kill(owner, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def write_status(path, status):
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as handle:
+        json.dump(status, handle)
+    os.replace(temporary, path)
+
+
+def read_status(path):
+    """Estado guardado en `path` o None si no existe"""
+    try:
+        with open(path, encoding="utf-8") as handle:
+            status = json.load(handle)
+    except FileNotFoundError:
+        return None
+    if status.get("state") in ("pending", "running") and not _owner_alive(status):
+        # Nadie escribirá el resultado: el Future vivía en el worker que terminó
+        status.update(state="error", error="El trabajo se interrumpió al terminar el worker que lo atendía.")
+    return status
+
+
+def purge_statuses(directory, max_age, remove=None):
+    """
+    Borra los estados terminados (o interrumpidos) de `directory` escritos hace
+    más de `max_age` segundos; remove(status) borra antes lo demás del trabajo.
+    Devuelve cuántos se borraron.
+    """
+    limit = time.time() - max_age
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    removed = 0
+    for entry in entries:
+        try:
+            if not entry.name.endswith(".json") or entry.stat().st_mtime > limit:
+                continue
+            status = read_status(entry.path)
+            if status is None or status.get("state") not in ("done", "error"):
+                continue
+            if remove is not None:
+                remove(status)
+            os.remove(entry.path)
+        except FileNotFoundError:
+            # Otro proceso lo borró a la vez
+            continue
+        removed += 1
+    return removed
@@ -2,10 +2,8 @@
 
 import os
 import dj_database_url
-from dotenv import load_dotenv
 
-# Carga las variables de entorno del archivo .env
-load_dotenv()
+# Las variables del archivo .env ya las cargó settings.py
 
 # Variable para escoger la base de datos local o de producción
 # Si IS_DEPLOYED es 'True', se escoge la base de datos de producción, de lo contrario, se escoge la base de datos local.
@@ -67,3 +65,77 @@ else:
         + "Se utiliza el valor predeterminado 'postgresql'.\n"
         + "Establezca la variable de entorno DATABASE SELECTOR en 'postgresql' o 'mysql' antes de ejecutar el servidor."
     )
+
+# Reutilización de conexiones y pool por worker
+# DB_CONN_MAX_AGE: segundos que Django mantiene abierta la conexión de cada hilo (0 = cerrar al final de cada solicitud)
+# DB_CONN_HEALTH_CHECKS: verifica la conexión reutilizada antes de la primera consulta de cada solicitud
+# DB_POOL_SIZE: conexiones máximas del pool por worker (0 = sin pool, solo conexiones persistentes)
+# DB_POOL_MAX_AGE: segundos tras los cuales una conexión del pool se cierra y se reemplaza
+# DB_POOL_TIMEOUT: segundos máximos de espera por una conexión libre del pool
+# DB_POOL_IDLE_CHECK: segundos de inactividad tras los cuales se verifica una conexión antes de entregarla
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+DB_CONN_HEALTH_CHECKS = os.getenv("DB_CONN_HEALTH_CHECKS", "True") == "True"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "0"))
+DB_POOL_MAX_AGE = int(os.getenv("DB_POOL_MAX_AGE", "300"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_IDLE_CHECK = float(os.getenv("DB_POOL_IDLE_CHECK", "30"))
+# Con SERVER_MODE=asgi las conexiones persistentes quedan abiertas en hilos que no las vuelven a usar:
+# sin pool, DB_CONN_MAX_AGE se ignora y cada solicitud cierra su conexión
+ASGI_MODE = os.getenv("SERVER_MODE", "wsgi").lower() == "asgi"
+# MYSQL_LOCAL_INFILE: habilita 'LOAD DATA LOCAL INFILE' en el cliente para el comando bulk_load (el servidor necesita local_infile=ON)
+MYSQL_LOCAL_INFILE = os.getenv("MYSQL_LOCAL_INFILE", "False") == "True"
+
+# Backends con pool de proyecto.db.backends según la base de datos seleccionada
+POOLED_ENGINES = {
+    "postgresql": "proyecto.db.backends.postgresql",
+    "mysql": "proyecto.db.backends.mysql",
+}
+
+
+def configure_connections(database_dict):
+    """Aplica la configuración de reutilización y pool de conexiones a una entrada de DATABASES"""
+    if not database_dict:
+        # dj_database_url devuelve un diccionario vacío si no hay URL configurada
+        return database_dict
+    database_dict["CONN_HEALTH_CHECKS"] = DB_CONN_HEALTH_CHECKS
+    if DATABASE_SELECTOR == "mysql" and MYSQL_LOCAL_INFILE:
+        database_dict.setdefault("OPTIONS", {})["local_infile"] = 1
+    if DB_POOL_SIZE > 0:
+        # Con pool, cerrar la conexión al final de la solicitud la devuelve al pool
+        database_dict["ENGINE"] = POOLED_ENGINES[DATABASE_SELECTOR]
+        database_dict["CONN_MAX_AGE"] = 0
+        database_dict["POOL"] = {
+            "MAX_SIZE": DB_POOL_SIZE,
+            "MAX_AGE": DB_POOL_MAX_AGE,
+            "TIMEOUT": DB_POOL_TIMEOUT,
+            "HEALTH_CHECKS": DB_CONN_HEALTH_CHECKS,
+            "IDLE_CHECK_AFTER": DB_POOL_IDLE_CHECK,
+        }
+    else:
+        database_dict["CONN_MAX_AGE"] = 0 if ASGI_MODE else DB_CONN_MAX_AGE
+    return database_dict
+
+
+DATABASE_DICT = configure_connections(DATABASE_DICT)
+
+# Réplicas de solo lectura
+# POSTGRESQL_REPLICA_URLS / MYSQL_REPLICA_URLS: URLs separadas por comas de las réplicas de la base de datos seleccionada
+# DB_REPLICA_CHECK_INTERVAL: segundos entre verificaciones de salud de cada réplica
+# DB_REPLICA_CONNECT_TIMEOUT: segundos máximos para conectar con una réplica; la verificación de salud
+# conecta dentro de la solicitud que elige la réplica, así que una réplica caída la retrasa como mucho esto
+REPLICA_URLS = [
+    url.strip()
+    for url in os.getenv(f"{DATABASE_SELECTOR.upper()}_REPLICA_URLS", "").split(",")
+    if url.strip()
+]
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "30"))
+DB_REPLICA_CONNECT_TIMEOUT = int(os.getenv("DB_REPLICA_CONNECT_TIMEOUT", "2"))
+
+REPLICA_DICTS = []
+for replica_url in REPLICA_URLS:
+    replica_dict = configure_connections(dj_database_url.parse(replica_url))
+    # psycopg y mysqlclient aceptan connect_timeout en segundos
+    replica_dict.setdefault("OPTIONS", {}).setdefault("connect_timeout", DB_REPLICA_CONNECT_TIMEOUT)
+    # En pruebas las réplicas apuntan a la base de datos de prueba principal
+    replica_dict["TEST"] = {"MIRROR": "default"}
+    REPLICA_DICTS.append(replica_dict)
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Piezas del sistema de logging configurado en logging_settings.py.
+
+`configure_logging` se usa como LOGGING_CONFIG: aplica el diccionario LOGGING
+con dictConfig y, si LOG_QUEUE está activo, sustituye los manejadores de cada
+logger por un QueueHandler. Los manejadores reales (archivo, consola) se
+ejecutan en un hilo de fondo por proceso, de modo que el hilo de la solicitud
+solo encola el registro y nunca espera una escritura en disco.
+"""
+
+import atexit
+import json
+import logging
+import logging.config
+import logging.handlers
+import os
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+
+# Marca que detiene el hilo del despachador
+_STOP = object()
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Deja pasar solo una fracción `rate` de los registros de nivel `max_level`
+    o inferior; los niveles superiores pasan siempre. Se aplica sobre el logger
+    (por ejemplo django.db.backends) para descartar antes de formatear.
+    """
+
+    def __init__(self, rate=1.0, max_level="DEBUG"):
+        super().__init__()
+        self.rate = float(rate)
+        self.max_level = logging._checkLevel(max_level)
+
+    def filter(self, record):
+        if record.levelno > self.max_level or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatea cada registro como un objeto JSON en una sola línea"""
+
+    def format(self, record):
+        payload = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            payload["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class DispatchQueueHandler(logging.handlers.QueueHandler):
+    """Encola cada registro junto con los manejadores destino de su logger"""
+
+    def __init__(self, dispatcher, targets):
+        super().__init__(dispatcher.queue)
+        self.dispatcher = dispatcher
+        self.targets = tuple(targets)
+
+    def prepare(self, record):
+        # Se fusionan los argumentos para que un objeto mutable no cambie antes de escribirse;
+        # el formateo completo lo hace el manejador destino en el hilo de fondo
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        self.dispatcher.queue.put_nowait((self.targets, record))
+
+
+class LogDispatcher:
+    """Hilo de fondo por proceso que entrega los registros encolados a sus manejadores"""
+
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="log-dispatcher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            targets, record = item
+            for handler in targets:
+                if record.levelno >= handler.level:
+                    try:
+                        handler.handle(record)
+                    except Exception:
+                        handler.handleError(record)
+
+    def stop(self):
+        """Vacía la cola y detiene el hilo (se llama al salir del proceso)"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self.queue.put(_STOP)
+            thread.join(timeout=5)
+
+    def after_fork(self):
+        # El hilo no sobrevive a fork y la cola heredada puede tener su bloqueo tomado
+        self.queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+        for handler in _queue_handlers:
+            handler.queue = self.queue
+        self.start()
+
+
+dispatcher = LogDispatcher()
+_queue_handlers = []
+
+atexit.register(dispatcher.stop)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=lambda: dispatcher.after_fork() if _queue_handlers else None)
+
+
+def _install_queue_handlers(logger_names):
+    """Reemplaza los manejadores de cada logger por un DispatchQueueHandler"""
+    for name in logger_names:
+        logger = logging.getLogger(name or None)
+        targets = [handler for handler in logger.handlers if not isinstance(handler, DispatchQueueHandler)]
+        if not targets:
+            continue
+        queue_handler = DispatchQueueHandler(dispatcher, targets)
+        # El QueueHandler debe aceptar todo lo que acepte el manejador destino más permisivo
+        queue_handler.setLevel(min(handler.level for handler in targets))
+        for handler in targets:
+            logger.removeHandler(handler)
+        logger.addHandler(queue_handler)
+        _queue_handlers.append(queue_handler)
+
+
+def configure_logging(logging_settings):
+    """
+    Función para LOGGING_CONFIG. La clave "queue" del diccionario (no estándar
+    en dictConfig) activa el envío de registros al hilo de fondo.
+    """
+    logging_settings = dict(logging_settings)
+    use_queue = logging_settings.pop("queue", False)
+    logging.config.dictConfig(logging_settings)
+    if use_queue:
+        _queue_handlers.clear()
+        loggers = list(logging_settings.get("loggers", {}))
+        if "root" in logging_settings:
+            loggers.append("")
+        _install_queue_handlers(loggers)
+        dispatcher.start()
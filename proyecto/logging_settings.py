@@ -1,17 +1,73 @@
 import os
 
+# Los manejadores se ejecutan en un hilo de fondo por worker (ver proyecto/logging_handlers.py)
+LOGGING_CONFIG = "proyecto.logging_handlers.configure_logging"
+
+# LOG_QUEUE: si es 'True', el hilo de la solicitud solo encola los registros
+LOG_QUEUE = os.getenv("LOG_QUEUE", "True") == "True"
+# LOG_FORMAT: 'text' o 'json' para el archivo de log
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+# LOG_FILE: ruta del archivo de log de Django
+LOG_FILE = os.getenv("LOG_FILE", "tmp/django.log")
+# LOG_ROTATION: 'watched' (rota logrotate u otra herramienta externa; el archivo se
+# reabre al cambiar), 'size' (por tamaño) o 'time' (por tiempo). 'size' y 'time' rotan
+# desde el propio proceso: solo sirven con un único proceso (runserver), porque cada
+# worker de gunicorn rotaría el mismo archivo por su cuenta y se perderían registros
+LOG_ROTATION = os.getenv("LOG_ROTATION", "watched")
+# LOG_MAX_BYTES: tamaño máximo del archivo antes de rotar (rotación por tamaño)
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+# LOG_ROTATION_WHEN: intervalo de rotación por tiempo ('midnight', 'H', 'D', ...)
+LOG_ROTATION_WHEN = os.getenv("LOG_ROTATION_WHEN", "midnight")
+# LOG_BACKUP_COUNT: número de archivos rotados que se conservan
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# LOG_DB_SAMPLE_RATE: fracción de los registros DEBUG de django.db.backends que se conservan
+LOG_DB_SAMPLE_RATE = float(os.getenv("LOG_DB_SAMPLE_RATE", "1.0"))
+
+if LOG_ROTATION == "size":
+    LOG_FILE_HANDLER = {
+        "class": "logging.handlers.RotatingFileHandler",
+        "maxBytes": LOG_MAX_BYTES,
+        "backupCount": LOG_BACKUP_COUNT,
+    }
+elif LOG_ROTATION == "time":
+    LOG_FILE_HANDLER = {
+        "class": "logging.handlers.TimedRotatingFileHandler",
+        "when": LOG_ROTATION_WHEN,
+        "backupCount": LOG_BACKUP_COUNT,
+    }
+else:
+    # Todos los workers escriben en modo append y ninguno rota
+    LOG_FILE_HANDLER = {"class": "logging.handlers.WatchedFileHandler"}
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
+    # Clave propia de configure_logging: activa el envío de registros al hilo de fondo
+    "queue": LOG_QUEUE,
     "formatters": {
-        "standard": {"format": "%(asctime)s [%(levelname)s] %(name)s %(message)s"}
+        "standard": {"format": "%(asctime)s [%(levelname)s] %(name)s %(message)s"},
+        "json": {"()": "proyecto.logging_handlers.JsonFormatter"},
+    },
+    "filters": {
+        "db_sampling": {
+            "()": "proyecto.logging_handlers.SamplingFilter",
+            "rate": LOG_DB_SAMPLE_RATE,
+            "max_level": "DEBUG",
+        },
     },
     "handlers": {
         "default": {"level": "ERROR", "class": "logging.StreamHandler"},
+        "console": {
+            "level": "INFO",
+            "class": "logging.StreamHandler",
+            "formatter": "standard",
+        },
         "file": {
             "level": "DEBUG",
-            "class": "logging.FileHandler",
-            "filename": "tmp/django.log",
+            "filename": LOG_FILE,
+            "formatter": "json" if LOG_FORMAT == "json" else "standard",
+            "delay": True,
+            **LOG_FILE_HANDLER,
         },
     },
     "loggers": {
@@ -25,5 +81,15 @@ LOGGING = {
             "level": "DEBUG",
             "propagate": True,
         },
+        "django.db.backends": {
+            "filters": ["db_sampling"],
+            "level": "DEBUG",
+            "propagate": True,
+        },
+        "proyecto": {
+            "handlers": ["console"],
+            "level": "INFO",
+            "propagate": False,
+        },
     },
 }
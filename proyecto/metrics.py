@@ -0,0 +1,439 @@
+# -*- coding: utf-8 -*-
+"""
+Métricas de rendimiento del proceso y su exposición en formato Prometheus.
+
+Cada worker acumula contadores e histogramas en memoria y un hilo de fondo
+escribe su instantánea en METRICS_DIR (un archivo JSON por proceso) cada
+METRICS_FLUSH_INTERVAL segundos. La vista /metrics combina los archivos de
+todos los workers del nodo, así que el resultado no depende de qué worker
+atienda la solicitud.
+
+Los contadores e histogramas de los workers terminados se conservan (son
+acumulativos): compact() los suma a metrics-aggregate.json y borra sus
+archivos, de modo que reciclar workers no hace crecer el directorio. Los
+gauges solo cuentan para procesos vivos. El nombre de cada archivo lleva un
+token del proceso, así que un worker nuevo que reutiliza el pid de uno
+terminado no sobrescribe sus contadores.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+
+try:
+    import fcntl
+except ImportError:  # Windows: un solo proceso en desarrollo
+    fcntl = None
+
+# Límites de los histogramas de duración (segundos), los mismos que usa Prometheus por defecto
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+# Límites del histograma de consultas por solicitud
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+# Contadores e histogramas de los workers terminados
+AGGREGATE_FILE = "metrics-aggregate.json"
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Registry:
+    """Contadores, gauges e histogramas con etiquetas del proceso actual"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}  # nombre -> (tipo, ayuda, límites)
+        self._values = {}  # nombre -> {etiquetas: valor | [cubetas, suma, cuenta]}
+        self._collectors = []
+        self._thread = None
+        self._stop = threading.Event()
+        self._new_identity()
+
+    def _new_identity(self):
+        self.started = time.time()
+        self.token = uuid.uuid4().hex[:12]
+
+    def declare(self, name, kind, help_text, buckets=None):
+        self._meta[name] = (kind, help_text, tuple(buckets) if buckets else None)
+        self._values.setdefault(name, {})
+
+    def inc(self, name, labels=None, amount=1):
+        key = _labels_key(labels or {})
+        with self._lock:
+            series = self._values[name]
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, labels=None):
+        key = _labels_key(labels or {})
+        buckets = self._meta[name][2]
+        with self._lock:
+            series = self._values[name]
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            state[0][bisect_left(buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def register_collector(self, collector):
+        """
+        Registra una función que devuelve muestras calculadas al momento, como
+        tuplas (nombre, tipo, ayuda, etiquetas, valor). Sirve para publicar
+        estadísticas que ya llevan otros módulos (caché, pool de conexiones).
+        """
+        self._collectors.append(collector)
+
+    def snapshot(self):
+        """Instantánea serializable del proceso actual"""
+        metrics = {}
+        with self._lock:
+            for name, series in self._values.items():
+                kind, help_text, buckets = self._meta[name]
+                samples = []
+                for key, value in series.items():
+                    if kind == "histogram":
+                        value = {"buckets": list(value[0]), "sum": value[1], "count": value[2]}
+                    samples.append({"labels": dict(key), "value": value})
+                metrics[name] = {"type": kind, "help": help_text, "buckets": buckets, "samples": samples}
+        for collector in list(self._collectors):
+            try:
+                collected = list(collector())
+            except Exception:
+                continue
+            for name, kind, help_text, labels, value in collected:
+                entry = metrics.setdefault(name, {"type": kind, "help": help_text, "buckets": None, "samples": []})
+                entry["samples"].append({"labels": labels, "value": value})
+        return {"pid": os.getpid(), "token": self.token, "started": self.started, "time": time.time(), "metrics": metrics}
+
+    @property
+    def filename(self):
+        return f"metrics-{os.getpid()}-{self.token}.json"
+
+    def flush(self):
+        """Escribe la instantánea del proceso en METRICS_DIR"""
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        _write_json(os.path.join(directory, self.filename), self.snapshot())
+
+    def start(self):
+        """Arranca el hilo que escribe la instantánea cada METRICS_FLUSH_INTERVAL segundos"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="metrics-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(settings.METRICS_FLUSH_INTERVAL):
+            try:
+                self.flush()
+                if settings.METRICS_DIR:
+                    compact(settings.METRICS_DIR)
+            except (OSError, ValueError):
+                pass
+
+    def stop(self):
+        """Detiene el hilo y escribe la última instantánea (se llama al salir del proceso)"""
+        if self._thread is None or self._stop.is_set():
+            return
+        self._stop.set()
+        self.flush()
+
+    def after_fork(self):
+        # El hilo no sobrevive a fork y lo acumulado hasta aquí es del padre, que lo
+        # escribe en su propio archivo: el hijo empieza de cero con otro token
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        for series in self._values.values():
+            series.clear()
+        self._new_identity()
+
+
+def _write_json(path, data):
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as handle:
+        json.dump(data, handle)
+    os.replace(temporary, path)
+
+
+registry = Registry()
+
+registry.declare("http_requests_total", "counter", "Solicitudes atendidas por nombre de URL y código de estado")
+registry.declare("http_request_duration_seconds", "histogram", "Duración total de la solicitud", DURATION_BUCKETS)
+registry.declare("http_template_render_seconds", "histogram", "Tiempo de renderizado de plantillas por solicitud", DURATION_BUCKETS)
+registry.declare("http_db_query_duration_seconds", "histogram", "Tiempo total en consultas SQL por solicitud", DURATION_BUCKETS)
+registry.declare("http_db_queries_per_request", "histogram", "Número de consultas SQL por solicitud", QUERY_COUNT_BUCKETS)
+
+
+class RequestTimings:
+    """Acumuladores de tiempos de la solicitud en curso"""
+
+    __slots__ = ("template", "db", "db_queries")
+
+    def __init__(self):
+        self.template = 0.0
+        self.db = 0.0
+        self.db_queries = 0
+
+
+# Tiempos de la solicitud actual; se propaga a los hilos de sync_to_async en modo ASGI
+current_timings = ContextVar("current_timings", default=None)
+
+
+def record_template_time(seconds):
+    timings = current_timings.get()
+    if timings is not None:
+        timings.template += seconds
+
+
+def _db_execute_wrapper(execute, sql, params, many, context):
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db += time.perf_counter() - start
+        timings.db_queries += 1
+
+
+def _install_db_wrapper(sender, connection, **kwargs):
+    # Las conexiones se crean por hilo, así que el envoltorio se instala al conectar
+    if _db_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_db_execute_wrapper)
+
+
+connection_created.connect(_install_db_wrapper, dispatch_uid="proyecto.metrics.db_wrapper")
+
+
+def observe_request(url_name, status_code, total, timings):
+    labels = {"url_name": url_name}
+    registry.inc("http_requests_total", {"url_name": url_name, "status": str(status_code)})
+    registry.observe("http_request_duration_seconds", total, labels)
+    registry.observe("http_template_render_seconds", timings.template, labels)
+    registry.observe("http_db_query_duration_seconds", timings.db, labels)
+    registry.observe("http_db_queries_per_request", timings.db_queries, labels)
+    registry.start()
+
+
+def server_timing_header(total, timings):
+    return ", ".join((
+        "total;dur=%.2f" % (total * 1000),
+        "tpl;dur=%.2f" % (timings.template * 1000),
+        'db;dur=%.2f;desc="%d queries"' % (timings.db * 1000, timings.db_queries),
+    ))
+
+
+def _pool_collector():
+    from proyecto.db.pool import pool_stats
+
+    for alias, stats in pool_stats().items():
+        labels = {"alias": alias}
+        yield "db_pool_checkouts_total", "counter", "Conexiones entregadas por el pool", labels, stats["checkouts"]
+        yield "db_pool_wait_seconds_total", "counter", "Tiempo total de espera por una conexión del pool", labels, stats["wait_seconds_total"]
+        yield "db_pool_timeouts_total", "counter", "Esperas del pool que agotaron el tiempo", labels, stats["timeouts"]
+        yield "db_pool_connections_created_total", "counter", "Conexiones abiertas por el pool", labels, stats["connections_created"]
+        yield "db_pool_health_check_failures_total", "counter", "Conexiones descartadas por fallar la verificación", labels, stats["health_check_failures"]
+        yield "db_pool_connections_in_use", "gauge", "Conexiones del pool en uso", labels, stats["in_use"]
+        yield "db_pool_connections_idle", "gauge", "Conexiones del pool inactivas", labels, stats["idle"]
+
+
+def _replica_collector():
+    if not settings.DATABASE_REPLICAS:
+        return
+    from proyecto.db.routers import replica_health
+
+    for alias, healthy in replica_health.snapshot().items():
+        yield "db_replica_healthy", "gauge", "1 si la réplica está en rotación", {"alias": alias}, int(healthy)
+
+
+registry.register_collector(_pool_collector)
+registry.register_collector(_replica_collector)
+atexit.register(lambda: registry.stop() if settings.METRICS_ENABLED else None)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=registry.after_fork)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class _DirectoryLock:
+    """Bloqueo exclusivo del directorio de métricas entre procesos (flock)"""
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, "metrics.lock")
+
+    def __enter__(self):
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        os.close(self.fd)  # Cerrar libera el bloqueo
+
+
+def _read_directory(directory):
+    """(agregado, {archivo: instantánea}) de METRICS_DIR; borra los temporales de procesos terminados"""
+    aggregate = {"pid": None, "absorbed": [], "metrics": {}}
+    snapshots = {}
+    for filename in os.listdir(directory):
+        path = os.path.join(directory, filename)
+        if filename.endswith(".json.tmp"):
+            pid = filename.split("-")[1].split(".")[0]
+            if pid.isdigit() and not _pid_alive(int(pid)):
+                os.unlink(path)
+            continue
+        if not (filename.startswith("metrics-") and filename.endswith(".json")):
+            continue
+        try:
+            with open(path, encoding="utf-8") as handle:
+                data = json.load(handle)
+        except (OSError, ValueError):
+            continue
+        if filename == AGGREGATE_FILE:
+            aggregate = data
+        else:
+            snapshots[filename] = data
+    return aggregate, snapshots
+
+
+def _current(snapshots):
+    """Archivos de procesos vivos: el pid existe y es el proceso más reciente con ese pid"""
+    latest = {}
+    for snapshot in snapshots.values():
+        latest[snapshot["pid"]] = max(latest.get(snapshot["pid"], 0), snapshot.get("started", 0))
+    return {
+        filename for filename, snapshot in snapshots.items()
+        if snapshot.get("started", 0) == latest[snapshot["pid"]]
+        and (snapshot["pid"] == os.getpid() or _pid_alive(snapshot["pid"]))
+    }
+
+
+def compact(directory):
+    """
+    Suma los contadores e histogramas de los workers terminados al archivo
+    agregado y borra sus archivos. Devuelve las instantáneas que quedan: el
+    agregado y las de los procesos vivos.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with _DirectoryLock(directory):
+        aggregate, snapshots = _read_directory(directory)
+        absorbed = set(aggregate["absorbed"])
+        current = _current(snapshots)
+        dead = [filename for filename in snapshots if filename not in current and filename not in absorbed]
+        if dead:
+            merged = merge_snapshots([aggregate] + [snapshots[filename] for filename in dead])
+            aggregate = {
+                "pid": None,
+                "time": time.time(),
+                # Si el proceso muere antes de borrarlos, la siguiente compactación no los vuelve a sumar
+                "absorbed": dead,
+                "metrics": {
+                    name: {
+                        "type": metric["type"], "help": metric["help"], "buckets": metric["buckets"],
+                        "samples": [{"labels": dict(key), "value": value} for key, value in metric["series"].items()],
+                    }
+                    for name, metric in merged.items()
+                },
+            }
+            _write_json(os.path.join(directory, AGGREGATE_FILE), aggregate)
+            absorbed.update(dead)
+        for filename in absorbed & set(snapshots):
+            os.unlink(os.path.join(directory, filename))
+    return [aggregate] + [snapshots[filename] for filename in sorted(current)]
+
+
+def _load_snapshots():
+    directory = settings.METRICS_DIR
+    if not directory:
+        return [registry.snapshot()]
+    # Lo del proceso actual sale de la memoria, no de su último archivo
+    return [
+        snapshot for snapshot in compact(directory) if snapshot.get("token") != registry.token
+    ] + [registry.snapshot()]
+
+
+def merge_snapshots(snapshots):
+    """Suma las series de todos los procesos; los gauges solo de procesos vivos"""
+    merged = {}
+    for snapshot in snapshots:
+        # El agregado (pid None) no tiene gauges
+        alive = snapshot["pid"] is not None and (snapshot["pid"] == os.getpid() or _pid_alive(snapshot["pid"]))
+        for name, metric in snapshot["metrics"].items():
+            if metric["type"] == "gauge" and not alive:
+                continue
+            entry = merged.setdefault(name, {"type": metric["type"], "help": metric["help"], "buckets": metric["buckets"], "series": {}})
+            for sample in metric["samples"]:
+                key = _labels_key(sample["labels"])
+                value = sample["value"]
+                if metric["type"] == "histogram":
+                    current = entry["series"].setdefault(key, {"buckets": [0] * len(value["buckets"]), "sum": 0.0, "count": 0})
+                    current["buckets"] = [a + b for a, b in zip(current["buckets"], value["buckets"])]
+                    current["sum"] += value["sum"]
+                    current["count"] += value["count"]
+                else:
+                    entry["series"][key] = entry["series"].get(key, 0) + value
+    return merged
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    escaped = ('%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+def render_prometheus(merged):
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for key, value in sorted(metric["series"].items()):
+            if metric["type"] == "histogram":
+                cumulative = 0
+                bounds = list(metric["buckets"]) + ["+Inf"]
+                for bound, count in zip(bounds, value["buckets"]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {value['sum']}")
+                lines.append(f"{name}_count{_format_labels(key)} {value['count']}")
+            else:
+                lines.append(f"{name}{_format_labels(key)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    """Expone las métricas combinadas de todos los workers del nodo"""
+    token = settings.METRICS_TOKEN
+    if not token:
+        # Sin token solo en desarrollo: en producción las métricas no son públicas
+        if not settings.DEBUG:
+            raise Http404()
+    elif request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponseForbidden()
+    body = render_prometheus(merge_snapshots(_load_snapshots()))
+    return HttpResponse(body, content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Middleware propio del proyecto.
+
+Todas las clases de este módulo son compatibles con los modos síncrono y
+asíncrono de Django, de modo que en el despliegue ASGI (SERVER_MODE=asgi) la
+cadena de middleware no obliga a saltar a un hilo en cada solicitud.
+"""
+
+import time
+from wsgiref.headers import Headers
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.contrib.auth import middleware as auth_middleware
+from django.contrib.messages import middleware as message_middleware
+from django.contrib.sessions import middleware as session_middleware
+from django.middleware import clickjacking, common, csrf, security
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.responders import StaticFile
+
+from proyecto import images, metrics
+from proyecto.db.routers import reset_pinning, restore_pinning
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware con soporte asíncrono nativo.
+
+    La búsqueda del archivo estático es un acceso a diccionario, así que en modo
+    asíncrono solo se delega a un hilo la apertura del archivo cuando la ruta
+    corresponde a un estático; el resto de solicitudes continúan sin bloquear.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings=settings)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
+
+    # Negociación de formato de las imágenes optimizadas por collectstatic
+
+    @staticmethod
+    def is_compressed_variant(path, stat_cache=None):
+        # Las variantes .avif/.webp solo se sirven a través de la URL de su imagen
+        return WhiteNoiseMiddleware.is_compressed_variant(path, stat_cache) or images.is_variant(path, stat_cache)
+
+    def get_static_file(self, path, url, stat_cache=None):
+        variants = images.find_variants(path, stat_cache)
+        if not variants:
+            return super().get_static_file(path, url, stat_cache=stat_cache)
+        return NegotiatedStaticFile(
+            self._negotiated_file(path, url, stat_cache),
+            [(media_type, self._negotiated_file(variant, url, stat_cache)) for media_type, variant in variants],
+        )
+
+    def _negotiated_file(self, path, url, stat_cache):
+        # Igual que get_static_file de WhiteNoise, con el tipo de la variante y Vary: Accept
+        headers = Headers([])
+        self.add_mime_headers(headers, path, url)
+        self.add_cache_headers(headers, path, url)
+        if self.allow_all_origins:
+            headers["Access-Control-Allow-Origin"] = "*"
+        if self.add_headers_function is not None:
+            self.add_headers_function(headers, path, url)
+        headers["Vary"] = "Accept"
+        return StaticFile(path, headers.items(), stat_cache=stat_cache)
+
+
+class NegotiatedStaticFile:
+    """Imagen estática con variantes AVIF/WebP; elige la primera que acepte el navegador"""
+
+    def __init__(self, default, variants):
+        self.default = default
+        self.variants = variants
+
+    def get_response(self, method, request_headers):
+        accepted = images.accepted_types(request_headers.get("HTTP_ACCEPT", ""))
+        for media_type, static_file in self.variants:
+            if media_type in accepted:
+                return static_file.get_response(method, request_headers)
+        return self.default.get_response(method, request_headers)
+
+
+class InlineAsyncMiddlewareMixin:
+    """
+    En modo asíncrono ejecuta process_request/process_response directamente en
+    el bucle de eventos en lugar de delegarlos a sync_to_async. MiddlewareMixin
+    hace dos saltos al hilo síncrono por middleware y solicitud; solo debe
+    aplicarse a middleware cuyos ganchos no realizan E/S bloqueante.
+    """
+
+    async def __acall__(self, request):
+        response = None
+        if hasattr(self, "process_request"):
+            response = self.process_request(request)
+        response = response or await self.get_response(request)
+        if hasattr(self, "process_response"):
+            response = self.process_response(request, response)
+        return response
+
+
+class SecurityMiddleware(InlineAsyncMiddlewareMixin, security.SecurityMiddleware):
+    pass
+
+
+class CommonMiddleware(InlineAsyncMiddlewareMixin, common.CommonMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(InlineAsyncMiddlewareMixin, csrf.CsrfViewMiddleware):
+    pass
+
+
+class AuthenticationMiddleware(InlineAsyncMiddlewareMixin, auth_middleware.AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddleware(message_middleware.MessageMiddleware):
+    """
+    MessageMiddleware que solo salta al hilo síncrono cuando hay mensajes que
+    guardar. process_response de FallbackStorage puede cargar la sesión desde
+    la base de datos, algo que no se permite en el bucle de eventos; si la
+    solicitud no leyó ni añadió mensajes, no hace nada.
+    """
+
+    async def __acall__(self, request):
+        self.process_request(request)
+        response = await self.get_response(request)
+        storage = getattr(request, "_messages", None)
+        if storage is not None and (storage.used or storage.added_new):
+            return await sync_to_async(self.process_response, thread_sensitive=True)(request, response)
+        return self.process_response(request, response)
+
+
+class XFrameOptionsMiddleware(InlineAsyncMiddlewareMixin, clickjacking.XFrameOptionsMiddleware):
+    pass
+
+
+class SessionMiddleware(session_middleware.SessionMiddleware):
+    """
+    SessionMiddleware que solo salta al hilo síncrono cuando la sesión fue
+    usada durante la solicitud, porque es el único caso en que puede guardarse
+    en la base de datos.
+    """
+
+    async def __acall__(self, request):
+        self.process_request(request)
+        response = await self.get_response(request)
+        if request.session.accessed:
+            return await sync_to_async(self.process_response, thread_sensitive=True)(request, response)
+        return self.process_response(request, response)
+
+
+class ReplicaPinningMiddleware:
+    """
+    Reinicia al comienzo de cada solicitud la fijación de lecturas a la base de
+    datos principal que PrimaryReplicaRouter activa tras una escritura.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = reset_pinning()
+        try:
+            return self.get_response(request)
+        finally:
+            restore_pinning(token)
+
+    async def __acall__(self, request):
+        token = reset_pinning()
+        try:
+            return await self.get_response(request)
+        finally:
+            restore_pinning(token)
+
+
+class ServerTimingMiddleware:
+    """
+    Mide el tiempo total de la solicitud, el renderizado de plantillas y las
+    consultas SQL, los envía en la cabecera Server-Timing y los acumula en los
+    histogramas por nombre de URL que expone /metrics.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timings = metrics.RequestTimings()
+        token = metrics.current_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current_timings.reset(token)
+        return self._finish(request, response, started, timings)
+
+    async def __acall__(self, request):
+        timings = metrics.RequestTimings()
+        token = metrics.current_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current_timings.reset(token)
+        return self._finish(request, response, started, timings)
+
+    def _finish(self, request, response, started, timings):
+        total = time.perf_counter() - started
+        match = getattr(request, "resolver_match", None)
+        url_name = (match.view_name if match is not None else None) or "<unresolved>"
+        response["Server-Timing"] = metrics.server_timing_header(total, timings)
+        metrics.observe_request(url_name, response.status_code, total, timings)
+        return response
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Hash de contraseñas configurable y ejecutado fuera de los hilos de las solicitudes.
+
+Los hashers de este módulo leen su costo de settings (PASSWORD_PBKDF2_ITERATIONS,
+PASSWORD_ARGON2_*), así que cada entorno ajusta el tiempo de CPU por intento
+sin cambiar código. Un hash guardado con otro algoritmo u otro costo se
+regenera con el actual la próxima vez que el usuario inicia sesión.
+
+Cada hash se calcula en un pool de hilos acotado por proceso
+(PASSWORD_HASHING_WORKERS). Las funciones de hash liberan el GIL, así que el
+proceso sigue atendiendo otras solicitudes mientras tanto; cuando el pool y su
+cola (PASSWORD_HASHING_QUEUE) están llenos, la solicitud se rechaza al momento
+con HashingBusy en lugar de esperar y acumular solicitudes. El pool solo
+limita algo si el worker atiende varias solicitudes a la vez (gthread o
+ASGI): un worker sync tiene como mucho un hash en curso.
+
+authenticate() ejecuta django.contrib.auth.authenticate() completo en el pool,
+así que respeta AUTHENTICATION_BACKENDS y sus señales. Cada tarea corre en una
+copia del contexto de la solicitud (contextvars), así que la fijación a la base
+de datos principal y los tiempos por solicitud de /metrics llegan al hilo del pool.
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import hashers
+from django.db import connections
+
+from proyecto.metrics import DURATION_BUCKETS, registry
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 con PASSWORD_PBKDF2_ITERATIONS iteraciones"""
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Argon2id con los costos de PASSWORD_ARGON2_* (requiere argon2-cffi)"""
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class HashingBusy(Exception):
+    """El pool de hash y su cola están llenos"""
+
+
+class HashingPool:
+    """Pool de hilos acotado para calcular hashes de contraseñas"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self.in_flight = 0
+
+    @staticmethod
+    def default_workers():
+        # La mitad de los CPUs deja la otra mitad a las solicitudes
+        return max(1, (os.cpu_count() or 2) // 2)
+
+    def _get_executor(self):
+        # Tras un fork los hilos del pool no existen en el proceso hijo
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    workers = settings.PASSWORD_HASHING_WORKERS or self.default_workers()
+                    self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hashing")
+                    self._slots = threading.BoundedSemaphore(workers + settings.PASSWORD_HASHING_QUEUE)
+                    self._pid = os.getpid()
+                    self.in_flight = 0
+        return self._executor
+
+    def _timed(self, func, args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            registry.observe("password_hash_duration_seconds", time.perf_counter() - started)
+
+    def _done(self, future):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def submit(self, func, *args):
+        """Encola func(*args) en el pool; lanza HashingBusy si no hay lugar"""
+        executor = self._get_executor()
+        if not self._slots.acquire(blocking=False):
+            registry.inc("password_hash_rejected_total")
+            raise HashingBusy()
+        with self._lock:
+            self.in_flight += 1
+        future = executor.submit(contextvars.copy_context().run, self._timed, func, args)
+        future.add_done_callback(self._done)
+        return future
+
+    def run(self, func, *args):
+        return self.submit(func, *args).result()
+
+    async def arun(self, func, *args):
+        return await asyncio.wrap_future(self.submit(func, *args))
+
+
+hashing_pool = HashingPool()
+
+registry.declare("password_hash_duration_seconds", "histogram", "Duración de cada hash de contraseña en el pool", DURATION_BUCKETS)
+registry.declare("password_hash_rejected_total", "counter", "Hashes rechazados porque el pool estaba lleno")
+registry.register_collector(lambda: [
+    ("password_hash_in_flight", "gauge", "Hashes en ejecución o en cola en el pool", {}, hashing_pool.in_flight),
+])
+
+
+def _authenticate(request, credentials):
+    try:
+        return auth.authenticate(request, **credentials)
+    finally:
+        # Las conexiones de los hilos del pool no las cierra el fin de la solicitud
+        for connection in connections.all(initialized_only=True):
+            connection.close_if_unusable_or_obsolete()
+
+
+def authenticate(request, **credentials):
+    """
+    django.contrib.auth.authenticate() en el pool: consulta los
+    AUTHENTICATION_BACKENDS, envía user_login_failed si ninguno acepta las
+    credenciales y regenera el hash guardado si su algoritmo o su costo ya no
+    son los configurados. Devuelve el usuario (con .backend) o None; puede
+    lanzar HashingBusy.
+    """
+    return hashing_pool.run(_authenticate, request, credentials)
+
+
+async def aauthenticate(request, **credentials):
+    """Versión asíncrona de authenticate(); espera el hash sin ocupar el bucle de eventos"""
+    return await hashing_pool.arun(_authenticate, request, credentials)
+
+
+def make_password(password):
+    """make_password() con el hash en el pool; puede lanzar HashingBusy"""
+    return hashing_pool.run(hashers.make_password, password)
+
+
+async def amake_password(password):
+    return await hashing_pool.arun(hashers.make_password, password)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Memoria del proceso actual leída de /proc.
+
+No importa Django ni tiene efectos al importarse: la usan tanto la
+configuración de gunicorn (en el proceso maestro, antes que Django) como los
+procesos de trabajos de fondo (app_1/exports.py).
+"""
+
+import os
+
+
+def memory_usage(proc="/proc/self"):
+    """
+    Memoria del proceso en bytes: {'rss', 'private', 'pss'} de smaps_rollup
+    (las páginas compartidas con el maestro cuentan en rss pero no en private),
+    o solo {'rss'} de statm en kernels antiguos. None fuera de Linux.
+    """
+    fields = {"Rss": "rss", "Pss": "pss", "Private_Clean": "private", "Private_Dirty": "private"}
+    usage = {}
+    try:
+        with open(os.path.join(proc, "smaps_rollup")) as handle:
+            for line in handle:
+                name, _sep, rest = line.partition(":")
+                if name in fields:
+                    key = fields[name]
+                    usage[key] = usage.get(key, 0) + int(rest.split()[0]) * 1024
+        if usage:
+            return usage
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(os.path.join(proc, "statm")) as handle:
+            return {"rss": int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")}
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def format_memory(usage):
+    """Memoria de memory_usage() en MB, para los registros"""
+    if usage is None:
+        return "memoria no disponible"
+    parts = [f"{label} {usage[key] / 1048576:.1f} MB"
+             for key, label in (("rss", "RSS"), ("private", "privada"), ("pss", "PSS")) if key in usage]
+    return ", ".join(parts)
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+Limitador de intentos por token bucket compartido por los workers del nodo.
+
+El estado vive en un archivo mapeado en memoria (RATELIMIT_PATH) que todos los
+workers abren con MAP_SHARED: una tabla hash de RATELIMIT_SLOTS cubetas de 24
+bytes (huella de la clave, tokens, última recarga). Cada consulta revisa como
+máximo PROBES cubetas consecutivas y las bloquea con fcntl.lockf solo en ese
+rango de bytes, así que no hay consultas a la base de datos ni servicios
+externos y los workers rara vez se esperan entre sí. Si la tabla está llena se
+reutiliza la cubeta usada hace más tiempo, que para entonces ya se habría
+recargado.
+
+Para que todos los workers compartan la tabla, RATELIMIT_PATH debe estar en un
+sistema de archivos local (mejor /dev/shm, que vive en memoria). El archivo
+real lleva en el nombre la versión del formato y el número de cubetas, así que
+cambiar RATELIMIT_SLOTS crea una tabla nueva en lugar de recortar la que otros
+procesos tienen mapeada (acceder a páginas recortadas de un mapeo produce
+SIGBUS).
+
+Sin fcntl (Windows, solo en desarrollo) se usa LocalTokenBucketTable: la misma
+tabla en la memoria del proceso, sin compartir entre workers.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache, wraps
+
+try:
+    import fcntl
+except ImportError:  # Windows: un solo proceso en desarrollo
+    fcntl = None
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+
+from proyecto.metrics import registry
+
+MAGIC = b"RLT1"
+HEADER = struct.Struct("<4sI8x")
+SLOT = struct.Struct("<Qdd")  # huella de la clave, tokens, hora de la última recarga
+# Cubetas revisadas por clave antes de reutilizar la más antigua
+PROBES = 8
+
+REJECTED_MESSAGE = "Demasiados intentos. Inténtalo de nuevo en unos minutos."
+
+registry.declare("ratelimit_rejected_total", "counter", "Solicitudes rechazadas por el limitador de intentos, por ámbito")
+
+
+@lru_cache(maxsize=None)
+def parse_rate(text):
+    """'20/60' -> (capacidad 20, 20/60 tokens por segundo)"""
+    count, _, seconds = text.partition("/")
+    capacity, period = float(count), float(seconds or 1)
+    if capacity <= 0 or period <= 0:
+        raise ValueError(f"Límite inválido '{text}'; use intentos/segundos, por ejemplo 20/60")
+    return capacity, capacity / period
+
+
+def _key_hash(key):
+    value = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+    return value or 1  # 0 marca una cubeta vacía
+
+
+class TokenBucketTable:
+    """Tabla de token buckets en un archivo mapeado en memoria"""
+
+    def __init__(self, path, slots):
+        self.slots = max(slots, PROBES)
+        self.path = f"{path}.{MAGIC.decode('ascii').lower()}-{self.slots}"
+        self._pid = None
+        self._map = None
+        self._fd = None
+        self._lock = None
+
+    def _open(self):
+        # Los bloqueos de fcntl son por proceso: cada proceso necesita su propio Lock para sus hilos
+        if self._pid == os.getpid():
+            return
+        size = HEADER.size + self.slots * SLOT.size
+        header = HEADER.pack(MAGIC, self.slots)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = self._open_table(size, header)
+        if fd is None:
+            # Un solo proceso crea la tabla; el bloqueo está en otro archivo porque la tabla se reemplaza
+            lock_fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+                fd = self._open_table(size, header)
+                if fd is None:
+                    self._create_table(size, header)
+                    fd = self._open_table(size, header)
+            finally:
+                os.close(lock_fd)
+        self._map = mmap.mmap(fd, size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        self._fd = fd
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _open_table(self, size, header):
+        """Descriptor de la tabla si existe y tiene el tamaño y la cabecera esperados, o None"""
+        try:
+            fd = os.open(self.path, os.O_RDWR)
+        except FileNotFoundError:
+            return None
+        if os.fstat(fd).st_size == size and os.pread(fd, HEADER.size, 0) == header:
+            return fd
+        os.close(fd)
+        return None
+
+    def _create_table(self, size, header):
+        # Se prepara en un archivo aparte y se publica con rename: un archivo
+        # inválido que otro proceso tenga mapeado no se recorta, se reemplaza
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(temporary, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, size)
+            os.pwrite(fd, header, 0)
+        finally:
+            os.close(fd)
+        os.replace(temporary, self.path)
+
+    def consume(self, key, capacity, rate, cost=1.0, now=None):
+        """
+        Descuenta `cost` tokens del bucket de `key`. Devuelve (permitido,
+        segundos hasta que haya tokens suficientes).
+        """
+        self._open()
+        now = time.time() if now is None else now
+        key_hash = _key_hash(key)
+        first = key_hash % (self.slots - PROBES + 1)
+        start = HEADER.size + first * SLOT.size
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, PROBES * SLOT.size, start)
+            try:
+                oldest = None
+                for index in range(PROBES):
+                    offset = start + index * SLOT.size
+                    stored_hash, tokens, stamp = SLOT.unpack_from(self._map, offset)
+                    if stored_hash == key_hash:
+                        break
+                    if stored_hash == 0:
+                        tokens, stamp = capacity, now
+                        break
+                    if oldest is None or stamp < oldest[1]:
+                        oldest = (offset, stamp)
+                else:
+                    offset, tokens, stamp = oldest[0], capacity, now
+                tokens = min(capacity, tokens + max(0.0, now - stamp) * rate)
+                allowed = tokens >= cost
+                if allowed:
+                    tokens -= cost
+                SLOT.pack_into(self._map, offset, key_hash, tokens, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, PROBES * SLOT.size, start)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+
+class LocalTokenBucketTable:
+    """Tabla de token buckets en la memoria del proceso, para sistemas sin fcntl"""
+
+    def __init__(self, slots):
+        self.slots = max(slots, PROBES)
+        self._buckets = OrderedDict()  # huella -> (tokens, hora de la última recarga)
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, rate, cost=1.0, now=None):
+        now = time.time() if now is None else now
+        key_hash = _key_hash(key)
+        with self._lock:
+            tokens, stamp = self._buckets.pop(key_hash, (capacity, now))
+            tokens = min(capacity, tokens + max(0.0, now - stamp) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key_hash] = (tokens, now)
+            if len(self._buckets) > self.slots:
+                # La usada hace más tiempo, que para entonces ya se habría recargado
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+
+_table = None
+
+
+def get_table():
+    global _table
+    if _table is None:
+        if fcntl is None:
+            _table = LocalTokenBucketTable(settings.RATELIMIT_SLOTS)
+        else:
+            _table = TokenBucketTable(settings.RATELIMIT_PATH, settings.RATELIMIT_SLOTS)
+    return _table
+
+
+def client_ip(request):
+    """IP del cliente; con RATELIMIT_IP_HEADER, la última dirección que añadió el proxy de confianza"""
+    if settings.RATELIMIT_IP_HEADER:
+        forwarded = request.META.get(settings.RATELIMIT_IP_HEADER, "")
+        addresses = [address.strip() for address in forwarded.split(",") if address.strip()]
+        if addresses:
+            return addresses[-1]
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def check(request, scope, field=None):
+    """
+    Consume un intento de la IP y, si se indica `field`, del valor de ese campo
+    del POST (usuario o correo) en `scope`. Devuelve None o los segundos que
+    hay que esperar.
+    """
+    keys = [("ip", client_ip(request))]
+    if field:
+        value = request.POST.get(field, "").strip().lower()
+        if value:
+            keys.append(("user", value))
+    table = get_table()
+    for label, value in keys:
+        rate = settings.RATELIMIT_RATES.get(f"{scope}_{label}")
+        if not rate:
+            continue
+        capacity, per_second = parse_rate(rate)
+        allowed, retry_after = table.consume(f"{scope}:{label}:{value}", capacity, per_second)
+        if not allowed:
+            registry.inc("ratelimit_rejected_total", {"scope": scope, "key": label})
+            return retry_after
+    return None
+
+
+def _rejected(retry_after):
+    response = JsonResponse({"ok": False, "errors": {"__all__": [REJECTED_MESSAGE]}}, status=429)
+    response["Retry-After"] = str(max(1, int(retry_after + 0.999)))
+    return response
+
+
+def ratelimit(scope, field=None):
+    """
+    Decorador que responde 429 con Retry-After, antes de ejecutar la vista,
+    cuando la IP o el valor de `field` agotaron sus intentos en `scope`.
+    Admite vistas síncronas y asíncronas.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if settings.RATELIMIT_ENABLED:
+                    retry_after = check(request, scope, field)
+                    if retry_after is not None:
+                        return _rejected(retry_after)
+                return await view_func(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if settings.RATELIMIT_ENABLED:
+                retry_after = check(request, scope, field)
+                if retry_after is not None:
+                    return _rejected(retry_after)
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
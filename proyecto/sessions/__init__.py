@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+"""
+Motores de sesión que evitan consultar django_session en cada solicitud.
+
+- proyecto.sessions.write_behind: la caché (SESSION_CACHE_ALIAS) atiende las
+  lecturas y las modificaciones se escriben en la base de datos en segundo
+  plano, agrupadas cada SESSION_WRITE_BEHIND_INTERVAL segundos.
+- proyecto.sessions.signed_cookies: las sesiones pequeñas viajan firmadas en
+  la cookie y las que superan SESSION_COOKIE_MAX_BYTES se guardan como en
+  write_behind.
+
+SESSION_MODE elige el motor en settings.py.
+"""
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Sesiones pequeñas firmadas en la cookie; las grandes, con escritura diferida.
+
+Si los datos firmados y comprimidos caben en SESSION_COOKIE_MAX_BYTES, la
+cookie de sesión los lleva completos y la solicitud no toca la caché ni la
+base de datos. Cuando no caben, la sesión pasa al motor write_behind y la
+cookie solo lleva la clave; si vuelve a caber, regresa a la cookie y se borra
+la copia guardada.
+
+Como en el motor signed_cookies de Django, una sesión guardada en la cookie
+no se puede invalidar en el servidor: una copia de la cookie sigue siendo
+válida hasta SESSION_COOKIE_AGE aunque el usuario cierre sesión.
+"""
+
+from django.conf import settings
+from django.core import signing
+
+from proyecto.sessions import write_behind
+
+SALT = "proyecto.sessions.signed_cookies"
+
+
+class SessionStore(write_behind.SessionStore):
+    """Sesión en la cookie mientras quepa en SESSION_COOKIE_MAX_BYTES"""
+
+    @staticmethod
+    def in_cookie(session_key):
+        # Las claves generadas son [a-z0-9]; los datos firmados siempre contienen ':'
+        return bool(session_key) and ":" in session_key
+
+    def load(self):
+        if not self.in_cookie(self.session_key):
+            return super().load()
+        try:
+            return signing.loads(
+                self.session_key, salt=SALT, serializer=self.serializer, max_age=self.get_session_cookie_age(),
+            )
+        except Exception:
+            # Firma inválida o expirada: se empieza una sesión nueva
+            self._session_key = None
+            return {}
+
+    def exists(self, session_key):
+        return not self.in_cookie(session_key) and super().exists(session_key)
+
+    def save(self, must_create=False):
+        data = self._get_session(no_load=must_create)
+        payload = signing.dumps(data, salt=SALT, serializer=self.serializer, compress=True)
+        if len(payload) > settings.SESSION_COOKIE_MAX_BYTES:
+            if self.in_cookie(self.session_key):
+                # Deja de caber en la cookie: se crea una sesión guardada con los mismos datos
+                self._session_key = None
+            return super().save(must_create)
+        previous = self.session_key
+        stored = self._stored is not None
+        self._session_key = payload
+        self.modified = True
+        if stored and previous and not self.in_cookie(previous):
+            # Volvió a caber en la cookie: la copia guardada ya no se usa
+            super().delete(previous)
+        self._stored = None
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            session_key = self.session_key
+        if self.in_cookie(session_key):
+            # No hay nada guardado; basta con que el middleware borre la cookie
+            return
+        super().delete(session_key)
+
+    async def aload(self):
+        if self.in_cookie(self.session_key):
+            return self.load()
+        return await super().aload()
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""
+Sesiones en caché con escritura diferida a la base de datos.
+
+Las lecturas se atienden desde la caché SESSION_CACHE_ALIAS y solo un fallo
+consulta django_session. Las modificaciones se escriben en la caché al momento
+y se encolan en un hilo de fondo por proceso que las agrupa y las aplica cada
+SESSION_WRITE_BEHIND_INTERVAL segundos en una sola transacción (varias
+escrituras de la misma sesión se combinan en una). Guardar una sesión cuyos
+datos no cambiaron no escribe nada, salvo para renovar una expiración que se
+quedó más de EXPIRY_REFRESH atrás.
+
+La creación (inicio de sesión) y el borrado (cierre de sesión) se escriben en
+la base de datos en el momento: una sesión nueva existe para todos los workers
+aunque la caché la pierda. El hilo de fondo solo hace UPDATE de filas
+existentes, así que una sesión cerrada no vuelve a la base de datos. En la
+caché, el borrado deja una marca durante SESSION_COOKIE_AGE: una petición que
+cargó la sesión antes del cierre y la guarda después ve la marca y retira lo
+que acaba de escribir, así que la sesión no revive en otro worker. El mismo
+hilo borra por lotes las sesiones expiradas cada SESSION_CLEANUP_INTERVAL
+segundos.
+
+La caché debe ser compartida por los workers (LocMemCache es por proceso): con
+ella, un worker puede leer de la base de datos una versión que otro worker
+todavía no ha escrito.
+"""
+
+import atexit
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.cache import caches
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from proyecto.db import purge
+
+KEY_PREFIX = "proyecto.sessions.write_behind"
+# Marca en la caché de una sesión borrada, con la clave de la sesión a continuación
+DELETED_PREFIX = KEY_PREFIX + ".deleted:"
+
+# Con los datos sin cambios, la expiración en la base de datos solo se renueva si quedó más atrás que esto
+EXPIRY_REFRESH = timedelta(seconds=60)
+
+logger = logging.getLogger(__name__)
+
+
+class SessionWriter:
+    """Hilo de fondo por proceso que aplica las escrituras encoladas y purga las sesiones expiradas"""
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._stopping = False
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.queued = 0
+        self.coalesced = 0
+        self.skipped = 0
+        self.written = 0
+        self.flushes = 0
+        self.errors = 0
+        self.expired_deleted = 0
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="session-writer", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, session_key, session_data, expire_date):
+        with self._lock:
+            if session_key in self._pending:
+                self.coalesced += 1
+            self._pending[session_key] = (session_data, expire_date)
+            self.queued += 1
+            full = len(self._pending) >= settings.SESSION_WRITE_BEHIND_MAX_PENDING
+        self.start()
+        if full:
+            self._wake.set()
+
+    def pending(self, session_key):
+        """(session_data, expire_date) encolados y aún no escritos, o None"""
+        with self._lock:
+            return self._pending.get(session_key)
+
+    def discard(self, session_key):
+        with self._lock:
+            self._pending.pop(session_key, None)
+
+    def flush(self):
+        """Escribe las sesiones encoladas en una transacción; devuelve cuántas se escribieron"""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+        model = DBStore.get_model_class()
+        using = router.db_for_write(model)
+        try:
+            with transaction.atomic(using=using):
+                for session_key, (session_data, expire_date) in batch.items():
+                    # UPDATE y no upsert: una sesión borrada por otro worker no debe revivir
+                    model.objects.using(using).filter(session_key=session_key).update(
+                        session_data=session_data, expire_date=expire_date,
+                    )
+        except Exception:
+            logger.exception("No se pudieron escribir %d sesiones; se reintentará", len(batch))
+            self.errors += 1
+            with self._lock:
+                # Lo encolado mientras tanto es más reciente y se conserva
+                for session_key, value in batch.items():
+                    self._pending.setdefault(session_key, value)
+            return 0
+        self.written += len(batch)
+        self.flushes += 1
+        return len(batch)
+
+    def clear_expired(self):
+        """Borra las sesiones expiradas en lotes cortos para no bloquear django_session"""
+        model = DBStore.get_model_class()
+        queryset = model.objects.using(router.db_for_write(model)).filter(expire_date__lt=timezone.now())
+        stats = purge.chunked_delete(queryset, chunk_size=settings.SESSION_CLEANUP_BATCH, chunk_time=0.2, sleep=0.05)
+        self.expired_deleted += stats.deleted
+        return stats.deleted
+
+    def _run(self):
+        cleanup_interval = settings.SESSION_CLEANUP_INTERVAL
+        # Cada worker empieza en un momento distinto para no purgar todos a la vez
+        next_cleanup = time.monotonic() + random.uniform(0, cleanup_interval) if cleanup_interval else None
+        while True:
+            self._wake.wait(settings.SESSION_WRITE_BEHIND_INTERVAL)
+            self._wake.clear()
+            stopping = self._stopping
+            self.flush()
+            if not stopping and next_cleanup is not None and time.monotonic() >= next_cleanup:
+                try:
+                    self.clear_expired()
+                except Exception:
+                    logger.exception("No se pudieron borrar las sesiones expiradas")
+                next_cleanup = time.monotonic() + cleanup_interval
+            for connection in connections.all(initialized_only=True):
+                connection.close_if_unusable_or_obsolete()
+            if stopping:
+                break
+
+    def stop(self):
+        """Escribe lo pendiente y detiene el hilo (se llama al salir del proceso)"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+            self._stopping = True
+        if thread is not None and thread.is_alive():
+            self._wake.set()
+            thread.join(timeout=5)
+        elif self._pending:
+            self.flush()
+
+    def after_fork(self):
+        # El hilo no sobrevive a fork y lo pendiente lo escribe el proceso padre
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._stopping = False
+
+
+writer = SessionWriter()
+
+atexit.register(writer.stop)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=writer.after_fork)
+
+
+def collect_metrics():
+    """Contadores del hilo de escritura para el registro de /metrics"""
+    yield "session_writes_queued_total", "counter", "Escrituras de sesión encoladas", {}, writer.queued
+    yield "session_writes_coalesced_total", "counter", "Escrituras combinadas con otra pendiente de la misma sesión", {}, writer.coalesced
+    yield "session_writes_skipped_total", "counter", "Guardados omitidos porque la sesión no cambió", {}, writer.skipped
+    yield "session_writes_total", "counter", "Sesiones escritas en la base de datos en segundo plano", {}, writer.written
+    yield "session_write_errors_total", "counter", "Lotes de escritura de sesiones fallidos", {}, writer.errors
+    yield "session_expired_deleted_total", "counter", "Sesiones expiradas borradas en segundo plano", {}, writer.expired_deleted
+
+
+class SessionStore(DBStore):
+    """Sesión leída desde la caché y escrita en la base de datos en segundo plano"""
+
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        self._cache = caches[settings.SESSION_CACHE_ALIAS]
+        # (huella de los datos, expiración) de lo último leído o guardado
+        self._stored = None
+        super().__init__(session_key)
+        writer.start()
+
+    def _fingerprint(self, data):
+        return hashlib.blake2b(self.serializer().dumps(data), digest_size=16).digest()
+
+    def _cache_get(self, session_key):
+        try:
+            return self._cache.get(self.cache_key_prefix + session_key)
+        except Exception:
+            # Algunos backends fallan con claves inválidas; se trata como un fallo de caché
+            return None
+
+    def _cache_set(self, session_key, data, expire_date):
+        try:
+            self._cache.set(
+                self.cache_key_prefix + session_key, (data, expire_date), self.get_expiry_age(expiry=expire_date),
+            )
+        except Exception:
+            logger.exception("No se pudo guardar la sesión en la caché (%s)", self._cache)
+
+    def _cache_discard(self, session_key):
+        try:
+            self._cache.delete(self.cache_key_prefix + session_key)
+        except Exception:
+            logger.exception("No se pudo borrar la sesión de la caché (%s)", self._cache)
+
+    def _is_deleted(self, session_key):
+        try:
+            return self._cache.get(DELETED_PREFIX + session_key) is not None
+        except Exception:
+            return False
+
+    def load(self):
+        entry = self._cache_get(self.session_key)
+        if entry is None and self._is_deleted(self.session_key):
+            # Otro worker la cerró; lo encolado aquí ya no debe escribirse
+            writer.discard(self.session_key)
+        elif entry is None:
+            pending = writer.pending(self.session_key)
+            if pending is not None:
+                entry = (self.decode(pending[0]), pending[1])
+            else:
+                session = self._get_session_from_db()
+                entry = (self.decode(session.session_data), session.expire_date) if session else None
+            if entry is not None:
+                self._cache_set(self.session_key, *entry)
+        if entry is None or entry[1] <= timezone.now():
+            self._session_key = None
+            self._stored = None
+            return {}
+        data, expire_date = entry
+        self._stored = (self._fingerprint(data), expire_date)
+        return data
+
+    def exists(self, session_key):
+        if not session_key:
+            return False
+        if self._cache_get(session_key) is not None or writer.pending(session_key) is not None:
+            return True
+        return super().exists(session_key)
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        fingerprint = self._fingerprint(data)
+        expire_date = self.get_expiry_date()
+        if not must_create and self._stored is not None:
+            stored_fingerprint, stored_expire = self._stored
+            if fingerprint == stored_fingerprint and expire_date - stored_expire < EXPIRY_REFRESH:
+                writer.skipped += 1
+                return
+        if must_create:
+            # La creación es síncrona: lanza CreateError si la clave ya existe
+            super().save(must_create=True)
+        else:
+            writer.enqueue(self.session_key, self.encode(data), expire_date)
+        self._cache_set(self.session_key, data, expire_date)
+        if not must_create and self._is_deleted(self.session_key):
+            # Se cerró mientras esta petición la usaba. delete() pone la marca antes de
+            # borrar la entrada, así que o la vemos aquí o su borrado llega después
+            writer.discard(self.session_key)
+            self._cache_discard(self.session_key)
+            self._stored = None
+            return
+        self._stored = (fingerprint, expire_date)
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            session_key = self.session_key
+        if session_key is None:
+            return
+        try:
+            self._cache.set(DELETED_PREFIX + session_key, True, settings.SESSION_COOKIE_AGE)
+        except Exception:
+            logger.exception("No se pudo marcar la sesión como borrada en la caché (%s)", self._cache)
+        writer.discard(session_key)
+        super().delete(session_key)
+        self._cache_discard(session_key)
+        if session_key == self.session_key:
+            self._stored = None
+
+    # En modo ASGI se usan las mismas rutas que en WSGI, desde un hilo síncrono
+
+    async def aload(self):
+        return await sync_to_async(self.load)()
+
+    async def aexists(self, session_key):
+        return await sync_to_async(self.exists)(session_key)
+
+    async def asave(self, must_create=False):
+        return await sync_to_async(self.save)(must_create)
+
+    async def adelete(self, session_key=None):
+        return await sync_to_async(self.delete)(session_key)
@@ -12,16 +12,19 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 # Importar os para manejar las variables de entorno
 import os
+import tempfile
 
-# Build paths inside the project like this: os.path.join(BASE_DIR, ...)
+from django.conf import global_settings
 from dotenv import load_dotenv
-from proyecto.local_settings import IS_DEPLOYED, DATABASE_DICT
-from proyecto.logging_settings import *
-from proyecto.cloud_settings import *
 
-# Carga las variables de entorno del archivo .env
+# Carga las variables de entorno del archivo .env una sola vez, antes de los
+# módulos de configuración que las leen
 load_dotenv()
 
+from proyecto.local_settings import IS_DEPLOYED, DATABASE_DICT, REPLICA_DICTS, DB_REPLICA_CHECK_INTERVAL
+from proyecto.logging_settings import *
+from proyecto.cloud_settings import *
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 # Construir rutas dentro del proyecto de esta manera: BASE_DIR / 'subdir'.
 # from pathlib import Path
@@ -49,6 +52,12 @@ HOSTING_DOMAIN = os.getenv("HOSTING_DOMAIN", "")
 # Configuración de la URL de alojamiento de la aplicación
 HOSTING_URL= os.getenv("HOSTING_URL", "")
 
+# Modo del servidor de aplicaciones: 'wsgi' (gunicorn síncrono) o 'asgi' (gunicorn con workers uvicorn)
+# En modo 'asgi' se enrutan las vistas asíncronas de app_1
+SERVER_MODE = os.getenv("SERVER_MODE", "wsgi").lower()
+if SERVER_MODE not in ("wsgi", "asgi"):
+    SERVER_MODE = "wsgi"
+
 # Configuración de los hosts permitidos
 ALLOWED_HOSTS = ['127.0.0.1', 'localhost', HOSTING_IP_PORT, HOSTING_DOMAIN]
 
@@ -67,20 +76,26 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles', # Archivos estáticos
     'django.contrib.humanize', # Humanizar números
     'whitenoise.runserver_nostatic', # Whitenoise para archivos estáticos
-    'storages', # Almacenamiento en la nube
     'app_1', # Primera Aplicación del Proyecto
 ]
 
+if IS_DEPLOYED:
+    INSTALLED_APPS.insert(-1, 'storages') # Almacenamiento en la nube (S3)
+
 # Middleware
+# Las clases de proyecto.middleware son equivalentes a las de Django pero no
+# saltan a un hilo síncrono en cada solicitud cuando se ejecuta en modo ASGI
 MIDDLEWARE = [
-    'django.middleware.security.SecurityMiddleware', # Seguridad
-    'django.contrib.sessions.middleware.SessionMiddleware', # Sesiones
-    'django.middleware.common.CommonMiddleware', # Común (Middleware)
-    'django.middleware.csrf.CsrfViewMiddleware', # Protección contra falsificación de solicitudes entre sitios (CSRF)
-    'django.contrib.auth.middleware.AuthenticationMiddleware', # Autenticación
-    'django.contrib.messages.middleware.MessageMiddleware', # Mensajes
-    'django.middleware.clickjacking.XFrameOptionsMiddleware', # Protección contra ataques de clics en el marco
-    'whitenoise.middleware.WhiteNoiseMiddleware', # Whitenoise para archivos estáticos
+    'proyecto.middleware.ServerTimingMiddleware', # Cabecera Server-Timing e histogramas de /metrics
+    'proyecto.middleware.SecurityMiddleware', # Seguridad
+    'proyecto.middleware.ReplicaPinningMiddleware', # Reinicia la fijación de lecturas a la base de datos principal
+    'proyecto.middleware.SessionMiddleware', # Sesiones
+    'proyecto.middleware.CommonMiddleware', # Común (Middleware)
+    'proyecto.middleware.CsrfViewMiddleware', # Protección contra falsificación de solicitudes entre sitios (CSRF)
+    'proyecto.middleware.AuthenticationMiddleware', # Autenticación
+    'proyecto.middleware.MessageMiddleware', # Mensajes
+    'proyecto.middleware.XFrameOptionsMiddleware', # Protección contra ataques de clics en el marco
+    'proyecto.middleware.AsyncWhiteNoiseMiddleware', # Whitenoise para archivos estáticos (compatible con ASGI)
 ]
 
 
@@ -94,7 +109,7 @@ ROOT_URLCONF = 'proyecto.urls'
 # https://docs.djangoproject.com/en/5.2/topics/templates/
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'proyecto.template_backends.DjangoTemplates', # DjangoTemplates con medición del tiempo de renderizado
         'DIRS': [os.path.join(BASE_DIR, 'proyecto/templates')], # Directorios de plantillas
         'APP_DIRS': True, # Aplicaciones de plantillas
         'OPTIONS': {
@@ -104,14 +119,83 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth', # Autenticación
                 'django.contrib.messages.context_processors.messages', # Mensajes
             ],
+            'libraries': {
+                'page_assets': 'proyecto.templatetags.page_assets', # CSS crítico y JS reducido por página
+            },
         },
     },
 ]
 
+# Métricas de rendimiento por solicitud (ver proyecto/metrics.py)
+# METRICS_DIR es compartido por los workers del nodo para que /metrics combine sus datos (fuera del repositorio)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True") == "True"
+METRICS_DIR = os.getenv("METRICS_DIR", "/dev/shm/proyecto-metrics" if os.path.isdir("/dev/shm") else os.path.join(tempfile.gettempdir(), 'proyecto-metrics'))
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+# /metrics exige la cabecera 'Authorization: Bearer <METRICS_TOKEN>'; sin token solo responde con DEBUG
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Usa el CSS crítico y los paquetes JS por página generados con build_page_assets
+PAGE_ASSETS_ENABLED = os.getenv("PAGE_ASSETS_ENABLED", "True") == "True"
+
+# Caché en memoria de las respuestas renderizadas por las vistas de app_1
+# Se invalida automáticamente al cambiar las plantillas o el manifiesto de archivos estáticos
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "True") == "True"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "128"))
+# ETag y Last-Modified de las páginas de app_1 a partir de la huella de sus plantillas y del manifiesto de estáticos
+PAGE_ETAGS_ENABLED = os.getenv("PAGE_ETAGS_ENABLED", "True") == "True"
+# Cache-Control por nombre de URL: "nombre=directivas;nombre=directivas". Con no-cache el navegador guarda
+# la página y la revalida en cada visita (304 sin cuerpo si no cambió)
+PAGE_CACHE_CONTROL = {
+    name.strip(): policy.strip()
+    for name, _sep, policy in (item.partition("=") for item in os.getenv("PAGE_CACHE_CONTROL", "page_login=no-cache;page_register=no-cache").split(";"))
+    if policy.strip()
+}
+
+# Caché de Django compartida por los workers del nodo en SQLite (ver proyecto/cache_backends.py)
+# CACHE_PATH debe estar en un disco local del nodo (mejor /dev/shm); CACHE_MAX_MB es el presupuesto de las entradas
+CACHE_PATH = os.getenv("CACHE_PATH", "/dev/shm/proyecto-cache.sqlite3" if os.path.isdir("/dev/shm") else os.path.join(tempfile.gettempdir(), 'proyecto-cache.sqlite3'))
+CACHE_MAX_MB = int(os.getenv("CACHE_MAX_MB", "64"))
+CACHE_LOCK_TIMEOUT = float(os.getenv("CACHE_LOCK_TIMEOUT", "30")) # Segundos máximos de un cálculo protegido con get_or_set
+CACHES = {
+    'default': {
+        'BACKEND': 'proyecto.cache_backends.SQLiteCache',
+        'LOCATION': CACHE_PATH,
+        'TIMEOUT': int(os.getenv("CACHE_TIMEOUT", "300")),
+        'OPTIONS': {'MAX_BYTES': CACHE_MAX_MB * 1024 * 1024, 'LOCK_TIMEOUT': CACHE_LOCK_TIMEOUT},
+    },
+}
+
+# Motor de sesiones (ver proyecto/sessions)
+# 'db': motor de Django, una consulta a django_session en cada solicitud autenticada
+# 'write_behind': lecturas desde la caché y escrituras agrupadas en segundo plano (requiere una caché compartida)
+# 'signed_cookies': sesiones pequeñas firmadas en la cookie; las grandes como en 'write_behind'
+SESSION_MODE = os.getenv("SESSION_MODE", "db").lower()
+SESSION_ENGINE = {
+    'write_behind': 'proyecto.sessions.write_behind',
+    'signed_cookies': 'proyecto.sessions.signed_cookies',
+}.get(SESSION_MODE, 'django.contrib.sessions.backends.db')
+# Segundos entre escrituras en lote y número de sesiones pendientes que adelantan la escritura
+SESSION_WRITE_BEHIND_INTERVAL = float(os.getenv("SESSION_WRITE_BEHIND_INTERVAL", "1"))
+SESSION_WRITE_BEHIND_MAX_PENDING = int(os.getenv("SESSION_WRITE_BEHIND_MAX_PENDING", "1000"))
+# Cada cuántos segundos se borran las sesiones expiradas (0 = nunca) y cuántas por lote
+SESSION_CLEANUP_INTERVAL = float(os.getenv("SESSION_CLEANUP_INTERVAL", "3600"))
+SESSION_CLEANUP_BATCH = int(os.getenv("SESSION_CLEANUP_BATCH", "1000"))
+# Tamaño máximo de una sesión guardada en la cookie en modo 'signed_cookies' (los navegadores admiten ~4096 bytes)
+SESSION_COOKIE_MAX_BYTES = int(os.getenv("SESSION_COOKIE_MAX_BYTES", "2048"))
+
+# Precompilación de plantillas al arrancar cada worker (ver proyecto/warmup.py)
+TEMPLATE_WARMUP = os.getenv("TEMPLATE_WARMUP", "True") == "True"
+# Número de plantillas más lentas que se reportan en el log de arranque
+TEMPLATE_WARMUP_REPORT = int(os.getenv("TEMPLATE_WARMUP_REPORT", "10"))
+
 # WSGI Configuration
 # Configuración de WSGI
 WSGI_APPLICATION = 'proyecto.wsgi.application'
 
+# ASGI Configuration
+# Configuración de ASGI (usada cuando SERVER_MODE es 'asgi')
+ASGI_APPLICATION = 'proyecto.asgi.application'
+
 
 # Database
 # Configuración de la base de datos
@@ -121,6 +205,18 @@ DATABASES = {
     'default': DATABASE_DICT # Base de datos por defecto
 }
 
+# Réplicas de solo lectura (replica_1, replica_2, ...) configuradas en local_settings
+# Las lecturas se reparten entre las réplicas sanas y las escrituras van a 'default'
+DATABASE_REPLICAS = []
+for index, replica_dict in enumerate(REPLICA_DICTS, start=1):
+    DATABASES[f'replica_{index}'] = replica_dict
+    DATABASE_REPLICAS.append(f'replica_{index}')
+
+# Segundos entre verificaciones de salud de cada réplica
+DATABASE_REPLICA_CHECK_INTERVAL = DB_REPLICA_CHECK_INTERVAL
+
+DATABASE_ROUTERS = ['proyecto.db.routers.PrimaryReplicaRouter'] if DATABASE_REPLICAS else []
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -140,6 +236,46 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# Hash de contraseñas (ver proyecto/passwords.py)
+# El primer hasher es el que se usa para las contraseñas nuevas; los demás solo verifican
+# hashes existentes, que se regeneran con el primero al iniciar sesión. Después de los dos
+# configurables van el resto de los hashers por defecto de Django (bcrypt, scrypt, ...)
+PASSWORD_HASHER = os.getenv("PASSWORD_HASHER", "pbkdf2").lower() # 'pbkdf2' o 'argon2' (requiere argon2-cffi)
+PASSWORD_HASHERS = [
+    'proyecto.passwords.PBKDF2PasswordHasher',
+    'proyecto.passwords.Argon2PasswordHasher',
+    *(
+        hasher for hasher in global_settings.PASSWORD_HASHERS
+        if hasher.rsplit('.', 1)[1] not in ('PBKDF2PasswordHasher', 'Argon2PasswordHasher')
+    ),
+]
+if PASSWORD_HASHER == 'argon2':
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop(1))
+# Costo de cada hasher; cambiarlo actualiza los hashes guardados en el siguiente inicio de sesión
+PASSWORD_PBKDF2_ITERATIONS = int(os.getenv("PASSWORD_PBKDF2_ITERATIONS", "1000000")) # Valor por defecto de Django 5.2
+PASSWORD_ARGON2_TIME_COST = int(os.getenv("PASSWORD_ARGON2_TIME_COST", "2"))
+PASSWORD_ARGON2_MEMORY_COST = int(os.getenv("PASSWORD_ARGON2_MEMORY_COST", "102400")) # KiB
+PASSWORD_ARGON2_PARALLELISM = int(os.getenv("PASSWORD_ARGON2_PARALLELISM", "8"))
+# Hilos del pool de hash por proceso (0 = la mitad de los CPUs) y solicitudes que pueden esperar en su cola
+PASSWORD_HASHING_WORKERS = int(os.getenv("PASSWORD_HASHING_WORKERS", "0"))
+PASSWORD_HASHING_QUEUE = int(os.getenv("PASSWORD_HASHING_QUEUE", "16"))
+
+# Limitador de intentos de login y registro por IP y por usuario (ver proyecto/ratelimit.py)
+# La tabla se comparte entre los workers del nodo a través de un archivo mapeado en memoria
+RATELIMIT_ENABLED = os.getenv("RATELIMIT_ENABLED", "True") == "True"
+RATELIMIT_PATH = os.getenv("RATELIMIT_PATH", "/dev/shm/proyecto-ratelimit" if os.path.isdir("/dev/shm") else os.path.join(BASE_DIR, 'tmp', 'ratelimit'))
+RATELIMIT_SLOTS = int(os.getenv("RATELIMIT_SLOTS", "65536")) # 24 bytes por cubeta
+# Intentos/segundos de cada bucket: la capacidad es la ráfaga admitida y se recarga en ese periodo
+RATELIMIT_RATES = {
+    'login_ip': os.getenv("RATELIMIT_LOGIN_IP", "30/60"),
+    'login_user': os.getenv("RATELIMIT_LOGIN_USER", "10/60"),
+    'register_ip': os.getenv("RATELIMIT_REGISTER_IP", "5/300"),
+    'register_user': os.getenv("RATELIMIT_REGISTER_USER", "3/300"),
+}
+# Cabecera con la IP del cliente detrás de un proxy (por ejemplo HTTP_X_FORWARDED_FOR); vacía = REMOTE_ADDR
+RATELIMIT_IP_HEADER = os.getenv("RATELIMIT_IP_HEADER", "")
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -168,7 +304,21 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Número de procesos para calcular hashes y comprimir en collectstatic (0 = número de CPUs)
+STATICFILES_WORKERS = int(os.getenv("STATICFILES_WORKERS", "0"))
+# Caché de hashes y compresiones que permite a collectstatic procesar solo los archivos modificados
+STATICFILES_CACHE_PATH = os.getenv("STATICFILES_CACHE_PATH", os.path.join(BASE_DIR, 'tmp', 'staticfiles-cache.json'))
+# Si es 'True', las referencias de CSS/JS a archivos inexistentes se dejan sin hash y se listan al final de
+# collectstatic en lugar de abortarlo como hace Django (los CSS de terceros de proyecto/static las tienen)
+STATICFILES_IGNORE_MISSING = os.getenv("STATICFILES_IGNORE_MISSING", "False") == "True"
+# Recompresión de PNG/JPEG y variantes AVIF/WebP de las imágenes en collectstatic (ver proyecto/images.py)
+# El navegador recibe la variante que declara en Accept; AVIF se omite si Pillow no lo soporta
+STATIC_IMAGE_OPTIMIZATION = os.getenv("STATIC_IMAGE_OPTIMIZATION", "True") == "True"
+STATIC_IMAGE_FORMATS = [name.strip().lower() for name in os.getenv("STATIC_IMAGE_FORMATS", "avif,webp").split(",")]
+STATIC_IMAGE_QUALITY = int(os.getenv("STATIC_IMAGE_QUALITY", "80")) # Calidad de las variantes con pérdida
+
+# Huellas del último arranque de 'manage.py boot' (estáticos y migraciones) y sus tiempos por fase
+BOOT_STATE_PATH = os.getenv("BOOT_STATE_PATH", os.path.join(BASE_DIR, 'tmp', 'boot-state.json'))
 
 STATIC_URL = '/staticfiles/' if IS_DEPLOYED else '/static/'
 
@@ -178,6 +328,7 @@ STATICFILES_DIRS = [
 ]
 
 LOGIN_URL = '/signin'
+LOGIN_REDIRECT_URL = '/' # Destino tras iniciar sesión o registrarse cuando no se indica 'next'
 
 """
 # Configuración para almacenar archivos estáticos en S3
@@ -196,8 +347,63 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 if not IS_DEPLOYED:
     MEDIA_URL = '/media/'
 else:
-    DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
     MEDIA_URL = f'https://{AWS_S3_CUSTOM_DOMAIN}/'
+
+# Subidas multiparte a S3: los archivos mayores que el umbral se envían en partes, varias a la vez
+# proyecto.storage_backends.S3Storage arma el TransferConfig al crear el almacenamiento, así que
+# settings no importa boto3
+MEDIA_MULTIPART_THRESHOLD_MB = int(os.getenv("MEDIA_MULTIPART_THRESHOLD_MB", "8"))
+MEDIA_MULTIPART_CHUNK_MB = int(os.getenv("MEDIA_MULTIPART_CHUNK_MB", "8"))
+MEDIA_MULTIPART_CONCURRENCY = int(os.getenv("MEDIA_MULTIPART_CONCURRENCY", "4"))
+
+# Backends de almacenamiento (desde Django 5.1 reemplaza a STATICFILES_STORAGE y DEFAULT_FILE_STORAGE)
+STORAGES = {
+    # Archivos multimedia: sistema de archivos en desarrollo, S3 en producción
+    "default": {
+        "BACKEND": "proyecto.storage_backends.S3Storage" if IS_DEPLOYED else "django.core.files.storage.FileSystemStorage",
+    },
+    # Exportaciones de reportes (ver app_1/exports.py): privadas, se descargan a través de la aplicación
+    "exports": {
+        "BACKEND": "proyecto.storage_backends.S3Storage",
+        "OPTIONS": {"location": "exports", "default_acl": "private", "querystring_auth": True, "querystring_expire": 600},
+    } if IS_DEPLOYED else {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"location": os.path.join(BASE_DIR, 'tmp', 'exports')},
+    },
+    # Estáticos con hash, comprimidos y procesados de forma incremental (ver proyecto/staticfiles.py)
+    "staticfiles": {
+        "BACKEND": "proyecto.staticfiles.IncrementalManifestStaticFilesStorage",
+    },
+}
     
 # Se define el nombre de la carpeta de archivos públicos para almacenar las imágenes de las caratulas de los libros
 PUBLIC_MEDIA = 'publico'
+
+# Procesamiento de carátulas en segundo plano (ver proyecto/covers.py)
+# Lado mayor de cada miniatura en píxeles y formatos generados para cada tamaño ('webp', 'jpeg')
+COVER_SIZES = [int(size) for size in os.getenv("COVER_SIZES", "1200,600,300,150").split(",")]
+COVER_FORMATS = [name.strip().lower() for name in os.getenv("COVER_FORMATS", "webp,jpeg").split(",")]
+COVER_QUALITY = {
+    'webp': int(os.getenv("COVER_WEBP_QUALITY", "80")),
+    'jpeg': int(os.getenv("COVER_JPEG_QUALITY", "85")),
+}
+# Procesos del pool por worker de gunicorn (0 = la mitad de los CPUs en cada uno) y trabajos pendientes admitidos por worker
+COVER_WORKERS = int(os.getenv("COVER_WORKERS", "1"))
+COVER_QUEUE = int(os.getenv("COVER_QUEUE", "32"))
+COVER_MAX_UPLOAD_MB = int(os.getenv("COVER_MAX_UPLOAD_MB", "20"))
+COVER_MAX_PIXELS = int(os.getenv("COVER_MAX_PIXELS", "40000000"))
+# Originales pendientes de procesar y estado de cada trabajo; debe ser local al nodo
+COVER_SPOOL_DIR = os.getenv("COVER_SPOOL_DIR", os.path.join(BASE_DIR, 'tmp', 'covers'))
+COVER_RETENTION_HOURS = int(os.getenv("COVER_RETENTION_HOURS", "24")) # Horas que se conserva el estado de cada trabajo
+
+# Exportaciones de reportes a XLSX y PDF en segundo plano (ver app_1/exports.py)
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "1")) # Procesos del pool por worker (0 = la mitad de los CPUs)
+EXPORT_QUEUE = int(os.getenv("EXPORT_QUEUE", "4")) # Exportaciones pendientes admitidas por worker
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000")) # Filas leídas de la base de datos por bloque
+EXPORT_PDF_MAX_ROWS = int(os.getenv("EXPORT_PDF_MAX_ROWS", "50000")) # ReportLab retiene cada página hasta guardar el PDF (~0,7 MB por 1000 filas)
+EXPORT_RETENTION_HOURS = int(os.getenv("EXPORT_RETENTION_HOURS", "24")) # Horas que se conservan los archivos generados
+EXPORT_SPOOL_DIR = os.getenv("EXPORT_SPOOL_DIR", os.path.join(BASE_DIR, 'tmp', 'exports-spool')) # Estado y archivos en curso; local al nodo
+
+# Listas del admin para tablas grandes (ver LargeTableAdmin en app_1/admin.py)
+ADMIN_ESTIMATED_COUNT_MIN = int(os.getenv("ADMIN_ESTIMATED_COUNT_MIN", "100000")) # Filas a partir de las que el total sin filtros sale de las estadísticas del motor
+ADMIN_COUNT_LIMIT = int(os.getenv("ADMIN_COUNT_LIMIT", "10000")) # Filas máximas contadas con filtros o búsqueda (0 = sin límite)
@@ -0,0 +1,298 @@
+/* Generado por build_page_assets a partir de app_1/page_register.html; no editar */
+/* proyecto/js/auth_common.js */
+/**
+ * Funciones comunes de las páginas de autenticación (login y registro)
+ *
+ * Se carga desde auth_base.html antes del script de cada página.
+ */
+
+'use strict';
+
+/**
+ * Envío AJAX del formulario
+ * El HTML de la página está cacheado y no lleva token CSRF, así que se envía
+ * el de la cookie 'csrftoken' en la cabecera X-CSRFToken
+ */
+function getCookie(name) {
+    let match = document.cookie.match(new RegExp('(?:^|;\\s*)' + name + '=([^;]*)'));
+    return match ? decodeURIComponent(match[1]) : '';
+}
+
+function showErrors(form, errors) {
+    let alertBox = form.querySelector('.js-form-error');
+    form.querySelectorAll('.is-invalid').forEach(function(input) {
+        input.classList.remove('is-invalid');
+    });
+    Object.keys(errors).forEach(function(field) {
+        let input = form.querySelector('[name="' + field + '"]');
+        if (input) {
+            input.classList.add('is-invalid');
+            let feedback = input.parentNode.querySelector('.invalid-feedback');
+            if (feedback) {
+                feedback.textContent = errors[field].join(' ');
+            }
+        }
+    });
+    let messages = errors.__all__ || [];
+    if (messages.length && !alertBox) {
+        alertBox = document.createElement('div');
+        alertBox.className = 'alert alert-danger js-form-error';
+        alertBox.setAttribute('role', 'alert');
+        form.insertBefore(alertBox, form.firstChild);
+    }
+    if (alertBox) {
+        alertBox.textContent = messages.join(' ');
+        alertBox.hidden = !messages.length;
+    }
+}
+
+function submitForm(form, button) {
+    button.disabled = true;
+    fetch(form.action, {
+        method: 'POST',
+        body: new FormData(form),
+        credentials: 'same-origin',
+        headers: {'X-CSRFToken': getCookie('csrftoken'), 'X-Requested-With': 'XMLHttpRequest'}
+    }).then(function(response) {
+        return response.json();
+    }).then(function(data) {
+        if (data.ok) {
+            window.location.href = data.redirect;
+            return;
+        }
+        form.classList.remove('was-validated');
+        showErrors(form, data.errors || {});
+        button.disabled = false;
+    }).catch(function() {
+        showErrors(form, {__all__: ['No se pudo conectar con el servidor. Inténtalo de nuevo.']});
+        button.disabled = false;
+    });
+}
+
+;
+/* app_1/js/page_register.js */
+/**
+ * Script para la página de registro
+ *
+ * Este script maneja:
+ * - Configuración de tema desde localStorage
+ * - Validación del formulario de registro
+ * - Envío AJAX del formulario (submitForm, de proyecto/js/auth_common.js)
+ */
+
+'use strict';
+
+/**
+ * Configuración de tema y preferencias
+ * Este script se ejecuta inmediatamente para cargar el tema antes del render
+ */
+(function initializeThemeSettings() {
+    let classHolder = document.getElementsByTagName("BODY")[0];
+
+    /**
+     * Cargar desde localStorage
+     */
+    let themeSettings = (localStorage.getItem('themeSettings')) ? JSON.parse(localStorage.getItem('themeSettings')) : {};
+    let themeURL = themeSettings.themeURL || '';
+    let themeOptions = themeSettings.themeOptions || '';
+
+    /**
+     * Cargar opciones de tema
+     */
+    if (themeSettings.themeOptions) {
+        classHolder.className = themeSettings.themeOptions;
+        console.log("%c✔ Configuración de tema cargada", "color: #148f32");
+    } else {
+        console.log("%c✔ ¡Atención! La configuración del tema está vacía o no existe, cargando configuración predeterminada...", "color: #ed1c24");
+    }
+
+    if (themeSettings.themeURL && !document.getElementById('mytheme')) {
+        let cssfile = document.createElement('link');
+        cssfile.id = 'mytheme';
+        cssfile.rel = 'stylesheet';
+        cssfile.href = themeURL;
+        document.getElementsByTagName('head')[0].appendChild(cssfile);
+    } else if (themeSettings.themeURL && document.getElementById('mytheme')) {
+        document.getElementById('mytheme').href = themeSettings.themeURL;
+    }
+
+    /**
+     * Guardar configuración en localStorage
+     */
+    window.saveSettings = function() {
+        themeSettings.themeOptions = String(classHolder.className).split(/[^\w-]+/).filter(function(item) {
+            return /^(nav|header|footer|mod|display)-/i.test(item);
+        }).join(' ');
+
+        if (document.getElementById('mytheme')) {
+            themeSettings.themeURL = document.getElementById('mytheme').getAttribute("href");
+        }
+
+        localStorage.setItem('themeSettings', JSON.stringify(themeSettings));
+    };
+
+    /**
+     * Resetear configuración
+     */
+    window.resetSettings = function() {
+        localStorage.setItem("themeSettings", "");
+    };
+})();
+
+/**
+ * Validación del formulario de registro
+ * Se ejecuta cuando el DOM está completamente cargado
+ */
+document.addEventListener('DOMContentLoaded', function() {
+    const registerBtn = document.getElementById("js-register-btn");
+
+    if (registerBtn) {
+        registerBtn.addEventListener("click", function(event) {
+            // Obtener el formulario para aplicar validación de Bootstrap
+            let form = document.getElementById("js-register");
+
+            event.preventDefault();
+            if (form && form.checkValidity() === false) {
+                event.stopPropagation();
+            } else if (form) {
+                submitForm(form, registerBtn);
+            }
+
+            if (form) {
+                form.classList.add('was-validated');
+            }
+        });
+    }
+});
+
+;
+/* proyecto/js/miscellaneous/preferences/theme-toggle.js */
+/**
+ * Theme Toggle Script
+ *
+ * Script para cambiar entre modo por defecto, claro y oscuro en las páginas de autenticación.
+ * Proporciona un botón interactivo que cicla entre los tres temas y guarda la preferencia del usuario.
+ *
+ * Modos disponibles:
+ * - Default: Sin clases de tema (usa los estilos por defecto de SmartAdmin)
+ * - Light: Clase 'mod-skin-light' aplicada
+ * - Dark: Clase 'mod-skin-dark' aplicada
+ *
+ * Requisitos:
+ * - Elemento con id "theme-toggle" para el botón de cambio
+ * - Elemento con id "theme-icon" para el icono del botón
+ * - theme-loader.js debe estar cargado para la función saveSettings
+ *
+ * @author Proyecto Django
+ * @version 1.1.0
+ */
+'use strict';
+
+document.addEventListener('DOMContentLoaded', function() {
+    const themeToggle = document.getElementById('theme-toggle');
+    const themeIcon = document.getElementById('theme-icon');
+    const body = document.getElementsByTagName('BODY')[0];
+
+    // Verificar que los elementos existan
+    if (!themeToggle || !themeIcon) {
+        console.warn('⚠️ Elementos de cambio de tema no encontrados. Asegúrate de que existan elementos con id "theme-toggle" y "theme-icon".');
+        return;
+    }
+
+    /**
+     * Obtiene el tema actual
+     * @returns {string} 'default', 'light' o 'dark'
+     */
+    function getCurrentTheme() {
+        if (body.classList.contains('mod-skin-dark')) {
+            return 'dark';
+        } else if (body.classList.contains('mod-skin-light')) {
+            return 'light';
+        } else {
+            return 'default';
+        }
+    }
+
+    /**
+     * Actualiza el icono según el tema actual
+     */
+    function updateThemeIcon() {
+        const currentTheme = getCurrentTheme();
+
+        switch(currentTheme) {
+            case 'dark':
+                themeIcon.className = 'fal fa-adjust';
+                themeToggle.title = 'Cambiar a modo por defecto';
+                console.log('%c🌙 Modo oscuro activo', 'color: #a8c7fa');
+                break;
+            case 'light':
+                themeIcon.className = 'fal fa-moon';
+                themeToggle.title = 'Cambiar a modo oscuro';
+                console.log('%c☀️ Modo claro activo', 'color: #0d6efd');
+                break;
+            case 'default':
+            default:
+                themeIcon.className = 'fal fa-sun';
+                themeToggle.title = 'Cambiar a modo claro';
+                console.log('%c🎨 Modo por defecto activo', 'color: #39a900');
+                break;
+        }
+    }
+
+    /**
+     * Cicla entre los tres modos de tema: default → light → dark → default
+     */
+    function toggleTheme() {
+        const currentTheme = getCurrentTheme();
+
+        // Remover todas las clases de tema
+        body.classList.remove('mod-skin-dark', 'mod-skin-light');
+
+        // Aplicar el siguiente tema en el ciclo
+        switch(currentTheme) {
+            case 'default':
+                // Default → Light
+                body.classList.add('mod-skin-light');
+                break;
+            case 'light':
+                // Light → Dark
+                body.classList.add('mod-skin-dark');
+                break;
+            case 'dark':
+                // Dark → Default (sin clases)
+                break;
+        }
+
+        // Actualizar icono
+        updateThemeIcon();
+
+        // Guardar configuración si la función existe
+        if (typeof window.saveSettings === 'function') {
+            window.saveSettings();
+            console.log('%c✔ Preferencia de tema guardada', 'color: #198754');
+        } else {
+            console.warn('⚠️ Función saveSettings no disponible. La preferencia no se guardará.');
+        }
+    }
+
+    // Inicializar icono según el tema actual
+    updateThemeIcon();
+
+    // Evento click para cambiar tema
+    themeToggle.addEventListener('click', function(e) {
+        e.preventDefault();
+        toggleTheme();
+    });
+
+    // Atajo de teclado opcional (Ctrl/Cmd + K)
+    document.addEventListener('keydown', function(e) {
+        if ((e.ctrlKey || e.metaKey) && e.key === 'k') {
+            e.preventDefault();
+            toggleTheme();
+        }
+    });
+
+    console.log('%c🎨 Sistema de cambio de tema inicializado correctamente', 'color: #0dcaf0; font-weight: bold');
+    console.log('%cAtajo de teclado: Ctrl/Cmd + K para cambiar tema', 'color: #6c757d; font-style: italic');
+});
+
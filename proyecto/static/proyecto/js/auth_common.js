@@ -0,0 +1,68 @@
+/**
+ * Funciones comunes de las páginas de autenticación (login y registro)
+ *
+ * Se carga desde auth_base.html antes del script de cada página.
+ */
+
+'use strict';
+
+/**
+ * Envío AJAX del formulario
+ * El HTML de la página está cacheado y no lleva token CSRF, así que se envía
+ * el de la cookie 'csrftoken' en la cabecera X-CSRFToken
+ */
+function getCookie(name) {
+    let match = document.cookie.match(new RegExp('(?:^|;\\s*)' + name + '=([^;]*)'));
+    return match ? decodeURIComponent(match[1]) : '';
+}
+
+function showErrors(form, errors) {
+    let alertBox = form.querySelector('.js-form-error');
+    form.querySelectorAll('.is-invalid').forEach(function(input) {
+        input.classList.remove('is-invalid');
+    });
+    Object.keys(errors).forEach(function(field) {
+        let input = form.querySelector('[name="' + field + '"]');
+        if (input) {
+            input.classList.add('is-invalid');
+            let feedback = input.parentNode.querySelector('.invalid-feedback');
+            if (feedback) {
+                feedback.textContent = errors[field].join(' ');
+            }
+        }
+    });
+    let messages = errors.__all__ || [];
+    if (messages.length && !alertBox) {
+        alertBox = document.createElement('div');
+        alertBox.className = 'alert alert-danger js-form-error';
+        alertBox.setAttribute('role', 'alert');
+        form.insertBefore(alertBox, form.firstChild);
+    }
+    if (alertBox) {
+        alertBox.textContent = messages.join(' ');
+        alertBox.hidden = !messages.length;
+    }
+}
+
+function submitForm(form, button) {
+    button.disabled = true;
+    fetch(form.action, {
+        method: 'POST',
+        body: new FormData(form),
+        credentials: 'same-origin',
+        headers: {'X-CSRFToken': getCookie('csrftoken'), 'X-Requested-With': 'XMLHttpRequest'}
+    }).then(function(response) {
+        return response.json();
+    }).then(function(data) {
+        if (data.ok) {
+            window.location.href = data.redirect;
+            return;
+        }
+        form.classList.remove('was-validated');
+        showErrors(form, data.errors || {});
+        button.disabled = false;
+    }).catch(function() {
+        showErrors(form, {__all__: ['No se pudo conectar con el servidor. Inténtalo de nuevo.']});
+        button.disabled = false;
+    });
+}
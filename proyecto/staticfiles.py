@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+Almacenamiento de archivos estáticos con procesamiento incremental.
+
+IncrementalManifestStaticFilesStorage se comporta igual que
+whitenoise.storage.CompressedManifestStaticFilesStorage (nombres con hash,
+manifiesto y copias .gz/.br, y falla si un CSS o JS referencia un archivo que
+no existe salvo con STATICFILES_IGNORE_MISSING), pero guarda en STATICFILES_CACHE_PATH el hash de
+cada archivo fuente y el resultado de cada compresión. En el siguiente
+collectstatic solo se vuelven a leer y comprimir los archivos que cambiaron, y
+el trabajo pendiente se reparte en un pool de STATICFILES_WORKERS procesos.
+
+Con STATIC_IMAGE_OPTIMIZATION, las imágenes con hash además se recomprimen y
+reciben variantes AVIF/WebP (ver proyecto/images.py), también con caché.
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from whitenoise.compress import Compressor, brotli_installed
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+from proyecto import images
+
+# Versión del formato del archivo de caché; cambiarla invalida las cachés existentes
+CACHE_VERSION = 1
+
+_compressors = {}
+
+
+def _md5_file(path):
+    md5 = hashlib.md5(usedforsecurity=False)
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def _compress_file(path, extensions):
+    """Comprime un archivo en el proceso del pool y devuelve las rutas generadas"""
+    key = tuple(extensions) if extensions is not None else None
+    compressor = _compressors.get(key)
+    if compressor is None:
+        compressor = _compressors[key] = Compressor(extensions=extensions, quiet=True)
+    return list(compressor.compress(path))
+
+
+class IncrementalManifestStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    CompressedManifestStaticFilesStorage con caché de hashes y compresión en
+    paralelo. `timings` y `counts` quedan disponibles tras post_process para
+    que el comando collectstatic_incremental muestre el desglose.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.workers = settings.STATICFILES_WORKERS or os.cpu_count() or 1
+        self.cache_path = settings.STATICFILES_CACHE_PATH
+        self.timings = {}
+        self.counts = {}
+        self.missing_references = set()
+        self.image_bytes = {}
+        self._cache = None
+        self._executor = None
+
+    # Caché persistente
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, encoding="utf-8") as handle:
+                cache = json.load(handle)
+        except (OSError, ValueError):
+            cache = None
+        if not isinstance(cache, dict) or cache.get("version") != CACHE_VERSION:
+            cache = {"version": CACHE_VERSION, "brotli": brotli_installed, "hashes": {}, "compressed": {}, "images": {}}
+        if cache.get("brotli") != brotli_installed:
+            # Las compresiones previas no incluyen (o incluyen de más) las copias .br
+            cache["compressed"] = {}
+        cache.setdefault("images", {})
+        # Lo que no se use en esta ejecución se descarta al guardar
+        self._cache = cache
+        self._seen = {"hashes": {}, "compressed": {}, "images": {}}
+
+    def _save_cache(self):
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.cache_path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as handle:
+            json.dump({"version": CACHE_VERSION, "brotli": brotli_installed, **self._seen}, handle)
+        os.replace(temporary, self.cache_path)
+
+    def _map(self, func, *iterables):
+        if self._executor is None:
+            return map(func, *iterables)
+        return self._executor.map(func, *iterables, chunksize=4)
+
+    # Hash de los archivos fuente
+
+    def _prehash(self, paths):
+        """Calcula en el pool el md5 de los archivos fuente que cambiaron desde la última ejecución"""
+        hashes = self._cache["hashes"]
+        pending = []
+        for storage, path in paths.values():
+            try:
+                source = storage.path(path)
+                stat = os.stat(source)
+            except (NotImplementedError, OSError):
+                continue
+            cached = hashes.get(source)
+            if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+                self._seen["hashes"][source] = cached
+            else:
+                pending.append((source, [stat.st_size, stat.st_mtime_ns]))
+        self.counts["hashed"] = len(pending)
+        self.counts["hash_cached"] = len(self._seen["hashes"])
+        for (source, fingerprint), digest in zip(pending, self._map(_md5_file, [source for source, _ in pending])):
+            self._seen["hashes"][source] = fingerprint + [digest]
+
+    def file_hash(self, name, content=None):
+        # Los archivos fuente se abren desde su ruta real; el contenido ya
+        # reescrito de CSS/JS llega como ContentFile y se calcula normalmente
+        source = getattr(content, "name", None)
+        if self._cache is not None and isinstance(source, str):
+            cached = self._seen["hashes"].get(source)
+            if cached is not None:
+                return cached[2][:12]
+        return super().file_hash(name, content)
+
+    def hashed_name(self, name, content=None, filename=None):
+        try:
+            return super().hashed_name(name, content, filename)
+        except ValueError:
+            if self._cache is None or not settings.STATICFILES_IGNORE_MISSING:
+                raise
+            # Los CSS de terceros (lightgallery, fuentes antiguas) apuntan a archivos que
+            # no se distribuyen; con STATICFILES_IGNORE_MISSING la referencia se deja sin hash
+            self.missing_references.add(self.clean_name(filename or name))
+            return name
+
+    # Procesamiento
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            yield from super().post_process(paths, dry_run=dry_run, **options)
+            return
+        self.timings = {}
+        self.counts = {}
+        self.missing_references = set()
+        self.image_bytes = {}
+        self._load_cache()
+        self._executor = ProcessPoolExecutor(self.workers) if self.workers > 1 else None
+        try:
+            start = time.perf_counter()
+            self._prehash(paths)
+            self.timings["prehash"] = time.perf_counter() - start
+            yield from super().post_process(paths, dry_run=dry_run, **options)
+            self._save_cache()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+            self._executor = None
+            self._cache = None
+
+    def post_process_with_compression(self, files):
+        def timed(iterator):
+            # Solo cuenta el tiempo dentro del generador de ManifestStaticFilesStorage
+            elapsed = 0.0
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield item
+            self.timings["hash"] = elapsed - self.timings.get("manifest", 0.0)
+
+        yield from super().post_process_with_compression(timed(iter(files)))
+
+    def save_manifest(self):
+        start = time.perf_counter()
+        super().save_manifest()
+        self.timings["manifest"] = time.perf_counter() - start
+
+    def compress_files(self, paths):
+        if settings.STATIC_IMAGE_OPTIMIZATION:
+            # Las imágenes no se comprimen con gzip/brotli; se optimizan antes y sus
+            # variantes quedan fuera de la compresión
+            yield from self.optimize_images(paths)
+        start = time.perf_counter()
+        extensions = getattr(settings, "WHITENOISE_SKIP_COMPRESS_EXTENSIONS", None)
+        self.compressor = self.create_compressor(extensions=extensions, quiet=True)
+        compressed = self._cache["compressed"]
+        pending = []
+        skipped = 0
+        for path in paths:
+            if not self.compressor.should_compress(path):
+                continue
+            full_path = self.path(path)
+            cached = compressed.get(path)
+            fingerprint = self._fingerprint(full_path, cached)
+            # Se compara el md5: los CSS/JS reescritos se guardan de nuevo aunque no cambien
+            if (cached and cached[2] == fingerprint[2]
+                    and all(os.path.exists(full_path + suffix) for suffix in cached[3])):
+                self._seen["compressed"][path] = fingerprint + [cached[3]]
+                skipped += 1
+                for suffix in cached[3]:
+                    yield path, path + suffix
+            else:
+                pending.append((path, full_path, fingerprint))
+        full_paths = [full_path for _path, full_path, _fingerprint in pending]
+        for (path, full_path, fingerprint), outputs in zip(pending, self._map(_compress_file, full_paths, [extensions] * len(full_paths))):
+            suffixes = [output[len(full_path):] for output in outputs]
+            self._seen["compressed"][path] = fingerprint + [suffixes]
+            for suffix in suffixes:
+                yield path, path + suffix
+        self.counts["compressed"] = len(pending)
+        self.counts["compress_cached"] = skipped
+        self.timings["compress"] = time.perf_counter() - start
+
+    def _fingerprint(self, full_path, cached):
+        """[tamaño, mtime_ns, md5] del archivo; evita leerlo si coinciden tamaño y fecha"""
+        stat = os.stat(full_path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[:3]
+        return [stat.st_size, stat.st_mtime_ns, _md5_file(full_path)]
+
+    def optimize_images(self, paths):
+        """
+        Recomprime las imágenes con hash (las que enlaza {% static %}) y genera
+        sus variantes. Solo procesa las que cambiaron desde la ejecución
+        anterior o cuyas variantes faltan; deja en `image_bytes` el total de
+        bytes antes, después y sirviendo la variante más pequeña.
+        """
+        start = time.perf_counter()
+        suffixes = images.available_formats(settings.STATIC_IMAGE_FORMATS)
+        options = [suffixes, settings.STATIC_IMAGE_QUALITY]
+        hashed = set(self.hashed_files.values())
+        cached_images = self._cache["images"]
+        totals = {"before": 0, "after": 0, "best": 0}
+        pending = []
+        skipped = 0
+        for path in sorted(paths):
+            if path not in hashed or not images.is_source_image(path):
+                continue
+            full_path = self.path(path)
+            cached = cached_images.get(path)
+            stat = os.stat(full_path)
+            if (cached and cached[:3] == [stat.st_size, stat.st_mtime_ns, options]
+                    and all(os.path.exists(full_path + suffix) for suffix in cached[3])):
+                self._seen["images"][path] = cached
+                skipped += 1
+                yield from self._record_image(path, cached[3:], totals)
+            else:
+                pending.append((path, full_path))
+        full_paths = [full_path for _path, full_path in pending]
+        outputs = self._map(images.optimize_image, full_paths, [suffixes] * len(full_paths), [options[1]] * len(full_paths))
+        for (path, full_path), result in zip(pending, outputs):
+            stat = os.stat(full_path)
+            self._seen["images"][path] = [stat.st_size, stat.st_mtime_ns, options, *result]
+            yield from self._record_image(path, result, totals)
+        self.counts["images"] = len(pending)
+        self.counts["images_cached"] = skipped
+        self.image_bytes = totals
+        self.timings["images"] = time.perf_counter() - start
+
+    @staticmethod
+    def _record_image(path, result, totals):
+        written, before, after, best = result
+        totals["before"] += before
+        totals["after"] += after
+        totals["best"] += best
+        for suffix in written:
+            yield path, path + suffix
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""
+Backends de almacenamiento de archivos.
+
+S3Storage es el S3Boto3Storage que STORAGES usa cuando IS_DEPLOYED, con
+subidas multiparte según MEDIA_MULTIPART_*. Django importa el backend la
+primera vez que se pide el almacenamiento (storages["default"]), así que
+boto3 y botocore solo se cargan en los procesos que de verdad usan S3 y no en
+settings.py, manage.py ni las pruebas.
+"""
+
+from boto3.s3.transfer import TransferConfig
+from django.conf import settings
+from storages.backends.s3boto3 import S3Boto3Storage
+
+
+class S3Storage(S3Boto3Storage):
+    """S3Boto3Storage con subidas multiparte configuradas en settings"""
+
+    def get_default_settings(self):
+        defaults = super().get_default_settings()
+        if defaults["transfer_config"] is None:
+            defaults["transfer_config"] = TransferConfig(
+                multipart_threshold=settings.MEDIA_MULTIPART_THRESHOLD_MB * 1024 * 1024,
+                multipart_chunksize=settings.MEDIA_MULTIPART_CHUNK_MB * 1024 * 1024,
+                max_concurrency=settings.MEDIA_MULTIPART_CONCURRENCY,
+                use_threads=defaults["use_threads"],
+            )
+        return defaults
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""
+Backend de plantillas Django que registra el tiempo de renderizado.
+
+Es idéntico a django.template.backends.django.DjangoTemplates, pero cada
+render() de nivel superior suma su duración a los tiempos de la solicitud en
+curso (proyecto.metrics), que ServerTimingMiddleware publica en Server-Timing.
+Las plantillas heredadas o incluidas se renderizan dentro de la superior, así
+que no se cuentan dos veces.
+"""
+
+import time
+
+from django.template.backends import django as django_backend
+
+from proyecto.metrics import record_template_time
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            record_template_time(time.perf_counter() - start)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Etiquetas que aplican los resultados de build_page_assets (ver proyecto/assets.py).
+
+    {% page_styles %}<link rel="stylesheet" ...>{% end_page_styles %}
+        Si existe CSS crítico para la plantilla, lo incrusta en un <style> y
+        carga las hojas del bloque sin bloquear el renderizado.
+
+    {% page_scripts %}<script src="..."></script>{% end_page_scripts %}
+        Si existe un paquete JS reducido para la plantilla, lo usa en lugar de
+        los scripts del bloque. Con DEBUG se usan siempre los scripts del
+        bloque, para que los cambios en los archivos fuente se vean sin
+        reconstruir el paquete.
+
+Sin resultados construidos (o con PAGE_ASSETS_ENABLED=False) el contenido se
+renderiza tal cual.
+"""
+
+import functools
+import re
+from urllib.parse import urljoin
+
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+
+from proyecto import assets
+
+register = template.Library()
+
+_STYLESHEET_RE = re.compile(r"<link\b[^>]*\brel=\"stylesheet\"[^>]*\bhref=\"[^\"#]+\.css[^\"]*\"[^>]*>")
+_RELATIVE_URL_RE = re.compile(r"url\(\s*(['\"]?)(?!data:|https?:|//|/|#)([^'\")]+)\1\s*\)")
+
+
+def _read_static(name):
+    """Contenido de un estático recolectado (o de su origen si aún no se recolectó)"""
+    try:
+        stored = staticfiles_storage.stored_name(name) if hasattr(staticfiles_storage, "stored_name") else name
+        with staticfiles_storage.open(stored) as handle:
+            return handle.read().decode("utf-8")
+    except (ValueError, OSError):
+        pass
+    path = finders.find(name)
+    if path is None:
+        return None
+    with open(path, encoding="utf-8") as handle:
+        return handle.read()
+
+
+def _static_exists(name):
+    try:
+        stored = staticfiles_storage.stored_name(name) if hasattr(staticfiles_storage, "stored_name") else name
+        if staticfiles_storage.exists(stored):
+            return True
+    except ValueError:
+        pass
+    return finders.find(name) is not None
+
+
+def _load_built_assets(template_name):
+    """(CSS crítico con url() absolutas, URL del paquete JS) de la plantilla; None si no existen"""
+    critical_name = assets.build_name(template_name, assets.CRITICAL_SUFFIX)
+    critical = _read_static(critical_name)
+    if critical is not None:
+        base_url = static(critical_name)
+        critical = _RELATIVE_URL_RE.sub(lambda match: "url(%s)" % urljoin(base_url, match.group(2)), critical)
+    bundle_name = assets.build_name(template_name, assets.BUNDLE_SUFFIX)
+    bundle_url = static(bundle_name) if _static_exists(bundle_name) else None
+    return critical, bundle_url
+
+
+_cached_built_assets = functools.lru_cache(maxsize=None)(_load_built_assets)
+
+
+def clear_cache():
+    """Olvida los resultados leídos (tras volver a construirlos en el mismo proceso)"""
+    _cached_built_assets.cache_clear()
+
+
+def built_assets(context):
+    if not settings.PAGE_ASSETS_ENABLED or context.get("page_assets_build"):
+        return None, None
+    template_name = getattr(getattr(context, "template", None), "name", None)
+    if not template_name:
+        return None, None
+    # En desarrollo se relee el CSS crítico y se usan los scripts fuente en lugar del paquete
+    if settings.DEBUG:
+        critical, _bundle_url = _load_built_assets(template_name)
+        return critical, None
+    return _cached_built_assets(template_name)
+
+
+def defer_stylesheets(html):
+    """Convierte cada <link rel="stylesheet"> en una precarga que se aplica al terminar de descargar"""
+
+    def defer(match):
+        preload = match.group(0).replace(
+            'rel="stylesheet"', 'rel="preload" as="style" onload="this.onload=null;this.rel=\'stylesheet\'"', 1,
+        )
+        return "%s<noscript>%s</noscript>" % (preload, match.group(0))
+
+    return _STYLESHEET_RE.sub(defer, html)
+
+
+class PageStylesNode(template.Node):
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+
+    def render(self, context):
+        content = self.nodelist.render(context)
+        if context.get("page_assets_build"):
+            return "<!-- %s -->%s<!-- /%s -->" % (assets.STYLES_MARKER, content, assets.STYLES_MARKER)
+        critical, _bundle_url = built_assets(context)
+        if critical is None:
+            return content
+        return "<style>%s</style>%s" % (critical, defer_stylesheets(content))
+
+
+class PageScriptsNode(template.Node):
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+
+    def render(self, context):
+        _critical, bundle_url = built_assets(context)
+        if bundle_url is not None:
+            return '<script src="%s"></script>' % bundle_url
+        content = self.nodelist.render(context)
+        if context.get("page_assets_build"):
+            return "<!-- %s -->%s<!-- /%s -->" % (assets.SCRIPTS_MARKER, content, assets.SCRIPTS_MARKER)
+        return content
+
+
+@register.tag
+def page_styles(parser, token):
+    nodelist = parser.parse(("end_page_styles",))
+    parser.delete_first_token()
+    return PageStylesNode(nodelist)
+
+
+@register.tag
+def page_scripts(parser, token):
+    nodelist = parser.parse(("end_page_scripts",))
+    parser.delete_first_token()
+    return PageScriptsNode(nodelist)
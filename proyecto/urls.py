@@ -14,10 +14,17 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from proyecto.metrics import metrics_view
+
 urlpatterns = [
     path('', include('app_1.urls')),
     path('admin/', admin.site.urls),
-]
\ No newline at end of file
+    path('metrics', metrics_view, name='metrics'),
+]
+# En desarrollo los archivos subidos (FileSystemStorage) se sirven desde MEDIA_URL; en producción están en S3
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Precompilación de plantillas y carga del URLconf al arrancar cada worker.
+
+Recorre TEMPLATES['DIRS'] y los directorios de plantillas de las aplicaciones,
+y compila cada archivo a través del motor para que quede en el cargador en
+caché antes de aceptar tráfico. Así la primera solicitud tras un despliegue o
+un reciclado de worker no paga la compilación de la cadena de herencia.
+
+También importa el URLconf y los módulos de vistas, que Django carga con la
+primera solicitud. Con preload_app de gunicorn (proyecto/gunicorn_conf.py)
+todo esto ocurre una vez en el maestro y los workers lo comparten.
+"""
+
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.template import TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+# Extensiones que se consideran plantillas al recorrer los directorios
+TEMPLATE_EXTENSIONS = (".html", ".txt", ".xml")
+
+
+def iter_template_names(template_dirs):
+    """Genera los nombres relativos de todas las plantillas de los directorios dados"""
+    seen = set()
+    for template_dir in template_dirs:
+        template_dir = str(template_dir)
+        for root, _dirs, files in os.walk(template_dir):
+            for filename in sorted(files):
+                if not filename.endswith(TEMPLATE_EXTENSIONS):
+                    continue
+                name = os.path.relpath(os.path.join(root, filename), template_dir).replace(os.sep, "/")
+                if name not in seen:
+                    seen.add(name)
+                    yield name
+
+
+def warmup_templates():
+    """
+    Compila todas las plantillas de los motores Django y devuelve una lista de
+    tuplas (motor, plantilla, milisegundos) ordenada de la más lenta a la más rápida.
+    """
+    timings = []
+    started = time.perf_counter()
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for name in iter_template_names(engine.template_dirs):
+            start = time.perf_counter()
+            try:
+                engine.get_template(name)
+            except TemplateSyntaxError as exc:
+                logger.warning("No se pudo compilar la plantilla %s: %s", name, exc)
+                continue
+            except Exception as exc:  # Plantillas que dependen de librerías no instaladas
+                logger.debug("Plantilla omitida %s: %s", name, exc)
+                continue
+            timings.append((engine.name, name, (time.perf_counter() - start) * 1000))
+
+    timings.sort(key=lambda item: item[2], reverse=True)
+    total = (time.perf_counter() - started) * 1000
+    logger.info("Plantillas precompiladas: %d en %.1f ms (pid %d)", len(timings), total, os.getpid())
+    for engine_name, name, elapsed in timings[:settings.TEMPLATE_WARMUP_REPORT]:
+        logger.info("  %8.2f ms  %s [%s]", elapsed, name, engine_name)
+    return timings
+
+
+def warmup_urls():
+    """Importa el URLconf y las vistas y construye las tablas de reverse()"""
+    resolver = get_resolver()
+    resolver.reverse_dict
+    return resolver
+
+
+def run_warmup():
+    """Punto de entrada usado por wsgi.py/asgi.py; no debe impedir el arranque"""
+    try:
+        warmup_urls()
+    except Exception:
+        logger.exception("Error al cargar el URLconf")
+    if not settings.TEMPLATE_WARMUP:
+        return []
+    try:
+        return warmup_templates()
+    except Exception:
+        logger.exception("Error durante la precompilación de plantillas")
+        return []
@@ -2,11 +2,14 @@
 """
 Script para iniciar la aplicación Django
 - Crea y activa entorno virtual
-- Actualiza pip
-- Instala dependencias
-- Ejecuta las migraciones
+- Actualiza pip e instala dependencias (solo si cambiaron requirements.txt o el entorno virtual)
+- Ejecuta las migraciones mientras verifica MySQLdb en paralelo
 - Inicia el servidor de desarrollo
-- Abre el navegador en la URL de la aplicación
+- Abre el navegador cuando el servidor responde y muestra el tiempo de cada paso
+
+Uso:
+    python start_server.py                # camino rápido si no cambió nada
+    python start_server.py --reinstall    # fuerza la actualización de pip y dependencias
 """
 
 import os
@@ -20,8 +23,40 @@ import urllib.request
 import shutil
 import glob
 import re
+import json
+import hashlib
+import urllib.error
 from pathlib import Path
 
+# URL del servidor de desarrollo
+SERVER_URL = "http://127.0.0.1:8000/"
+
+# Segundos máximos de espera a que el servidor responda antes de abrir el navegador
+SERVER_READY_TIMEOUT = 60
+
+# Archivo dentro del entorno virtual con la huella de la última instalación correcta
+REQUIREMENTS_STATE_FILE = ".start_server_state.json"
+
+# Duración de cada paso (nombre, segundos) para el resumen final
+STEP_TIMINGS = []
+
+def timed_step(name, func, *args):
+    """Ejecuta un paso y registra su duración para el resumen final"""
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        STEP_TIMINGS.append((name, time.perf_counter() - start))
+
+def print_timing_summary():
+    """Muestra el tiempo de cada paso del arranque"""
+    print()
+    print("⏱️  Tiempos de arranque:")
+    for name, seconds in STEP_TIMINGS:
+        print(f"   {name:<32} {seconds:8.2f} s")
+    print(f"   {'total':<32} {sum(seconds for _, seconds in STEP_TIMINGS):8.2f} s")
+    print()
+
 def setup_mysql_library_path():
     """Configura todas las variables de entorno necesarias para MySQL"""
     print("🔍 Detectando y configurando bibliotecas de MySQL...")
@@ -265,22 +300,39 @@ def fix_and_upgrade_pip(python_executable):
             print("⚠️  No se pudo actualizar pip, pero continuando...")
             return True
 
-def purge_pip_cache(python_executable):
-    """Limpia el caché de pip"""
-    print("🧹 Limpiando caché de pip...")
+def requirements_fingerprint(venv_path):
+    """
+    Huella de requirements.txt y del entorno virtual (versión de Python y
+    paquetes instalados según los directorios *.dist-info de site-packages)
+    """
+    sha = hashlib.sha256()
+    requirements_file = Path(__file__).parent / "requirements.txt"
+    if requirements_file.exists():
+        sha.update(requirements_file.read_bytes())
+    pyvenv_cfg = venv_path / "pyvenv.cfg"
+    if pyvenv_cfg.exists():
+        sha.update(pyvenv_cfg.read_bytes())
+    if os.name == 'nt':  # Windows
+        site_packages = [venv_path / "Lib" / "site-packages"]
+    else:  # Unix/Linux/macOS
+        site_packages = sorted(venv_path.glob("lib/python*/site-packages"))
+    for directory in site_packages:
+        for dist_info in sorted(directory.glob("*.dist-info")):
+            sha.update(dist_info.name.encode("utf-8"))
+    return sha.hexdigest()
+
+def load_requirements_state(venv_path):
+    """Huella guardada tras la última instalación correcta (None si no existe)"""
     try:
-        subprocess.run([
-            str(python_executable), 
-            "-m", 
-            "pip", 
-            "cache", 
-            "purge"
-        ], check=True, capture_output=True, text=True)
-        print("✅ Caché de pip limpiado exitosamente")
-        return True
-    except subprocess.CalledProcessError:
-        print("⚠️  No se pudo limpiar el caché de pip (puede ser normal)")
-        return False
+        with open(venv_path / REQUIREMENTS_STATE_FILE, encoding="utf-8") as handle:
+            return json.load(handle).get("fingerprint")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def save_requirements_state(venv_path):
+    """Guarda la huella actual para omitir pip en el siguiente arranque"""
+    with open(venv_path / REQUIREMENTS_STATE_FILE, "w", encoding="utf-8") as handle:
+        json.dump({"fingerprint": requirements_fingerprint(venv_path)}, handle)
 
 def install_requirements(python_executable):
     """Instala las dependencias del archivo requirements.txt"""
@@ -304,15 +356,15 @@ def install_requirements(python_executable):
         print("❌ Pip no está funcionando correctamente")
         return False
     
-    # Intentar instalación sin caché desde el principio
-    print("📋 Instalando desde requirements.txt (sin caché)...")
+    # Se usa la caché de pip: las ruedas ya descargadas (boto3, reportlab, Pillow...) no se vuelven a bajar
+    print("📋 Instalando desde requirements.txt...")
     try:
         result = subprocess.run([
             str(python_executable), 
             "-m", 
             "pip", 
             "install",
-            "--no-cache-dir",
+            "--disable-pip-version-check",
             "-r", 
             str(requirements_file)
         ], check=True, capture_output=True, text=True)
@@ -334,7 +386,7 @@ def install_requirements(python_executable):
                 "-m", 
                 "pip", 
                 "install", 
-                "--no-cache-dir",
+                "--disable-pip-version-check",
                 "--force-reinstall",
                 "-r", 
                 str(requirements_file)
@@ -376,18 +428,26 @@ def list_installed_packages(python_executable):
         print("=" * 64)
     print()
 
-def verify_mysqldb_import(python_executable):
+def start_mysqldb_check(python_executable):
+    """Lanza en segundo plano la importación de MySQLdb; el resultado lo muestra verify_mysqldb_import"""
+    return subprocess.Popen([
+        str(python_executable), 
+        "-c", 
+        "import MySQLdb; print('MySQLdb import successful')"
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+def verify_mysqldb_import(python_executable, process=None):
     """Verifica que MySQLdb se pueda importar correctamente"""
     print("🔍 Verificando importación de MySQLdb...")
+    if process is None:
+        process = start_mysqldb_check(python_executable)
+    stdout, stderr = process.communicate()
     try:
-        result = subprocess.run([
-            str(python_executable), 
-            "-c", 
-            "import MySQLdb; print('MySQLdb import successful')"
-        ], check=True, capture_output=True, text=True)
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, process.args, stdout, stderr)
         print("✅ MySQLdb importado exitosamente")
-        if result.stdout:
-            print(f"   {result.stdout.strip()}")
+        if stdout:
+            print(f"   {stdout.strip()}")
         return True
     except subprocess.CalledProcessError as e:
         print("⚠️  Advertencia: MySQLdb no pudo ser importado")
@@ -450,26 +510,8 @@ def verify_mysqldb_import(python_executable):
         return False
 
 def run_migrations(python_executable):
-    """Ejecuta las migraciones de Django"""
-    # Primero recolectar archivos estáticos
-    print("📁 Recolectando archivos estáticos...")
-    try:
-        result = subprocess.run([
-            str(python_executable), 
-            "manage.py", 
-            "collectstatic",
-            "--noinput"
-        ], cwd=Path(__file__).parent, check=True, capture_output=True, text=True)
-        print("✅ Archivos estáticos recolectados exitosamente")
-        if result.stdout:
-            print(result.stdout)
-    except subprocess.CalledProcessError as e:
-        print(f"⚠️  Advertencia al recolectar archivos estáticos (puede ser normal si no está configurado)")
-        if e.stderr:
-            print(f"Advertencia: {e.stderr}")
-        # No hacer sys.exit(1) aquí porque collectstatic puede fallar si no está configurado
-    
-    # Después ejecutar makemigrations
+    """Genera las migraciones de los modelos modificados y ejecuta manage.py boot"""
+    # makemigrations debe terminar antes de migrar
     print("🔄 Ejecutando makemigrations...")
     try:
         result = subprocess.run([
@@ -486,15 +528,17 @@ def run_migrations(python_executable):
             print(f"Advertencia: {e.stderr}")
         # No hacer sys.exit(1) aquí porque makemigrations puede fallar si no hay cambios
     
-    # Después ejecutar migrate
-    print("🔄 Ejecutando migraciones...")
+    # boot recolecta los estáticos y migra solo si cambiaron (ver proyecto/boot.py)
+    print("🔄 Recolectando archivos estáticos y ejecutando migraciones...")
     try:
         result = subprocess.run([
             str(python_executable), 
             "manage.py", 
-            "migrate"
-        ], cwd=Path(__file__).parent, check=True, capture_output=True, text=True)
-        print("✅ Migraciones completadas exitosamente")
+            "boot"
+        ], cwd=Path(__file__).parent, check=True, capture_output=True, text=True,
+            # Los CSS de terceros referencian archivos que no se distribuyen (ver STATICFILES_IGNORE_MISSING)
+            env={"STATICFILES_IGNORE_MISSING": "True", **os.environ})
+        print("✅ Archivos estáticos y migraciones al día")
         if result.stdout:
             print(result.stdout)
     except subprocess.CalledProcessError as e:
@@ -503,21 +547,37 @@ def run_migrations(python_executable):
             print(f"Error: {e.stderr}")
         sys.exit(1)
 
-def open_browser_delayed():
-    """Abre el navegador después de un pequeño delay para que el servidor esté listo"""
-    time.sleep(3)  # Espera 3 segundos para que el servidor esté completamente iniciado
-    url = "http://127.0.0.1:8000/"
-    print(f"🌐 Abriendo navegador en: {url}")
-    webbrowser.open(url)
+def wait_for_server(url, timeout=SERVER_READY_TIMEOUT):
+    """Consulta el servidor hasta que responde (cualquier código HTTP cuenta como listo)"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return True
+        except urllib.error.HTTPError:
+            return True
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.1)
+    return False
+
+def open_browser_when_ready(started):
+    """Abre el navegador en cuanto el servidor responde y muestra el resumen de tiempos"""
+    ready = wait_for_server(SERVER_URL)
+    STEP_TIMINGS.append(("Servidor listo", time.perf_counter() - started))
+    if not ready:
+        print(f"⚠️  El servidor no respondió en {SERVER_READY_TIMEOUT} s; abriendo el navegador de todas formas")
+    print_timing_summary()
+    print(f"🌐 Abriendo navegador en: {SERVER_URL}")
+    webbrowser.open(SERVER_URL)
 
 def start_server(python_executable):
     """Inicia el servidor de desarrollo de Django"""
     print("🚀 Iniciando servidor de desarrollo...")
-    print("📍 URL de la aplicación: http://127.0.0.1:8000/")
+    print(f"📍 URL de la aplicación: {SERVER_URL}")
     print("⏹️  Presiona Ctrl+C para detener el servidor")
     
-    # Iniciar hilo para abrir el navegador
-    browser_thread = threading.Thread(target=open_browser_delayed)
+    # Iniciar hilo para abrir el navegador cuando el servidor esté listo
+    browser_thread = threading.Thread(target=open_browser_when_ready, args=(time.perf_counter(),))
     browser_thread.daemon = True
     browser_thread.start()
     
@@ -544,8 +604,10 @@ def main():
     print("🐍 INICIADOR DE APLICACIÓN DJANGO CON ENTORNO VIRTUAL")
     print("=" * 60)
     
+    reinstall = "--reinstall" in sys.argv[1:]
+    
     # Paso 0: Configurar bibliotecas de MySQL
-    setup_mysql_library_path()
+    timed_step("Bibliotecas de MySQL", setup_mysql_library_path)
     
     # Verificar que estamos en el directorio correcto
     project_root = Path(__file__).parent
@@ -558,7 +620,7 @@ def main():
     
     try:
         # Paso 1: Crear/verificar entorno virtual
-        venv_path = create_virtual_environment()
+        venv_path = timed_step("Entorno virtual", create_virtual_environment)
         python_executable = get_venv_python(venv_path)
         
         if not python_executable.exists():
@@ -567,55 +629,60 @@ def main():
         
         print(f"🐍 Usando Python del entorno virtual: {python_executable}")
         
-        # Paso 2: Verificar y configurar pip
-        pip_success = fix_and_upgrade_pip(python_executable)
+        # Paso 1.5: Camino rápido si requirements.txt y el entorno virtual no cambiaron
+        if not reinstall and load_requirements_state(venv_path) == requirements_fingerprint(venv_path):
+            print("⚡ requirements.txt y el entorno virtual no cambiaron; se omite la instalación con pip")
+            print("   (use --reinstall para forzarla)")
+            print()
+        else:
+            # Paso 2: Verificar y configurar pip
+            pip_success = timed_step("Pip", fix_and_upgrade_pip, python_executable)
         
-        if not pip_success:
-            print("\n🔄 Intentando recrear el entorno virtual...")
-            venv_path = recreate_virtual_environment()
-            python_executable = get_venv_python(venv_path)
+            if not pip_success:
+                print("\n🔄 Intentando recrear el entorno virtual...")
+                venv_path = recreate_virtual_environment()
+                python_executable = get_venv_python(venv_path)
             
-            if not fix_and_upgrade_pip(python_executable):
-                print("❌ Error crítico con pip, no se puede continuar")
-                print("\n💡 Soluciones manuales:")
-                print("   1. Eliminar manualmente la carpeta .venv")
-                print("   2. Verificar que Python esté correctamente instalado")
-                print("   3. Ejecutar: python -m venv .venv")
-                sys.exit(1)
-        
-        # Paso 2.5: Limpiar caché de pip
-        purge_pip_cache(python_executable)
+                if not fix_and_upgrade_pip(python_executable):
+                    print("❌ Error crítico con pip, no se puede continuar")
+                    print("\n💡 Soluciones manuales:")
+                    print("   1. Eliminar manualmente la carpeta .venv")
+                    print("   2. Verificar que Python esté correctamente instalado")
+                    print("   3. Ejecutar: python -m venv .venv")
+                    sys.exit(1)
         
-        # Paso 3: Instalar dependencias
-        if not install_requirements(python_executable):
-            print("\n🔄 ¿Desea intentar recrear el entorno virtual? (s/n)")
-            try:
-                response = input().lower().strip()
-                if response in ['s', 'si', 'sí', 'y', 'yes']:
-                    print("🔄 Recreando entorno virtual...")
-                    venv_path = recreate_virtual_environment()
-                    python_executable = get_venv_python(venv_path)
+            # Paso 3: Instalar dependencias
+            if not timed_step("Dependencias", install_requirements, python_executable):
+                print("\n🔄 ¿Desea intentar recrear el entorno virtual? (s/n)")
+                try:
+                    response = input().lower().strip()
+                    if response in ['s', 'si', 'sí', 'y', 'yes']:
+                        print("🔄 Recreando entorno virtual...")
+                        venv_path = recreate_virtual_environment()
+                        python_executable = get_venv_python(venv_path)
                     
-                    if fix_and_upgrade_pip(python_executable) and install_requirements(python_executable):
-                        print("✅ Dependencias instaladas después de recrear entorno virtual")
+                        if fix_and_upgrade_pip(python_executable) and install_requirements(python_executable):
+                            print("✅ Dependencias instaladas después de recrear entorno virtual")
+                        else:
+                            print("❌ Error persistente al instalar dependencias")
+                            sys.exit(1)
                     else:
-                        print("❌ Error persistente al instalar dependencias")
+                        print("❌ No se pudieron instalar las dependencias")
                         sys.exit(1)
-                else:
-                    print("❌ No se pudieron instalar las dependencias")
+                except (KeyboardInterrupt, EOFError):
+                    print("\n❌ Operación cancelada por el usuario")
                     sys.exit(1)
-            except (KeyboardInterrupt, EOFError):
-                print("\n❌ Operación cancelada por el usuario")
-                sys.exit(1)
         
-        # Paso 3.5: Listar paquetes instalados
-        list_installed_packages(python_executable)
+            # Paso 3.5: Listar paquetes instalados
+            list_installed_packages(python_executable)
+            save_requirements_state(venv_path)
         
-        # Paso 4: Ejecutar migraciones
-        run_migrations(python_executable)
+        # Paso 4: Ejecutar migraciones mientras se verifica MySQLdb en otro proceso
+        mysqldb_check = start_mysqldb_check(python_executable)
+        timed_step("Migraciones y estáticos", run_migrations, python_executable)
         
-        # Paso 4.5: Verificar importación de MySQLdb
-        verify_mysqldb_import(python_executable)
+        # Paso 4.5: Mostrar el resultado de la verificación de MySQLdb
+        timed_step("Espera verificación MySQLdb", verify_mysqldb_import, python_executable, mysqldb_check)
         
         # Paso 5: Iniciar servidor
         start_server(python_executable)